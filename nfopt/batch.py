@@ -0,0 +1,155 @@
+import argparse
+
+from multiprocessing import set_start_method
+
+from nfopt.calc_type_enum import CalcType
+from nfopt.output_format_enum import OutputFormat
+
+MODEL_TYPES = [
+    CalcType.BASELINE.value,
+    CalcType.AVERAGE.value,
+    CalcType.MAX.value,
+    CalcType.SQUARED.value,
+    CalcType.PATHS.value,
+]
+
+
+def parseDays(days):
+    """
+    Parses a list of days and day ranges, e.g. '1-7' or '1,3,5-6', into a sorted list of days.
+    """
+    parsed = set()
+    for part in days.split(","):
+        start, dash, end = part.partition("-")
+        if not dash:
+            end = start
+        if not start.isdigit() or not end.isdigit() or int(end) < int(start):
+            raise ValueError(f"Invalid days: {days}")
+        parsed.update(range(int(start), int(end) + 1))
+    return sorted(parsed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="nfopt batch",
+        description="run several models over several days on one worker pool",
+    )
+    parser.add_argument(
+        "--days",
+        default="2",
+        help="days to process, as a list of days and ranges, e.g. 1-7 or 1,3,5-6",
+    )
+    parser.add_argument(
+        "--models",
+        default=CalcType.BASELINE.value,
+        help=f"comma separated model types to run, out of {','.join(MODEL_TYPES)}",
+    )
+    parser.add_argument(
+        "-slpm",
+        "--save-lp-models",
+        action="store_true",
+        help="save linear optimization models",
+    )
+    parser.add_argument(
+        "-inc",
+        "--incremental",
+        action="store_true",
+        help="update and warm-start the previous hour's model in each worker, for the average, max and squared models",
+    )
+    parser.add_argument(
+        "-cg",
+        "--column-generation",
+        action="store_true",
+        help="solve the paths model with path-based column generation",
+    )
+    parser.add_argument(
+        "-sa",
+        "--source-aggregation",
+        action="store_true",
+        help="solve the paths model with one commodity per source router",
+    )
+    parser.add_argument(
+        "-of",
+        "--output-format",
+        choices=[OutputFormat.CSV.value, OutputFormat.PARQUET.value],
+        default=OutputFormat.CSV.value,
+        help="format of the ratio, link and overview output files",
+    )
+    parser.add_argument(
+        "-nc",
+        "--no-cache",
+        action="store_true",
+        help="parse the dataset without reading or writing the cached day stores",
+    )
+    parser.add_argument(
+        "-st",
+        "--solver-threads",
+        type=int,
+        help="Gurobi threads per solve, by default planned from the model size and CPU_THREADS",
+    )
+
+    parser.add_argument(
+        "-sb",
+        "--solver-backend",
+        help="solver backend, gurobi, highs or scipy, or one per model type, e.g. average=highs,max=scipy",
+    )
+
+    batchArgs = parser.parse_args(argv)
+
+    # The pipeline and its dependencies are imported once the arguments are parsed, so --help and
+    # usage errors return without loading them
+    from nfopt import pipeline
+    from nfopt.linear_optimization import solver
+
+    try:
+        days = parseDays(batchArgs.days)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if batchArgs.solver_threads is not None and batchArgs.solver_threads < 1:
+        parser.error("The number of solver threads must be at least 1.")
+
+    if batchArgs.source_aggregation and batchArgs.column_generation:
+        parser.error("Source aggregation can not be used with column generation.")
+
+    models = batchArgs.models.split(",")
+    for model in models:
+        if model not in MODEL_TYPES:
+            parser.error(f"Invalid model type: {model}")
+
+    try:
+        backends = (
+            solver.parseBackends(batchArgs.solver_backend)
+            if batchArgs.solver_backend is not None
+            else None
+        )
+        for model in models:
+            if model != CalcType.BASELINE.value:
+                solver.checkBackend(model, backends)
+    except ValueError as e:
+        parser.error(str(e))
+
+    for flag, flagModels, flagBackends, message in [
+        (
+            batchArgs.incremental,
+            pipeline.INCREMENTAL_MODEL_TYPES,
+            solver.INCREMENTAL_BACKENDS,
+            "Incremental mode requires the gurobi or pgd solver backend.",
+        ),
+        (
+            batchArgs.column_generation,
+            [CalcType.PATHS.value],
+            [solver.BACKEND_GUROBI],
+            "Column generation requires the gurobi solver backend.",
+        ),
+    ]:
+        if flag and any(
+            solver.backendName(model, backends) not in flagBackends
+            for model in models
+            if model in flagModels
+        ):
+            parser.error(message)
+
+    set_start_method("spawn")
+
+    pipeline.runBatch(days, models, batchArgs, backends)
@@ -0,0 +1,246 @@
+import numpy as np
+import scipy.sparse as sp
+
+from nfopt.utils import log
+from nfopt.utils import timing
+from nfopt.linear_optimization import optimizer as linOpt, solver
+from nfopt.linear_optimization.gurobi_env import getEnv
+
+logger = log.setupCustomLogger(__name__)
+
+# Fail every link of the hour, together with its reverse link
+ALL_LINKS = "all"
+
+# Failed links of the row of the hour without failures
+BASE_SCENARIO = ""
+
+FAILURE_COLUMNS = [
+    "timestamp",
+    "failed_links",
+    "status",
+    "max_util",
+    "avg_util",
+    "max_link",
+    "lost_traffic",
+    "iterations",
+    "solve_time",
+]
+
+# Status of a scenario that is only feasible with the capacity constraints relaxed
+STATUS_OVERLOADED = solver.STATUS_OVERLOADED
+
+
+def failureScenarios(linkNames, failures):
+    """
+    Returns the failure scenarios of an hour, each a list of the links that fail together.
+
+    ### Parameters:
+    ----------
+    #### linkNames: list
+    The links of the hour.
+
+    #### failures: str or list
+    `ALL_LINKS` to fail each link together with its reverse link, if there is one, as a cut of the cable
+    between two routers. Otherwise the list of scenarios read with `data.readFailureScenarios`.
+    """
+    if failures != ALL_LINKS:
+        return failures
+
+    linkSet = set(linkNames)
+    scenarios = []
+    seen = set()
+    for link in linkNames:
+        if link in seen:
+            continue
+        start, end = link.split(";")
+        reverse = f"{end};{start}"
+        scenario = [link, reverse] if reverse in linkSet else [link]
+        seen.update(scenario)
+        scenarios.append(scenario)
+
+    return scenarios
+
+
+class FailureSweep:
+    """
+    Path ratio model of an hour kept by a worker and re-solved for each failure scenario of the hour.
+
+    A scenario sets the upper bound of the paths crossing the failed links to zero and the traffic
+    split of the flows left without a path to zero, then warm-starts the dual simplex from the basis
+    of the hour without failures, which the bound changes keep dual feasible. Scenarios that overload
+    a link are solved again with the capacity constraints relaxed, so their utilization is reported
+    instead of only being infeasible.
+    """
+
+    def __init__(self, model, timestamp, links, traffic, hourPaths, topology):
+        # The sweep always solves with Gurobi, which is only imported by the workers that use it
+        import gurobipy as gp
+
+        self.GRB = gp.GRB
+        self.timestamp = timestamp
+        self.hourPaths = hourPaths
+
+        with timing.stage("build"):
+            self.linkNames, self.capacities, self.demands, self.linkIncidence = (
+                linOpt._hourArrays(links, traffic, hourPaths, topology)
+            )
+            self.linkRows = {link: row for row, link in enumerate(self.linkNames)}
+            self.pathTraffic = self.demands[hourPaths.pathFlow]
+            loadMatrix = (self.linkIncidence @ sp.diags(self.pathTraffic)).tocsr()
+
+            self.m = gp.Model("failure_sweep", env=getEnv())
+            variables, constrs = solver.addGurobiModel(
+                self.m,
+                linOpt._pathModel(
+                    model, loadMatrix, self.capacities, hourPaths.flowPathMatrix()
+                ),
+            )
+            self.pathVars = variables["PathRatios"].tolist()
+            self.capConstrs = constrs["cap"].tolist()
+            self.splitConstrs = constrs["traffic_split"].tolist()
+            self.m.update()
+        timing.countModel(self.m)
+
+        # Bound changes keep the basis dual feasible, so the hour is solved with the dual simplex,
+        # which also leaves a basis for the scenarios to start from
+        self.m.Params.Method = 1
+        self.base, self.baseRatios = self._solve(
+            np.zeros(len(self.linkNames), dtype=bool)
+        )
+        self.basis = None
+        if self.baseRatios is not None:
+            self.basis = (
+                self.m.getAttr("VBasis", self.m.getVars()),
+                self.m.getAttr("CBasis", self.m.getConstrs()),
+            )
+
+    def baseRow(self):
+        """
+        Returns the row of the failure table of the hour without failures.
+        """
+        return [self.timestamp, BASE_SCENARIO, *self.base]
+
+    def solve(self, failedLinks):
+        """
+        Solves the hour with the given links failed and returns its row of the failure table.
+        """
+        failedRows = [
+            self.linkRows[link] for link in failedLinks if link in self.linkRows
+        ]
+        failed = np.zeros(len(self.linkNames), dtype=bool)
+        failed[failedRows] = True
+
+        indptr, indices = self.linkIncidence.indptr, self.linkIncidence.indices
+        failedPaths = np.unique(
+            np.concatenate(
+                [indices[indptr[row] : indptr[row + 1]] for row in failedRows]
+                + [np.empty(0, dtype=indices.dtype)]
+            )
+        )
+
+        # Links no path crosses leave the solution of the hour unchanged
+        if len(failedPaths) == 0:
+            return [self.timestamp, ",".join(failedLinks), *self._unchanged(failed)]
+
+        # Flows whose every path crosses a failed link lose their traffic
+        pathFlow = self.hourPaths.pathFlow
+        failedCount = np.bincount(
+            pathFlow[failedPaths], minlength=len(self.hourPaths.flowNames)
+        )
+        lostFlows = np.flatnonzero(failedCount == np.diff(self.hourPaths.flowPtr))
+
+        pathVars = [self.pathVars[path] for path in failedPaths]
+        splitConstrs = [self.splitConstrs[flow] for flow in lostFlows]
+        self.m.setAttr("UB", pathVars, [0.0] * len(pathVars))
+        self.m.setAttr("RHS", splitConstrs, [0.0] * len(splitConstrs))
+        if self.basis is not None:
+            self.m.setAttr("VBasis", self.m.getVars(), self.basis[0])
+            self.m.setAttr("CBasis", self.m.getConstrs(), self.basis[1])
+
+        result, _ = self._solve(failed, float(self.demands[lostFlows].sum()))
+
+        self.m.setAttr("UB", pathVars, [self.GRB.INFINITY] * len(pathVars))
+        self.m.setAttr("RHS", splitConstrs, [1.0] * len(splitConstrs))
+
+        return [self.timestamp, ",".join(failedLinks), *result]
+
+    def dispose(self):
+        self.m.dispose()
+
+    def _solve(self, failed, lostTraffic=0.0):
+        """
+        Solves the model, relaxing the capacity constraints if it is infeasible.
+
+        ### Returns:
+        ----------
+        The status, utilization, lost traffic, iterations and solve time columns of the failure table,
+        and the ratio of each path, or None if the model was not solved to optimality.
+        """
+        GRB = self.GRB
+        iterations = 0
+        solveTime = 0.0
+        status = solver.STATUS_OPTIMAL
+
+        with timing.stage("solve"):
+            self.m.optimize()
+            iterations += self.m.IterCount
+            solveTime += self.m.Runtime
+
+            if self.m.Status in [GRB.INFEASIBLE, GRB.INF_OR_UNBD]:
+                status = STATUS_OVERLOADED
+                self.m.setAttr(
+                    "RHS", self.capConstrs, [GRB.INFINITY] * len(self.capConstrs)
+                )
+                self.m.optimize()
+                iterations += self.m.IterCount
+                solveTime += self.m.Runtime
+
+        ratios = None
+        if self.m.Status == GRB.OPTIMAL:
+            ratios = np.array(self.m.getAttr("X", self.pathVars))
+            columns = [status, *self._utilization(ratios, failed)]
+        else:
+            solver.logGurobiStatus(
+                self.m,
+                [
+                    (self.capConstrs, [f"cap_{link}" for link in self.linkNames]),
+                    (
+                        self.splitConstrs,
+                        [f"traffic_split_{sd}" for sd in self.hourPaths.flowNames],
+                    ),
+                ],
+            )
+            columns = [solver.STATUS_INFEASIBLE, None, None, None]
+
+        if status == STATUS_OVERLOADED:
+            self.m.setAttr("RHS", self.capConstrs, self.capacities.tolist())
+
+        return [*columns, lostTraffic, int(iterations), solveTime], ratios
+
+    def _unchanged(self, failed):
+        """
+        Returns the columns of a scenario with the solution of the hour without failures.
+        """
+        if self.baseRatios is None:
+            return [solver.STATUS_INFEASIBLE, None, None, None, 0.0, 0, 0.0]
+        columns = [self.base[0], *self._utilization(self.baseRatios, failed)]
+        return [*columns, 0.0, 0, 0.0]
+
+    def _utilization(self, ratios, failed):
+        """
+        Returns the max utilization, the average utilization and the most utilized link of the links
+        that did not fail.
+        """
+        linkUtil = (
+            self.linkIncidence @ (ratios * self.pathTraffic) / self.capacities * 100
+        )
+        linkUtil[failed] = np.nan
+        if np.all(failed):
+            return None, None, None
+
+        maxRow = int(np.nanargmax(linkUtil))
+        return (
+            float(linkUtil[maxRow]),
+            float(np.nanmean(linkUtil)),
+            self.linkNames[maxRow],
+        )
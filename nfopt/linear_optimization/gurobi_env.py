@@ -0,0 +1,63 @@
+import os
+import atexit
+
+from nfopt.utils import config
+from nfopt.utils import log
+
+logger = log.setupCustomLogger(__name__)
+
+config.load()
+
+# Gurobi parameters of the environment of the current process, e.g. Threads
+options = {}
+
+_env = None
+
+
+def licenseOptions():
+    """
+    Returns the Gurobi WLS license parameters from the environment variables, or no parameters if
+    WLSACCESSID and WLSSECRET are not set, in which case Gurobi looks for a license file.
+    """
+    if not os.getenv("WLSACCESSID") or not os.getenv("WLSSECRET"):
+        return {}
+
+    licenseId = os.getenv("LICENSEID", "")
+    if not licenseId.isdigit():
+        raise ValueError(f"Invalid LICENSEID: {licenseId}")
+
+    return {
+        "WLSACCESSID": os.getenv("WLSACCESSID"),
+        "WLSSECRET": os.getenv("WLSSECRET"),
+        "LICENSEID": int(licenseId),
+    }
+
+
+def getEnv():
+    """
+    Returns the Gurobi environment of the current process, starting it on first use.
+
+    The environment (and with it the license checkout) is kept for the lifetime of the process,
+    so every hour solved by a pool worker shares one environment instead of starting a new one.
+    """
+    global _env
+
+    if _env is None:
+        # gurobipy and its license are only loaded by the processes that solve with Gurobi
+        import gurobipy as gp
+
+        logger.info("Starting Gurobi environment...")
+        _env = gp.Env(params={**licenseOptions(), **options})
+        atexit.register(_env.dispose)
+
+    return _env
+
+
+def setThreads(threads):
+    """
+    Sets the number of threads Gurobi uses for each solve of the current process, planned by
+    `threads.planThreads` so concurrent solves in a pool do not oversubscribe the CPU.
+    """
+    options["Threads"] = threads
+    if _env is not None:
+        _env.setParam("Threads", threads)
@@ -0,0 +1,233 @@
+import gurobipy as gp
+import numpy as np
+import scipy.sparse as sp
+
+from gurobipy import GRB
+
+from nfopt.calc_type_enum import CalcType
+from nfopt.utils import log
+
+logger = log.setupCustomLogger(__name__)
+
+# Incremental models of the current process, indexed by model type
+_models = {}
+
+
+def getModel(model, env, linkNames, capacities):
+    """
+    Returns the incremental model of the current process for the model type, starting a new one if
+    there is none yet or the links of the network changed since the previous hour.
+
+    ### Parameters:
+    ----------
+    #### model: string
+    The optimization model to build, can be 'average', 'max' or 'squared'.
+
+    #### env: gurobipy.Env
+    The Gurobi environment of the current process.
+
+    #### linkNames: list
+    The links of the network, in the order of the link rows.
+
+    #### capacities: numpy.ndarray
+    The capacity of each link.
+    """
+    incModel = _models.get(model)
+
+    if (
+        incModel is None
+        or incModel.linkNames != linkNames
+        or not np.array_equal(incModel.capacities, capacities)
+    ):
+        if incModel is not None:
+            logger.info("Links changed, rebuilding incremental model")
+            incModel.m.dispose()
+        incModel = IncrementalModel(model, env, linkNames, capacities)
+        _models[model] = incModel
+
+    return incModel
+
+
+class IncrementalModel:
+    """
+    Path model kept across the hours solved by one process.
+
+    Unlike the ratio model of `optimizer._addMatrixModel`, the variables are the traffic carried by
+    each path, so the link rows only hold unit (or 1 / capacity) coefficients and the traffic of an
+    hour only changes the right-hand side of the traffic split constraints. Paths and flows of earlier
+    hours stay in the model, with their upper bound and traffic set to zero while absent, and each
+    solve after the first warm-starts from the basis Gurobi kept from the previous hour.
+    """
+
+    def __init__(self, model, env, linkNames, capacities):
+        self.model = model
+        self.linkNames = linkNames
+        self.capacities = capacities
+        self.m = gp.Model("network_optimization", env=env)
+        self.pathKeys = []
+        self.pathVars = []
+        self.pathIndex = {}
+        self.flowConstrs = {}
+        self.hourVars = []
+        self.hourDemands = None
+        self.hourUniform = None
+        self.hours = 0
+
+        match model:
+            case CalcType.AVERAGE.value | CalcType.SQUARED.value:
+                self.utilScale = np.ones(len(linkNames))
+            case CalcType.MAX.value:
+                self.utilScale = 1 / capacities
+            case _:
+                raise ValueError(f"Invalid model: {model}")
+
+    def update(self, hourPaths, linkIncidence, demands):
+        """
+        Updates the model to the paths and traffic of the next hour.
+
+        ### Parameters:
+        ----------
+        #### hourPaths: HourPaths
+        The compiled paths of the hour.
+
+        #### linkIncidence: scipy.sparse.csr_matrix
+        The link x path incidence matrix of the hour, with rows in the order of `linkNames`.
+
+        #### demands: numpy.ndarray
+        The traffic of each flow of the hour.
+        """
+        keys = list(
+            zip((hourPaths.flowNames[f] for f in hourPaths.pathFlow), hourPaths.paths)
+        )
+
+        if not self.pathVars:
+            self._build(hourPaths, linkIncidence, demands, keys)
+        else:
+            self._addColumns(hourPaths, linkIncidence, keys)
+
+        # Absent paths can not carry traffic and absent flows have no traffic
+        present = np.zeros(len(self.pathVars), dtype=bool)
+        hourIndex = np.fromiter(
+            (self.pathIndex[key] for key in keys), dtype=np.int64, count=len(keys)
+        )
+        present[hourIndex] = True
+        self.m.setAttr("UB", self.pathVars, np.where(present, GRB.INFINITY, 0).tolist())
+
+        flowDemands = dict.fromkeys(self.flowConstrs, 0.0)
+        flowDemands.update(zip(hourPaths.flowNames, demands.tolist()))
+        self.m.setAttr(
+            "RHS", list(self.flowConstrs.values()), list(flowDemands.values())
+        )
+
+        self.hourVars = [self.pathVars[i] for i in hourIndex]
+        self.hourDemands = demands[hourPaths.pathFlow]
+        self.hourUniform = hourPaths.uniformRatios()
+
+        if self.hours > 0:
+            # Traffic changes only move the right-hand side, which keeps the previous basis dual feasible
+            self.m.Params.Method = 1
+        self.hours += 1
+
+    def ratios(self):
+        """
+        Returns the ratios of the paths of the current hour from the solved traffic on each path.
+        Flows without traffic get uniform ratios.
+        """
+        pathTraffic = np.asarray(self.m.getAttr("X", self.hourVars))
+        return np.divide(
+            pathTraffic,
+            self.hourDemands,
+            out=self.hourUniform.copy(),
+            where=self.hourDemands > 0,
+        )
+
+    def constrNames(self):
+        """
+        Returns the (constraints, names) pairs of the model, named after their links and flows.
+        """
+        return [
+            (self.capConstrs, [f"cap_{link}" for link in self.linkNames]),
+            (self.utilConstrs, [f"util_{link}" for link in self.linkNames]),
+            (
+                list(self.flowConstrs.values()),
+                [f"traffic_split_{flow}" for flow in self.flowConstrs],
+            ),
+        ]
+
+    def _build(self, hourPaths, linkIncidence, demands, keys):
+        m = self.m
+        numLinks = len(self.linkNames)
+
+        path_traffic = m.addMVar(len(keys), vtype=GRB.CONTINUOUS, name="PathTraffic")
+        link_flow = linkIncidence @ path_traffic
+
+        cap = m.addConstr(link_flow <= self.capacities, name="cap")
+
+        match self.model:
+            case CalcType.AVERAGE.value:
+                utilization = m.addMVar(
+                    numLinks, vtype=GRB.CONTINUOUS, name="Utilization"
+                )
+                m.setObjective(utilization.sum(), GRB.MINIMIZE)
+                util = m.addConstr(
+                    link_flow == sp.diags(self.capacities) @ utilization, name="util"
+                )
+            case CalcType.MAX.value:
+                max_utilization = m.addMVar(
+                    1, vtype=GRB.CONTINUOUS, name="MaxUtilization"
+                )
+                m.setObjective(max_utilization.sum(), GRB.MINIMIZE)
+                util = m.addConstr(
+                    sp.diags(self.utilScale) @ link_flow
+                    <= sp.csr_matrix(np.ones((numLinks, 1))) @ max_utilization,
+                    name="util",
+                )
+            case CalcType.SQUARED.value:
+                utilization = m.addMVar(
+                    numLinks, vtype=GRB.CONTINUOUS, name="Utilization"
+                )
+                m.setObjective(utilization @ utilization, GRB.MINIMIZE)
+                util = m.addConstr(
+                    link_flow == sp.diags(self.capacities) @ utilization, name="util"
+                )
+
+        split = m.addConstr(
+            hourPaths.flowPathMatrix() @ path_traffic == demands, name="traffic_split"
+        )
+
+        self.capConstrs = cap.tolist()
+        self.utilConstrs = util.tolist()
+        self.flowConstrs = dict(zip(hourPaths.flowNames, split.tolist()))
+        self.pathKeys = keys
+        self.pathVars = path_traffic.tolist()
+        self.pathIndex = {key: i for i, key in enumerate(keys)}
+
+    def _addColumns(self, hourPaths, linkIncidence, keys):
+        m = self.m
+
+        for flow in hourPaths.flowNames:
+            if flow not in self.flowConstrs:
+                self.flowConstrs[flow] = m.addLConstr(
+                    gp.LinExpr(), GRB.EQUAL, 0, name=f"traffic_split_{flow}"
+                )
+
+        newPaths = [p for p, key in enumerate(keys) if key not in self.pathIndex]
+        if not newPaths:
+            return
+
+        pathLinks = linkIncidence.tocsc()
+        for p in newPaths:
+            rows = pathLinks.indices[pathLinks.indptr[p] : pathLinks.indptr[p + 1]]
+            column = gp.Column(
+                [1.0] * len(rows) + self.utilScale[rows].tolist() + [1.0],
+                [self.capConstrs[r] for r in rows]
+                + [self.utilConstrs[r] for r in rows]
+                + [self.flowConstrs[keys[p][0]]],
+            )
+            self.pathIndex[keys[p]] = len(self.pathVars)
+            self.pathKeys.append(keys[p])
+            self.pathVars.append(
+                m.addVar(column=column, name=f"PathTraffic[{len(self.pathVars)}]")
+            )
+
+        logger.info(f"Added {len(newPaths):,} new paths to incremental model")
@@ -1,28 +1,33 @@
 import os
-import gurobipy as gp
-import pandas as pd
-from collections import deque
+import numpy as np
+import scipy.sparse as sp
 
-from dotenv import load_dotenv
+from nfopt.calc_type_enum import CalcType
+from nfopt.utils import config
 from nfopt.utils import log
 from nfopt.utils import data as dataUtils
+from nfopt.utils import timing
+from nfopt.utils.topology import Topology
+from nfopt.linear_optimization import optimizer as linOpt, solver
+from nfopt.linear_optimization.gurobi_env import getEnv
 
 logger = log.setupCustomLogger(__name__)
-load_dotenv("variables.env")
+config.load()
 
 NETFLOW_FLOW_THRESHOLD = float(os.getenv("NETFLOW_FLOW_THRESHOLD"))
 NETFLOW_PATHS_THRESHOLD = float(os.getenv("NETFLOW_PATHS_THRESHOLD"))
+NETFLOW_CG_MAX_ITERATIONS = int(os.getenv("NETFLOW_CG_MAX_ITERATIONS", "100"))
 
-options = {
-    "WLSACCESSID": os.getenv("WLSACCESSID"),
-    "WLSSECRET": os.getenv("WLSSECRET"),
-    "LICENSEID": int(os.getenv("LICENSEID")),
-}
+# Relative reduced cost a priced path must beat to be added to the restricted model
+CG_TOLERANCE = 1e-6
 
+# Share of the traffic of a source below which the flow of an arc counts as empty when decomposing it
+FLOW_TOLERANCE = 1e-9
 
-def optMC(parserArgs, links, flowTraffic, timestamp):
+
+def optMC(parserArgs, links, flowTraffic, timestamp, topology=None):
     """
-    Runs multi-commodity flow problem optimization on the data using Gurobi. Writes a file with the new paths and their ratios.
+    Runs multi-commodity flow problem optimization on the data with the solver backend of the paths model. Writes a file with the new paths and their ratios.
 
     ### Parameters:
     ----------
@@ -37,111 +42,89 @@ def optMC(parserArgs, links, flowTraffic, timestamp):
 
     #### timestamp: string
     The timestamp for the current data.
-    """
-    with gp.Env(params=options) as env, gp.Model("netflow", env=env) as m:
-        nodes = []
-        edges = []
-        for link in links:
-            split = link.split(";")
-            edges.append((split[0], split[1]))
-
-            if split[0] not in nodes:
-                nodes.append(split[0])
-            if split[1] not in nodes:
-                nodes.append(split[1])
-
-        traffic = {}
-        sorted_flowTraffic = sorted(
-            flowTraffic.items(), key=lambda item: item[1], reverse=True
-        )
 
-        total_demand = sum(flowTraffic.values())
-        percentage = NETFLOW_FLOW_THRESHOLD
-        demand_threshold = total_demand * percentage
-
-        cumulative_demand = 0
-        significant_flowTraffic = {}
-        for flow, value in sorted_flowTraffic:
-            if cumulative_demand <= demand_threshold:
-                significant_flowTraffic[flow] = value
-                cumulative_demand += value
-            else:
-                break  # Stop adding values once the threshold is reached
-
-        for flow in significant_flowTraffic:
-            split = flow.split(";")
-            traffic[flow, split[0]] = significant_flowTraffic[flow]
-            traffic[flow, split[1]] = -significant_flowTraffic[flow]
-
-        utilization = m.addVars(links, vtype=gp.GRB.CONTINUOUS, name="Utilization")
-        m.setObjective(
-            gp.quicksum((utilization[link] ** 2 for link in links)),
-            gp.GRB.MINIMIZE,
-        )
-
-        logger.info(
-            f"adding vars for flow: {len(significant_flowTraffic):,} and edges: {len(edges):,} so {len(significant_flowTraffic) * len(edges):,} flowVars in total"
-        )
-
-        flowVars = m.addVars(significant_flowTraffic.keys(), edges, name="flow")
-
-        logger.info(f"adding capacity constraints for {len(edges):,} edges")
-
-        m.addConstrs(
-            (
-                flowVars.sum("*", start, end) <= links[start + ";" + end]["capacity"]
-                for start, end in edges
-            ),
-            "cap",
+    #### topology: Topology
+    The compiled topology of the day, built from `links` if not given.
+    """
+    import pandas as pd
+
+    if topology is None:
+        topology = Topology(links)
+
+    sorted_flowTraffic = sorted(
+        flowTraffic.items(), key=lambda item: item[1], reverse=True
+    )
+
+    total_demand = sum(flowTraffic.values())
+    percentage = NETFLOW_FLOW_THRESHOLD
+    demand_threshold = total_demand * percentage
+
+    cumulative_demand = 0
+    significant_flowTraffic = {}
+    for flow, value in sorted_flowTraffic:
+        if cumulative_demand <= demand_threshold:
+            significant_flowTraffic[flow] = value
+            cumulative_demand += value
+        else:
+            break  # Stop adding values once the threshold is reached
+
+    with timing.stage("build"):
+        # The links of the hour are the arcs of the model
+        linkStart, linkEnd, capacities, nodeArc = _arcNetwork(links, topology)
+        linkRouters = set(linkStart.tolist()) | set(linkEnd.tolist())
+
+        # Commodities between routers that no link touches can not be routed
+        significant_flowTraffic = {
+            flow: value
+            for flow, value in significant_flowTraffic.items()
+            if all(
+                topology.routerIds.get(router) in linkRouters
+                for router in flow.split(";")
+            )
+        }
+        commodities = list(significant_flowTraffic)
+
+        numNodes = topology.numRouters
+        numEdges = len(capacities)
+        numCommodities = len(commodities)
+
+        # Supply of each commodity at each node, the demand leaves the source and enters the target
+        commodityIds = np.arange(numCommodities)
+        sources = [topology.routerIds[flow.split(";")[0]] for flow in commodities]
+        targets = [topology.routerIds[flow.split(";")[1]] for flow in commodities]
+        demands = np.fromiter(
+            significant_flowTraffic.values(), dtype=np.float64, count=numCommodities
         )
+        supply = np.zeros((numCommodities, numNodes))
+        supply[commodityIds, sources] = demands
+        supply[commodityIds, targets] = -demands
 
         logger.info(
-            f"adding flow constraints for {len(significant_flowTraffic):,} flows and {len(nodes):,} nodes"
+            f"adding vars for flow: {numCommodities:,} and edges: {numEdges:,} so {numCommodities * numEdges:,} flowVars in total"
         )
-
-        m.addConstrs(
-            (
-                (
-                    flowVars.sum(flow, "*", node) + traffic[flow, node]
-                    == flowVars.sum(flow, node, "*")
-                    if (flow, node) in traffic
-                    else flowVars.sum(flow, "*", node) == flowVars.sum(flow, node, "*")
-                )
-                for flow in significant_flowTraffic
-                for node in nodes
-            ),
-            "flow",
+        sparseModel = _arcModel(
+            nodeArc, capacities, supply, _arcNames(linkStart, linkEnd, topology)
         )
 
-        logger.info(f"adding utilization constraints for {len(edges):,} edges")
-
-        # Constraints to set the flow through each link as the sum of flows for all traffic pairs
-        for start, end in edges:
-            linkFlow = gp.quicksum(
-                flowVars[flow, start, end]
-                for flow in significant_flowTraffic
-                if (flow, start, end) in flowVars
-            )
-
-            m.addConstr(
-                linkFlow
-                == utilization[f"{start};{end}"] * links[f"{start};{end}"]["capacity"],
-                f"util_{start};{end}",
-            )
-
-        m.write("multiCommodityFlowProblem.lp")
-        m.optimize()
+    backend = solver.getBackend(CalcType.PATHS.value, parserArgs.solver_backend)
+    result = backend.solve(
+        sparseModel,
+        "multiCommodityFlowProblem.lp" if parserArgs.save_lp_models else None,
+    )
 
-        # Define the threshold percentage (e.g., 10%)
-        threshold_percentage = 1 - NETFLOW_PATHS_THRESHOLD
+    # Define the threshold percentage (e.g., 10%)
+    threshold_percentage = 1 - NETFLOW_PATHS_THRESHOLD
 
-        if m.Status == gp.GRB.OPTIMAL:
-            solution = m.getAttr("X", flowVars)
+    if result.optimal:
+        with timing.stage("extract"):
+            solution = result.values["flow"].reshape(numCommodities, numEdges)
             flow_values = {
-                (flow, i, j): solution[flow, i, j]
-                for flow in significant_flowTraffic
-                for i, j in edges
-                if solution[flow, i, j] > 0
+                (
+                    commodities[k],
+                    topology.routerNames[linkStart[e]],
+                    topology.routerNames[linkEnd[e]],
+                ): solution[k, e]
+                for k, e in zip(*np.nonzero(solution > 0))
             }
 
             unique_flows = set()
@@ -163,63 +146,693 @@ def optMC(parserArgs, links, flowTraffic, timestamp):
                         unique_flows.add(flow)
                     new_flow_values[(flow, start, end)] = value
 
-            logger.info(f"Flows before paths cut-off: {len(significant_flowTraffic)}")
-            logger.info(f"Flows after paths cut-off: {len(unique_flows)}")
+        logger.info(f"Flows before paths cut-off: {len(significant_flowTraffic)}")
+        logger.info(f"Flows after paths cut-off: {len(unique_flows)}")
 
-            flow_values = new_flow_values
+        flow_values = new_flow_values
 
-            # Calculate ratios for all flows
-            # calculate time taken to calculate ratios
-            startTime = pd.Timestamp.now()
+        # Calculate ratios for all flows
+        # calculate time taken to calculate ratios
+        startTime = pd.Timestamp.now()
+        with timing.stage("decompose"):
             all_paths_with_ratios = calculate_ratios_for_all_flows(
                 flow_values, significant_flowTraffic, timestamp
             )
-            endTime = pd.Timestamp.now()
+        endTime = pd.Timestamp.now()
+
+        logger.info(f"Time taken to calculate ratios: {endTime - startTime}")
+
+        dataUtils.writeDataToFile(
+            pd.DataFrame(
+                all_paths_with_ratios,
+                columns=["timestamp", "flowName", "path", "ratio"],
+            ),
+            "ratioData",
+            parserArgs,
+        )
+
+    return
+
+
+def optMCSourceAggregated(parserArgs, links, flowTraffic, timestamp, topology):
+    """
+    Runs the multi-commodity flow problem with one commodity per source router instead of one per
+    source-destination pair, with the solver backend of the paths model. Writes a file with the new
+    paths and their ratios.
+
+    The traffic of a source to all of its destinations shares one set of arc flows, so the model has
+    sources x links flow variables instead of pairs x links, and every flow with traffic between
+    connected routers is routed without the flow threshold of `optMC`. The arc flows of each source are decomposed into paths to
+    each of its destinations, see `_decomposeSource`.
+
+    ### Parameters:
+    ----------
+    #### parserArgs: argparse.Namespace
+    The parser arguments.
 
-            logger.info(f"Time taken to calculate ratios: {endTime - startTime}")
+    #### links: dict
+    The links in the network, indexed by linkName.
 
-            dataUtils.writeDataToFile(
-                pd.DataFrame(
-                    all_paths_with_ratios,
-                    columns=["timestamp", "flowName", "path", "ratio"],
-                ),
-                "ratioData",
-                parserArgs,
+    #### flowTraffic: dict
+    The traffic for each source-destination pair.
+
+    #### timestamp: string
+    The timestamp for the current data.
+
+    #### topology: Topology
+    The compiled topology of the day.
+    """
+    import pandas as pd
+
+    # scipy.sparse.csgraph is only imported by the workers that aggregate sources
+    from scipy.sparse.csgraph import shortest_path
+
+    with timing.stage("build"):
+        linkStart, linkEnd, capacities, nodeArc = _arcNetwork(links, topology)
+        linkRouters = set(linkStart.tolist()) | set(linkEnd.tolist())
+
+        # Flows between routers that no link touches can not be routed
+        routedTraffic = {
+            flow: value
+            for flow, value in flowTraffic.items()
+            if value > 0
+            and all(topology.routerIds.get(r) in linkRouters for r in flow.split(";"))
+        }
+        flowSources = np.array(
+            [topology.routerIds[flow.split(";")[0]] for flow in routedTraffic],
+            dtype=np.int64,
+        )
+        flowTargets = np.array(
+            [topology.routerIds[flow.split(";")[1]] for flow in routedTraffic],
+            dtype=np.int64,
+        )
+
+        # Nor can flows whose destination no links lead to from their source, which would make every
+        # flow of the hour infeasible as all of them are routed
+        sources, flowCommodity = np.unique(flowSources, return_inverse=True)
+        hops = shortest_path(
+            sp.csr_matrix(
+                (np.ones(len(linkStart)), (linkStart, linkEnd)),
+                shape=(topology.numRouters, topology.numRouters),
+            ),
+            unweighted=True,
+            indices=sources,
+        )
+        reachable = np.isfinite(hops[flowCommodity, flowTargets])
+        if not reachable.all():
+            logger.warning(
+                f"Skipping {np.count_nonzero(~reachable)} flows without a path between their routers"
             )
+            routedTraffic = {
+                flow: value
+                for flow, value, keep in zip(
+                    routedTraffic, routedTraffic.values(), reachable
+                )
+                if keep
+            }
+            flowSources = flowSources[reachable]
+            flowTargets = flowTargets[reachable]
+            sources, flowCommodity = np.unique(flowSources, return_inverse=True)
+
+        demands = np.fromiter(
+            routedTraffic.values(), dtype=np.float64, count=len(routedTraffic)
+        )
 
+        # Supply of each source commodity at each node, its traffic leaves the source and enters
+        # each destination
+        supply = np.zeros((len(sources), topology.numRouters))
+        np.add.at(supply, (flowCommodity, flowSources), demands)
+        np.add.at(supply, (flowCommodity, flowTargets), -demands)
+
+        logger.info(
+            f"adding vars for {len(sources):,} sources of {len(routedTraffic):,} flows and {len(capacities):,} edges, so {len(sources) * len(capacities):,} flowVars in total"
+        )
+        sparseModel = _arcModel(
+            nodeArc, capacities, supply, _arcNames(linkStart, linkEnd, topology)
+        )
+
+    backend = solver.getBackend(CalcType.PATHS.value, parserArgs.solver_backend)
+    result = backend.solve(
+        sparseModel,
+        "multiCommodityFlowProblem.lp" if parserArgs.save_lp_models else None,
+    )
+    if not result.optimal:
         return
 
+    with timing.stage("decompose"):
+        solution = result.values["flow"].reshape(len(sources), len(capacities))
+        flowNames = list(routedTraffic)
+        all_paths_with_ratios = []
+        for k, source in enumerate(sources):
+            flowIds = np.flatnonzero(flowCommodity == k)
+            arcs = np.flatnonzero(solution[k] > FLOW_TOLERANCE * supply[k, source])
+            adjacency = {}
+            for e in arcs:
+                adjacency.setdefault(linkStart[e], {})[linkEnd[e]] = solution[k, e]
+
+            sourcePaths = _decomposeSource(
+                adjacency,
+                source,
+                dict(zip(flowTargets[flowIds].tolist(), demands[flowIds].tolist())),
+                FLOW_TOLERANCE * supply[k, source],
+            )
+            for f in flowIds:
+                paths = sourcePaths[flowTargets[f]]
+                total = sum(value for _, value in paths)
+
+                # Drop paths carrying a negligible share of their flow and renormalize the rest
+                paths = [
+                    (path, value)
+                    for path, value in paths
+                    if value >= (1 - NETFLOW_PATHS_THRESHOLD) * total
+                ]
+                total = sum(value for _, value in paths)
+                for path, value in paths:
+                    all_paths_with_ratios.append(
+                        [
+                            timestamp,
+                            flowNames[f],
+                            ";".join(topology.routerNames[r] for r in path),
+                            value / total,
+                        ]
+                    )
+
+    logger.info(
+        f"Decomposed {len(routedTraffic):,} flows into {len(all_paths_with_ratios):,} paths"
+    )
+
+    dataUtils.writeDataToFile(
+        pd.DataFrame(
+            all_paths_with_ratios,
+            columns=["timestamp", "flowName", "path", "ratio"],
+        ),
+        "ratioData",
+        parserArgs,
+    )
+
+
+def _arcNetwork(links, topology):
+    """
+    Returns the arcs of the multi-commodity flow problem, one per link of the hour.
 
-def find_paths(flow_values, flowName, source, target):
-    paths = []
-    queue = deque([(source, [source], float("inf"))])
-    visited = set()
-    while queue:
-        node, path, flow = queue.popleft()
+    ### Returns:
+    ----------
+    The start and end router ids and the capacity of each link, and the node x arc incidence matrix,
+    +1 where the arc leaves the node and -1 where it enters it.
+    """
+    linkIds, linkStart, linkEnd = topology.linkArrays(list(links))
+    capacities = np.fromiter(
+        (links[link]["capacity"] for link in links),
+        dtype=np.float64,
+        count=len(links),
+    )
+
+    numEdges = len(linkIds)
+    edgeIds = np.arange(numEdges)
+    nodeArc = sp.csr_matrix(
+        (
+            np.r_[np.ones(numEdges), -np.ones(numEdges)],
+            (np.r_[linkStart, linkEnd], np.r_[edgeIds, edgeIds]),
+        ),
+        shape=(topology.numRouters, numEdges),
+    )
+
+    return linkStart, linkEnd, capacities, nodeArc
+
+
+def _decomposeSource(adjacency, source, targetDemands, tolerance):
+    """
+    Decomposes the arc flows of a source commodity into paths to each of its destinations.
 
-        if (node, flow) in visited:
-            continue
-        visited.add((node, flow))
+    The paths to each destination, largest demand first, are found with `_findFlowPath` over the arcs
+    that still carry flow and take the smaller of their bottleneck flow and the demand of the
+    destination not yet covered. Taking the flow of a path off every arc keeps the remaining flow
+    balanced at each node, so destinations routed through other destinations are decomposed the same.
+
+    ### Parameters:
+    ----------
+    #### adjacency: dict
+    The flow of the commodity on each arc, as {start: {end: flow}}. Consumed by the decomposition.
+
+    #### source: int
+    The source router of the commodity.
+
+    #### targetDemands: dict
+    The traffic of the source to each destination router.
+
+    #### tolerance: float
+    The flow below which an arc or a demand counts as empty.
+
+    ### Returns:
+    ----------
+    A dictionary with a list of (path, flow) tuples for each destination, with the path as a list of routers.
+    """
+    paths = {target: [] for target in targetDemands}
+    for target, demand in sorted(
+        targetDemands.items(), key=lambda item: item[1], reverse=True
+    ):
+        while demand > tolerance:
+            path = _findFlowPath(adjacency, source, target)
+            if path is None:
+                break
+
+            arcs = list(zip(path, path[1:]))
+            flow = min(demand, *(adjacency[start][end] for start, end in arcs))
+            for start, end in arcs:
+                adjacency[start][end] -= flow
+                if adjacency[start][end] <= tolerance:
+                    del adjacency[start][end]
+
+            paths[target].append((path, flow))
+            demand -= flow
+
+    return paths
+
+
+def _arcNames(linkStart, linkEnd, topology):
+    """
+    Returns the 'start;end' name of each arc.
+    """
+    return [
+        f"{topology.routerNames[start]};{topology.routerNames[end]}"
+        for start, end in zip(linkStart, linkEnd)
+    ]
+
+
+def _arcModel(nodeArc, capacities, supply, arcNames):
+    """
+    Returns the squared utilization arc-flow model of the multi-commodity flow problem.
+
+    ### Parameters:
+    ----------
+    #### nodeArc: scipy.sparse.csr_matrix
+    The node x arc incidence matrix, +1 where the arc leaves the node and -1 where it enters it.
+
+    #### capacities: numpy.ndarray
+    The capacity of each arc.
+
+    #### supply: numpy.ndarray
+    The commodity x node matrix of the traffic each commodity sends from, positive, or to, negative,
+    each node.
+
+    #### arcNames: list
+    The name of each arc, 'start;end', which names its capacity and utilization constraints.
+
+    ### Returns:
+    ----------
+    The model as a `solver.SparseModel`, with the flow variables stacked commodity by commodity in the
+    'flow' block, flow[k * numEdges + e].
+    """
+    numCommodities = supply.shape[0]
+    numEdges = len(capacities)
+
+    sparseModel = solver.SparseModel("netflow")
+    sparseModel.addVars("flow", numCommodities * numEdges)
+    sparseModel.addVars("Utilization", numEdges)
+    sparseModel.addQuadraticObjective("Utilization", 1)
+
+    logger.info(f"adding capacity constraints for {numEdges:,} edges")
+
+    # Sums the flow of every commodity on each edge
+    linkFlow = sp.kron(np.ones((1, numCommodities)), sp.eye(numEdges), format="csr")
+    sparseModel.addConstrs("cap", [("flow", linkFlow)], "<=", capacities)
+
+    logger.info(
+        f"adding flow constraints for {numCommodities:,} flows and {nodeArc.shape[0]:,} nodes"
+    )
+
+    sparseModel.addConstrs(
+        "flow",
+        [("flow", sp.kron(sp.eye(numCommodities), nodeArc, format="csr"))],
+        "==",
+        supply.ravel(),
+    )
+
+    logger.info(f"adding utilization constraints for {numEdges:,} edges")
+
+    # Constraints to set the flow through each link as the sum of flows for all traffic pairs
+    sparseModel.addConstrs(
+        "util",
+        [("flow", linkFlow), ("Utilization", -sp.diags(capacities))],
+        "==",
+        0,
+    )
+    for prefix in ["cap", "util"]:
+        sparseModel.nameConstrs(prefix, [f"{prefix}_{arc}" for arc in arcNames])
+
+    return sparseModel
+
+
+def optMCColumnGeneration(parserArgs, links, flows, flowTraffic, timestamp, topology):
+    """
+    Runs the multi-commodity flow problem as a path-based model solved by column generation. Writes a file with the new paths and their ratios.
+
+    The restricted model is the squared utilization model of `optimizer.runLinearOptimizationModel`, starting from
+    the paths read with `data.readFlows`. After each solve, new paths are priced with shortest path searches on the
+    link duals and added to the model, until no path has a negative reduced cost. Every commodity with traffic is
+    routed, so no flow threshold is applied.
+
+    If the initial paths can not route the hour within the link capacities, a phase 1 first lets each link overflow
+    its capacity and prices in paths that minimize the total overflow. The hour is infeasible if overflow is left once
+    no path improves it, otherwise the squared model continues from the paths phase 1 added.
+
+    ### Parameters:
+    ----------
+    #### parserArgs: argparse.Namespace
+    The parser arguments.
+
+    #### links: dict
+    The links in the network, indexed by linkName.
+
+    #### flows: dict
+    The paths for each source-destination pair, used as the initial columns.
+
+    #### flowTraffic: dict
+    The traffic for each source-destination pair.
+
+    #### timestamp: string
+    The timestamp for the current data.
+
+    #### topology: Topology
+    The compiled topology of the day.
+    """
+    import pandas as pd
+
+    # Column generation always solves with Gurobi, which is only imported by the workers that use it
+    import gurobipy as gp
+
+    with timing.stage("build"):
+        linkNames = list(links)
+        linkIds, linkStart, linkEnd = topology.linkArrays(linkNames)
+        linkRouters = set(linkStart.tolist()) | set(linkEnd.tolist())
+        capacities = np.fromiter(
+            (links[link]["capacity"] for link in linkNames),
+            dtype=np.float64,
+            count=len(linkNames),
+        )
+        graphLinks = (linkStart, linkEnd)
+
+        commodities = [
+            flow
+            for flow, value in flowTraffic.items()
+            if value > 0
+            and all(topology.routerIds.get(r) in linkRouters for r in flow.split(";"))
+        ]
+        sources = np.array(
+            [topology.routerIds[flow.split(";")[0]] for flow in commodities], dtype=int
+        )
+        targets = np.array(
+            [topology.routerIds[flow.split(";")[1]] for flow in commodities], dtype=int
+        )
+        columns = {
+            flow: list(dict.fromkeys(flows.get(flow, []))) for flow in commodities
+        }
+
+        # Commodities without any path are seeded with their shortest path in hops
+        missing = [k for k, flow in enumerate(commodities) if not columns[flow]]
+        if missing:
+            hopPaths = _shortestPaths(
+                topology,
+                graphLinks,
+                np.ones(len(linkNames)),
+                sources[missing],
+                targets[missing],
+            )
+            for k, (path, _) in zip(missing, hopPaths):
+                if path is None:
+                    logger.warning(f"No path found for {commodities[k]}, dropping flow")
+                    del columns[commodities[k]]
+                else:
+                    columns[commodities[k]].append(path)
+
+            keep = [k for k, flow in enumerate(commodities) if flow in columns]
+            commodities = [commodities[k] for k in keep]
+            sources, targets = sources[keep], targets[keep]
+
+        hourPaths = topology.compileHour(columns)
+        demands = hourPaths.flowTraffic(flowTraffic)
+        loadMatrix = (
+            hourPaths.incidence()[linkIds] @ sp.diags(demands[hourPaths.pathFlow])
+        ).tocsr()
+
+        # Row of each topology link in the model, priced paths only use the links of the hour
+        linkRows = np.full(topology.numLinks, -1, dtype=np.int64)
+        linkRows[linkIds] = np.arange(len(linkIds))
+
+    with gp.Model("netflow_paths", env=getEnv()) as m:
+        with timing.stage("build"):
+            path_ratios, cap, util, split = linOpt._addMatrixModel(
+                m,
+                CalcType.SQUARED.value,
+                loadMatrix,
+                capacities,
+                hourPaths.flowPathMatrix(),
+            )
+            capConstrs, utilConstrs, splitConstrs = (
+                cap.tolist(),
+                util.tolist(),
+                split.tolist(),
+            )
+            # Overflow of each link over its capacity, only allowed in phase 1
+            overflow = [
+                m.addVar(
+                    ub=0, column=gp.Column([-1.0], [constr]), name=f"Overflow[{e}]"
+                )
+                for e, constr in enumerate(capConstrs)
+            ]
+        pathVars = path_ratios.tolist()
+        pathFlow = hourPaths.pathFlow.tolist()
+        pathNames = list(hourPaths.paths)
+        flowPaths = [set(columns[flow]) for flow in commodities]
+        # The squared objective, set aside while phase 1 minimizes the overflow
+        squaredObjective = None
+        phaseOne = False
 
-        if node == target:
-            paths.append((path, flow))
+        logger.info(
+            f"Started column generation with {len(commodities):,} flows and {len(pathVars):,} paths"
+        )
+
+        for iteration in range(1, NETFLOW_CG_MAX_ITERATIONS + 1):
+            with timing.stage("solve"):
+                m.optimize()
+            timing.countModel(m)
+
+            if (
+                m.Status in [gp.GRB.INFEASIBLE, gp.GRB.INF_OR_UNBD]
+                and squaredObjective is None
+            ):
+                logger.info(
+                    "The initial paths overload the links, starting column generation with phase 1"
+                )
+                phaseOne = True
+                squaredObjective = m.getObjective()
+                m.setAttr("UB", overflow, [gp.GRB.INFINITY] * len(overflow))
+                m.setObjective(gp.quicksum(overflow))
+                with timing.stage("solve"):
+                    m.optimize()
+                timing.countModel(m)
+
+            if m.Status != gp.GRB.OPTIMAL:
+                logger.error(
+                    f"Column generation ended with status {m.Status} in iteration {iteration}"
+                )
+                return
+
+            # A path's reduced cost is its traffic times its length under these link weights, minus its flow dual
+            linkWeights = np.maximum(
+                -np.asarray(m.getAttr("Pi", capConstrs))
+                - np.asarray(m.getAttr("Pi", utilConstrs)),
+                0,
+            )
+            flowDuals = np.asarray(m.getAttr("Pi", splitConstrs))
+
+            added = 0
+            with timing.stage("pricing"):
+                pricedPaths = _shortestPaths(
+                    topology, graphLinks, linkWeights, sources, targets
+                )
+            for k, (path, length) in enumerate(pricedPaths):
+                reducedCost = demands[k] * length - flowDuals[k]
+                if path is None or path in flowPaths[k]:
+                    continue
+                if reducedCost >= -CG_TOLERANCE * max(1, abs(flowDuals[k])):
+                    continue
+
+                pathLinks = linkRows[topology.pathLinkIds(topology.addPath(path))]
+                column = gp.Column(
+                    [demands[k]] * (2 * len(pathLinks)) + [1],
+                    [capConstrs[e] for e in pathLinks]
+                    + [utilConstrs[e] for e in pathLinks]
+                    + [splitConstrs[k]],
+                )
+                pathVars.append(
+                    m.addVar(column=column, name=f"PathRatios[{len(pathVars)}]")
+                )
+                pathFlow.append(k)
+                pathNames.append(path)
+                flowPaths[k].add(path)
+                added += 1
+
+            logger.info(
+                f"Column generation iteration {iteration}{' (phase 1)' if phaseOne else ''}: objective {m.ObjVal}, added {added:,} paths"
+            )
+
+            if added == 0 and not phaseOne:
+                break
+            if added == 0:
+                # No path lowers the overflow, so every routing of the hour overloads a link
+                if m.ObjVal > CG_TOLERANCE * capacities.max():
+                    logger.error(
+                        f"Model is infeasible, every routing overloads the links by {m.ObjVal:.6g} in total"
+                    )
+                    return
+
+                logger.info(
+                    f"Phase 1 routed the hour within the capacities after {iteration} iterations"
+                )
+                phaseOne = False
+                m.setAttr("UB", overflow, [0.0] * len(overflow))
+                m.setObjective(squaredObjective)
+        else:
+            logger.warning(
+                f"Column generation stopped after {NETFLOW_CG_MAX_ITERATIONS} iterations"
+            )
+            if phaseOne:
+                logger.error(
+                    "Column generation did not route the hour within the capacities"
+                )
+                return
+
+        with timing.stage("extract"):
+            ratios = np.asarray(m.getAttr("X", pathVars))
+
+    with timing.stage("extract"):
+        # Drop paths carrying a negligible share of their flow and renormalize the rest
+        pathFlow = np.asarray(pathFlow)
+        ratios[ratios < 1 - NETFLOW_PATHS_THRESHOLD] = 0
+        totals = np.bincount(pathFlow, weights=ratios, minlength=len(commodities))
+
+        all_paths_with_ratios = [
+            [timestamp, commodities[k], pathNames[p], ratios[p] / totals[k]]
+            for p, k in enumerate(pathFlow)
+            if ratios[p] > 0
+        ]
+
+    dataUtils.writeDataToFile(
+        pd.DataFrame(
+            all_paths_with_ratios,
+            columns=["timestamp", "flowName", "path", "ratio"],
+        ),
+        "ratioData",
+        parserArgs,
+    )
+
+
+def _shortestPaths(topology, graphLinks, linkWeights, sources, targets):
+    """
+    Finds the shortest path of each source-target pair over the links in `graphLinks`, a tuple
+    of start and end router ids, with the given link weights.
+
+    ### Returns:
+    ----------
+    A list with the path string and its length for each pair, or None and inf if the target is unreachable.
+    """
+    # scipy.sparse.csgraph is only imported by the workers that price paths
+    from scipy.sparse.csgraph import dijkstra
+
+    graph = sp.csr_matrix(
+        (linkWeights, graphLinks),
+        shape=(topology.numRouters, topology.numRouters),
+    )
+    uniqueSources, sourceRows = np.unique(sources, return_inverse=True)
+    distances, predecessors = dijkstra(
+        graph, indices=uniqueSources, return_predecessors=True
+    )
+
+    paths = []
+    for row, target in zip(sourceRows, targets):
+        length = distances[row, target]
+        if np.isinf(length):
+            paths.append((None, length))
             continue
 
-        for (flow_id, start, end), f in flow_values.items():
-            if start == node and flow_id == flowName and (end, f) not in visited:
-                new_flow = min(flow, f)
-                if new_flow > 0:
-                    queue.append((end, path + [end], new_flow))
+        routers = [target]
+        while predecessors[row, routers[-1]] >= 0:
+            routers.append(predecessors[row, routers[-1]])
+        paths.append(
+            (";".join(topology.routerNames[r] for r in reversed(routers)), length)
+        )
 
     return paths
 
 
+def find_paths(adjacency, source, target):
+    """
+    Decomposes the flow of one commodity into paths, by repeatedly finding a path from the source
+    to the target over arcs that still carry flow and subtracting its bottleneck flow from them.
+
+    ### Parameters:
+    ----------
+    #### adjacency: dict
+    The flow of the commodity on each arc, as {start: {end: flow}}. Consumed by the decomposition.
+
+    #### source: string
+    The source router of the commodity.
+
+    #### target: string
+    The target router of the commodity.
+
+    ### Returns:
+    ----------
+    A list of (path, flow) tuples, with the path as a list of routers.
+    """
+    paths = []
+    while True:
+        path = _findFlowPath(adjacency, source, target)
+        if path is None:
+            break
+
+        flow = min(adjacency[start][end] for start, end in zip(path, path[1:]))
+        for start, end in zip(path, path[1:]):
+            adjacency[start][end] -= flow
+            if adjacency[start][end] <= 0:
+                del adjacency[start][end]
+
+        paths.append((path, flow))
+
+    return paths
+
+
+def _findFlowPath(adjacency, source, target):
+    # Depth-first search over arcs with flow, a node that dead-ends is never expanded again
+    path = [source]
+    visited = {source}
+    arcs = [iter(adjacency.get(source, {}))]
+    while arcs:
+        end = next(arcs[-1], None)
+        if end is None:
+            arcs.pop()
+            path.pop()
+        elif end not in visited:
+            visited.add(end)
+            path.append(end)
+            if end == target:
+                return path
+            arcs.append(iter(adjacency.get(end, {})))
+    return None
+
+
 # Function to calculate ratios for all paths
 def calculate_ratios_for_all_flows(flow_values, flowTraffic, timestamp):
+    # Group the arc flows by commodity once, as {flow: {start: {end: flow}}}
+    adjacency = {}
+    for (flow_id, start, end), value in flow_values.items():
+        adjacency.setdefault(flow_id, {}).setdefault(start, {})[end] = value
+
     all_paths_with_ratios = []
-    for flow_id, flow_amount in flowTraffic.items():
+    for flow_id in flowTraffic:
         source, target = flow_id.split(";")
-        paths = find_paths(flow_values, flow_id, source, target)
+        paths = find_paths(adjacency.get(flow_id, {}), source, target)
         total_flow = sum(flow for _, flow in paths)
         # Ensure each path has its own flowName
         for path, flow in paths:
@@ -1,32 +1,38 @@
 from datetime import datetime
 import os
-import pandas as pd
-import gurobipy as gp
-
-from gurobipy import GRB
-from dotenv import load_dotenv
+import numpy as np
+import scipy.sparse as sp
 
 from nfopt.calc_type_enum import CalcType
+from nfopt.utils import config
 from nfopt.utils import log
 from nfopt.utils import data as dataUtils
+from nfopt.utils import timing
+from nfopt.utils.topology import Topology
+from nfopt.linear_optimization import presolve, solver
+from nfopt.linear_optimization.gurobi_env import getEnv
 
 logger = log.setupCustomLogger(__name__)
 
-load_dotenv("variables.env")
+config.load()
 
 DATA_OUTPUT_DIR = os.getenv("DATA_OUTPUT_DIR")
 OPT_MODELS_OUTPUT_DIR = "optimization_models"
 
-# Environment gurobi license variables
-options = {
-    "WLSACCESSID": os.getenv("WLSACCESSID"),
-    "WLSSECRET": os.getenv("WLSSECRET"),
-    "LICENSEID": int(os.getenv("LICENSEID")),
-}
+# Path ratios of the previous hour solved by the current process with a first-order backend, indexed
+# by model type and then by (flow, path), to warm-start the next hour in incremental mode
+_previousRatios = {}
 
 
 def runLinearOptimizationModel(
-    parserArgs, links, flows, traffic, timestamp, savelp=False
+    parserArgs,
+    links,
+    flows,
+    traffic,
+    timestamp,
+    savelp=False,
+    hourPaths=None,
+    topology=None,
 ):
     """
     Runs the linear optimization model to calculate the link utilization and the average link utilization.
@@ -45,145 +51,329 @@ def runLinearOptimizationModel(
     #### traffic: dict
     The traffic for each source-destination pair.
 
+    #### hourPaths: HourPaths
+    The paths of the hour compiled against `topology`, compiled from `flows` if not given.
+
+    #### topology: Topology
+    The compiled topology of the day, built from `links` if not given.
+
+    With `parserArgs.incremental`, the model of the previous hour solved by this process is updated
+    and warm-started instead of building a new one, or with the pgd backend, the hour starts from the
+    path ratios of the previous hour.
+
     ### Returns:
     ----------
     The total link utilization, the average link utilization, and the link utilization for each link.
     """
+    import pandas as pd
+
     logger.info("Started running linear optimization model...")
     model = parserArgs.model_type
 
-    with gp.Env(params=options) as env, gp.Model("network_optimization", env=env) as m:
-        # Decision variables for path ratios for each source-destination pair
-        path_ratios = m.addVars(
-            [
-                (sd, flows[sd][pathNum])
-                for sd in flows
-                for pathNum in range(len(flows[sd]))
-            ],
-            vtype=GRB.CONTINUOUS,
-            name="PathRatios",
+    with timing.stage("build"):
+        if topology is None:
+            topology = Topology(links)
+        if hourPaths is None:
+            hourPaths = topology.compileHour(flows)
+
+        linkNames, capacities, demands, linkIncidence = _hourArrays(
+            links, traffic, hourPaths, topology
         )
-        match model:
-            case CalcType.AVERAGE.value:
-                utilization = m.addVars(links, vtype=GRB.CONTINUOUS, name="Utilization")
-                m.setObjective(
-                    gp.quicksum((utilization[link] for link in links)),
-                    GRB.MINIMIZE,
-                )
-            case CalcType.MAX.value:
-                max_utilization = m.addVar(vtype=GRB.CONTINUOUS, name="MaxUtilization")
-                m.setObjective(max_utilization, GRB.MINIMIZE)
-            case CalcType.SQUARED.value:
-                utilization = m.addVars(links, vtype=GRB.CONTINUOUS, name="Utilization")
-                m.setObjective(
-                    gp.quicksum((utilization[link] ** 2 for link in links)),
-                    GRB.MINIMIZE,
-                )
-            case _:
-                raise ValueError(f"Invalid model: {model}")
-
-        # Constraints for each link's utilization
-        # Consists of the sum of ratios and traffic for each path related to the link
-        for link in links:
-            link_flow = gp.quicksum(
-                (
-                    path_ratios[sd, flows[sd][pathNum]] * traffic[sd]
-                    if link in flows[sd][pathNum]
-                    else 0
-                )
-                for sd in links[link]["listFlows"]
-                for pathNum in range(len(flows[sd]))
+        pathTraffic = demands[hourPaths.pathFlow]
+
+    lpFile = None
+    if savelp:
+        dayOutputDir = (
+            f"{DATA_OUTPUT_DIR}/day{parserArgs.day}/{OPT_MODELS_OUTPUT_DIR}/{model}"
+        )
+        if not os.path.exists(dayOutputDir):
+            os.makedirs(dayOutputDir)
+
+        ts = datetime.now().strftime("%Y%m%d")
+        time = (timestamp[:3] + timestamp[4:-6]).lower()
+        lpFile = f"{dayOutputDir}/{ts}_{time}.lp"
+
+    backendName = solver.backendName(model, parserArgs.solver_backend)
+    if parserArgs.incremental and backendName == solver.BACKEND_GUROBI:
+        ratios = _solveIncremental(
+            model, linkNames, capacities, hourPaths, linkIncidence, demands, lpFile
+        )
+    else:
+        with timing.stage("build"):
+            # Link x path matrix of the traffic each path puts on each link when its ratio is 1
+            loadMatrix = (linkIncidence @ sp.diags(pathTraffic)).tocsr()
+        with timing.stage("presolve"):
+            core = presolve.PresolvedHour(
+                loadMatrix, capacities, hourPaths.flowPathMatrix(), hourPaths.pathFlow
             )
+        core.logReduction()
 
-            m.addConstr(link_flow <= links[link]["capacity"], name=f"cap_{link}")
-
-            match model:
-                case CalcType.AVERAGE.value:
-                    m.addConstr(
-                        link_flow == links[link]["capacity"] * utilization[link],
-                        name=f"util_{link}",
-                    )
-                case CalcType.MAX.value:
-                    m.addConstr(
-                        link_flow / links[link]["capacity"] <= max_utilization,
-                        name=f"util_{link}",
-                    )
-                case CalcType.SQUARED.value:
-                    m.addConstr(
-                        link_flow == utilization[link] * links[link]["capacity"],
-                        name=f"util_{link}",
-                    )
-                case _:
-                    raise ValueError(f"Invalid model: {model}")
-
-        for sd in traffic:
-            m.addConstr(path_ratios.sum(sd, "*") == 1, name=f"traffic_split_{sd}")
-
-        if savelp:
-            dayOutputDir = (
-                f"{DATA_OUTPUT_DIR}/day{parserArgs.day}/{OPT_MODELS_OUTPUT_DIR}/{model}"
+        pathKeys = None
+        start = None
+        if parserArgs.incremental:
+            # First-order backends start from the ratios of the previous hour solved by this process
+            pathKeys = list(
+                zip(
+                    (hourPaths.flowNames[f] for f in hourPaths.pathFlow),
+                    hourPaths.paths,
+                )
             )
-            if not os.path.exists(dayOutputDir):
-                os.makedirs(dayOutputDir)
+            previous = _previousRatios.get(model, {})
+            start = np.fromiter(
+                (previous.get(key, 0.0) for key in pathKeys),
+                dtype=np.float64,
+                count=len(pathKeys),
+            )[core.paths]
 
-            ts = datetime.now().strftime("%Y%m%d")
-            time = (timestamp[:3] + timestamp[4:-6]).lower()
-            m.write(f"{dayOutputDir}/{ts}_{time}.lp")
+        ratios = _solvePresolved(
+            model, core, parserArgs.solver_backend, linkNames, hourPaths, lpFile, start
+        )
 
-        logger.info("Started optimization...")
-        m.optimize()
-        logger.info("Finished optimization")
+        if parserArgs.incremental and ratios is not None:
+            _previousRatios[model] = dict(zip(pathKeys, ratios.tolist()))
 
-        # Output the results
-        ratioData = []
-        if m.status == GRB.OPTIMAL:
+    # Output the results
+    if ratios is not None:
+        with timing.stage("extract"):
             # debug and save optimal path ratios
-            for sd in flows:
-                logger.debug(f"Optimal path ratios for {sd}:")
-                for pathNum in range(len(flows[sd])):
-                    ratioData.append(
-                        [
-                            timestamp,
-                            sd,
-                            flows[sd][pathNum],
-                            path_ratios[sd, flows[sd][pathNum]].x,
-                        ]
-                    )
-                    logger.debug(
-                        f"   Path {pathNum}: {path_ratios[sd, flows[sd][pathNum]].x * 100} %"
-                    )
-
-            dataUtils.writeDataToFile(
-                pd.DataFrame(
-                    ratioData, columns=["timestamp", "flowName", "path", "ratio"]
-                ),
-                "ratioData",
-                parserArgs,
+            ratioData = []
+            for pathIndex, path in enumerate(hourPaths.paths):
+                sd = hourPaths.flowNames[hourPaths.pathFlow[pathIndex]]
+                ratioData.append([timestamp, sd, path, ratios[pathIndex]])
+                logger.debug(
+                    f"Optimal path ratio for {sd}, {path}: {ratios[pathIndex] * 100} %"
+                )
+            ratioData = pd.DataFrame(
+                ratioData, columns=["timestamp", "flowName", "path", "ratio"]
             )
 
             # Calculate link utilization
-            utils = {}
-
-            for link in links:
-                link_flow = sum(
-                    (
-                        path_ratios[sd, flows[sd][pathNum]].x * traffic[sd]
-                        if link in flows[sd][pathNum]
-                        else 0
-                    )
-                    for sd in links[link]["listFlows"]
-                    for pathNum in range(len(flows[sd]))
-                )
+            linkUtil = linkIncidence @ (ratios * pathTraffic) / capacities * 100
+
+        dataUtils.writeDataToFile(ratioData, "ratioData", parserArgs)
+
+        return dict(zip(linkNames, linkUtil.tolist()))
+
+
+def _hourArrays(links, traffic, hourPaths, topology):
+    """
+    Returns the arrays the path ratio models of an hour are built from.
+
+    ### Returns:
+    ----------
+    The link names, the capacity of each link, the traffic of each flow, and the link x path
+    incidence matrix with rows in the order of the link names.
+    """
+    linkNames = list(links)
+    capacities = np.fromiter(
+        (links[link]["capacity"] for link in linkNames),
+        dtype=np.float64,
+        count=len(linkNames),
+    )
+    demands = hourPaths.flowTraffic(traffic)
+    linkIncidence = hourPaths.incidence()[
+        [topology.linkIds[link] for link in linkNames]
+    ].tocsr()
+
+    return linkNames, capacities, demands, linkIncidence
+
+
+def _solvePresolved(
+    model, core, backends, linkNames, hourPaths, lpFile=None, start=None
+):
+    """
+    Solves the path ratio model over the contested core of the hour with the solver backend of the
+    model type.
+
+    ### Parameters:
+    ----------
+    #### core: presolve.PresolvedHour
+    The presolved hour.
+
+    #### start: numpy.ndarray
+    The ratios of the paths of the core to start from, for the backends that take a start.
+
+    ### Returns:
+    ----------
+    The ratio of each path of the hour, or None if the model was not solved to optimality.
+    """
+    if len(core.overloadedLinks):
+        logger.error("Model is infeasible")
+        logger.error("The following links are overloaded by flows with a single path:")
+        for link in core.overloadedLinks:
+            logger.error(linkNames[link])
+        return None
+
+    if core.empty:
+        return core.expand(np.empty(0))
+
+    with timing.stage("build"):
+        sparseModel = _pathModel(
+            model,
+            core.loadMatrix,
+            core.capacities,
+            core.splitMatrix,
+            core.background,
+            core.fixedMaxUtilization,
+        )
+        _nameConstrs(
+            sparseModel,
+            [linkNames[link] for link in core.links],
+            [hourPaths.flowNames[flow] for flow in core.flows],
+        )
+
+    backend = solver.getBackend(model, backends)
+    if start is not None:
+        solution = backend.solve(sparseModel, lpFile, start=start)
+    else:
+        solution = backend.solve(sparseModel, lpFile)
+
+    return core.expand(solution.values["PathRatios"]) if solution.optimal else None
 
-                utils[link] = link_flow / links[link]["capacity"] * 100
-
-            return utils
-        elif m.status == GRB.INFEASIBLE:
-            logger.error("Model is infeasible")
-            m.computeIIS()
-            logger.error("The following constraints cannot be satisfied:")
-            for c in m.getConstrs():
-                if c.IISConstr:
-                    logger.error(c.constrName)
-        else:
-            logger.error("Optimization ended with status %d" % m.status)
+
+def _solveIncremental(
+    model, linkNames, capacities, hourPaths, linkIncidence, demands, lpFile=None
+):
+    """
+    Solves the hour by updating and warm-starting the incremental Gurobi model of the current process.
+
+    ### Returns:
+    ----------
+    The ratio of each path of the hour, or None if the model was not solved to optimality.
+    """
+    # The incremental models and gurobipy are only imported by the workers that use them
+    from gurobipy import GRB
+    from nfopt.linear_optimization import incremental
+
+    with timing.stage("build"):
+        incModel = incremental.getModel(model, getEnv(), linkNames, capacities)
+        m = incModel.m
+        incModel.update(hourPaths, linkIncidence, demands)
+        m.update()
+    timing.countModel(m)
+
+    if lpFile is not None:
+        m.write(lpFile)
+
+    logger.info("Started optimization...")
+    with timing.stage("solve"):
+        m.optimize()
+    logger.info("Finished optimization")
+
+    if m.Status == GRB.OPTIMAL:
+        return incModel.ratios()
+
+    solver.logGurobiStatus(m, incModel.constrNames())
+    return None
+
+
+def _pathModel(
+    model,
+    loadMatrix,
+    capacities,
+    splitMatrix,
+    background=0.0,
+    fixedMaxUtilization=0.0,
+):
+    """
+    Returns the path ratio model of an hour, with the objective and the capacity, utilization and
+    traffic split constraints of the model type.
+
+    ### Parameters:
+    ----------
+    #### model: string
+    The optimization model to build, can be 'average', 'max' or 'squared'.
+
+    #### loadMatrix: scipy.sparse.csr_matrix
+    The link x path matrix of the traffic of each path on each link.
+
+    #### capacities: numpy.ndarray
+    The capacity of each link, aligned with the rows of `loadMatrix`.
+
+    #### splitMatrix: scipy.sparse.csr_matrix
+    The flow x path matrix mapping each path to its flow.
+
+    #### background: numpy.ndarray
+    The load of each link that does not depend on the path ratios, see `presolve.PresolvedHour`.
+
+    #### fixedMaxUtilization: float
+    The utilization of the links left out of the model, a lower bound of the max utilization.
+
+    ### Returns:
+    ----------
+    The model as a `solver.SparseModel`, with the path ratios in the 'PathRatios' block.
+    """
+    numLinks, numPaths = loadMatrix.shape
+    sparseModel = solver.SparseModel("network_optimization")
+
+    # Decision variables for path ratios for each source-destination pair
+    sparseModel.addVars("PathRatios", numPaths)
+    sparseModel.addConstrs(
+        "cap", [("PathRatios", loadMatrix)], "<=", capacities - background
+    )
+
+    match model:
+        case CalcType.AVERAGE.value | CalcType.SQUARED.value:
+            sparseModel.addVars("Utilization", numLinks)
+            if model == CalcType.AVERAGE.value:
+                sparseModel.addLinearObjective("Utilization", 1)
+            else:
+                sparseModel.addQuadraticObjective("Utilization", 1)
+            sparseModel.addConstrs(
+                "util",
+                [
+                    ("PathRatios", loadMatrix),
+                    ("Utilization", -sp.diags(capacities)),
+                ],
+                "==",
+                -background,
+            )
+        case CalcType.MAX.value:
+            sparseModel.addVars("MaxUtilization", 1, lb=fixedMaxUtilization)
+            sparseModel.addLinearObjective("MaxUtilization", 1)
+            sparseModel.addConstrs(
+                "util",
+                [
+                    ("PathRatios", sp.diags(1 / capacities) @ loadMatrix),
+                    ("MaxUtilization", -sp.csr_matrix(np.ones((numLinks, 1)))),
+                ],
+                "<=",
+                -background / capacities,
+            )
+        case _:
+            raise ValueError(f"Invalid model: {model}")
+
+    sparseModel.addConstrs("traffic_split", [("PathRatios", splitMatrix)], "==", 1)
+
+    return sparseModel
+
+
+def _addMatrixModel(m, model, loadMatrix, capacities, splitMatrix):
+    """
+    Adds the path ratio model of `_pathModel` to a Gurobi model using the matrix API, for solvers that
+    change the model after solving it, e.g. column generation.
+
+    ### Returns:
+    ----------
+    The MVar of the path ratios, and the MConstrs of the capacity, utilization and traffic split constraints.
+    """
+    variables, constrs = solver.addGurobiModel(
+        m, _pathModel(model, loadMatrix, capacities, splitMatrix)
+    )
+    return (
+        variables["PathRatios"],
+        constrs["cap"],
+        constrs["util"],
+        constrs["traffic_split"],
+    )
+
+
+def _nameConstrs(sparseModel, linkNames, flowNames):
+    """
+    Names the constraints after their links and flows, so saved LP models and IIS logs stay readable.
+    """
+    for prefix in ["cap", "util"]:
+        sparseModel.nameConstrs(prefix, [f"{prefix}_{link}" for link in linkNames])
+    sparseModel.nameConstrs(
+        "traffic_split", [f"traffic_split_{sd}" for sd in flowNames]
+    )
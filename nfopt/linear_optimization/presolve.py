@@ -0,0 +1,80 @@
+import numpy as np
+
+from nfopt.utils import log
+
+logger = log.setupCustomLogger(__name__)
+
+
+class PresolvedHour:
+    """
+    Contested core of the path ratio model of an hour.
+
+    Flows with a single path always send all of their traffic on it, so their paths are folded into a
+    constant background load of each link instead of getting a ratio and a traffic split constraint.
+    Links no path of the remaining flows crosses carry only background load, so their utilization is
+    known before solving and they are left out of the model. The model is built over the remaining
+    paths, flows and links, and `expand` maps its ratios back to every path of the hour.
+    """
+
+    def __init__(self, loadMatrix, capacities, splitMatrix, pathFlow):
+        """
+        ### Parameters:
+        ----------
+        #### loadMatrix: scipy.sparse.csr_matrix
+        The link x path matrix of the traffic of each path on each link.
+
+        #### capacities: numpy.ndarray
+        The capacity of each link, aligned with the rows of `loadMatrix`.
+
+        #### splitMatrix: scipy.sparse.csr_matrix
+        The flow x path matrix mapping each path to its flow.
+
+        #### pathFlow: numpy.ndarray
+        The flow of each path.
+        """
+        self.numPaths = loadMatrix.shape[1]
+        self.numLinks = loadMatrix.shape[0]
+
+        pathsPerFlow = np.diff(splitMatrix.indptr)
+        fixed = pathsPerFlow[pathFlow] == 1
+        self.paths = np.flatnonzero(~fixed)
+        self.flows = np.flatnonzero(pathsPerFlow > 1)
+
+        # Load of the single path flows, which does not depend on the ratios
+        background = loadMatrix @ fixed.astype(np.float64)
+        constantUtil = background / capacities
+
+        coreLoad = loadMatrix[:, self.paths].tocsr()
+        contested = np.diff(coreLoad.indptr) > 0
+        self.links = np.flatnonzero(contested)
+
+        self.loadMatrix = coreLoad[self.links]
+        self.capacities = capacities[self.links]
+        self.background = background[self.links]
+        self.splitMatrix = splitMatrix[self.flows][:, self.paths].tocsr()
+
+        # Utilization of the links left out of the model, a lower bound of the max utilization
+        self.fixedMaxUtilization = (
+            float(constantUtil[~contested].max()) if not contested.all() else 0.0
+        )
+        self.overloadedLinks = np.flatnonzero(~contested & (background > capacities))
+
+    @property
+    def empty(self):
+        """
+        True if every flow of the hour has a single path, so there is nothing to solve.
+        """
+        return len(self.paths) == 0
+
+    def expand(self, ratios):
+        """
+        Returns the ratio of every path of the hour from the ratios of the paths of the model.
+        """
+        allRatios = np.ones(self.numPaths)
+        allRatios[self.paths] = ratios
+        return allRatios
+
+    def logReduction(self):
+        logger.info(
+            f"Presolve kept {len(self.paths)} of {self.numPaths} paths and {len(self.links)} of {self.numLinks} links"
+        )
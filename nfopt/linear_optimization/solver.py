@@ -0,0 +1,946 @@
+import os
+import numpy as np
+import scipy.sparse as sp
+
+from nfopt.calc_type_enum import CalcType
+from nfopt.utils import config
+from nfopt.utils import log
+from nfopt.utils import timing
+from nfopt.linear_optimization.gurobi_env import getEnv
+
+logger = log.setupCustomLogger(__name__)
+
+config.load()
+
+BACKEND_GUROBI = "gurobi"
+BACKEND_HIGHS = "highs"
+BACKEND_SCIPY = "scipy"
+BACKEND_MWU = "mwu"
+BACKEND_PGD = "pgd"
+
+# Solver backend of every model type, overridden per model type by SOLVER_BACKEND_{MODEL}, e.g. SOLVER_BACKEND_AVERAGE
+SOLVER_BACKEND = os.getenv("SOLVER_BACKEND", BACKEND_GUROBI)
+
+# Relative gap between the max utilization of the mwu backend and its lower bound at which it stops
+MWU_EPSILON = float(os.getenv("MWU_EPSILON", 0.05))
+
+# Iterations after which the mwu backend stops without reaching MWU_EPSILON
+MWU_MAX_ITERATIONS = int(os.getenv("MWU_MAX_ITERATIONS", 2000))
+
+# Frank-Wolfe gap of the pgd backend, relative to its objective, at which it stops
+PGD_TOLERANCE = float(os.getenv("PGD_TOLERANCE", 1e-4))
+
+# Iterations after which the pgd backend stops, with the gap it reached
+PGD_MAX_ITERATIONS = int(os.getenv("PGD_MAX_ITERATIONS", 5000))
+
+STATUS_OPTIMAL = "optimal"
+STATUS_INFEASIBLE = "infeasible"
+# Status of a solution that overloads a link, from backends that do not enforce the capacities
+STATUS_OVERLOADED = "overloaded"
+# Status of a solution from an iterative backend that stopped at its iteration limit before its gap
+STATUS_ITERATION_LIMIT = "iteration_limit"
+
+# Backends of the current process, indexed by name
+_backends = {}
+
+
+class SparseModel:
+    """
+    Solver-independent description of a minimization model with a linear or separable quadratic
+    objective and blocks of sparse linear constraints.
+
+    The model is built once with numpy and scipy, and every backend translates the same description,
+    so the vectorised build of the path and multi-commodity models is shared by all solvers.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.numVars = 0
+        self.varBlocks = {}
+        self.linearObjective = {}
+        self.quadraticObjective = {}
+        self.constrBlocks = {}
+        self.constrNames = {}
+
+    @property
+    def numConstrs(self):
+        return sum(len(rhs) for _, _, rhs in self.constrBlocks.values())
+
+    @property
+    def numNonzeros(self):
+        return sum(
+            matrix.nnz
+            for terms, _, _ in self.constrBlocks.values()
+            for _, matrix in terms
+        )
+
+    @property
+    def quadratic(self):
+        return bool(self.quadraticObjective)
+
+    def addVars(self, name, size, lb=0.0, ub=np.inf):
+        """
+        Adds a block of `size` continuous variables with the given bounds.
+        """
+        self.varBlocks[name] = (self.numVars, size, lb, ub)
+        self.numVars += size
+
+    def addLinearObjective(self, block, coefficients):
+        """
+        Adds the sum of the coefficients times the variables of a block to the objective.
+        """
+        self.linearObjective[block] = np.broadcast_to(
+            np.asarray(coefficients, dtype=np.float64), self.varBlocks[block][1]
+        )
+
+    def addQuadraticObjective(self, block, coefficients):
+        """
+        Adds the sum of the coefficients times the squared variables of a block to the objective.
+        """
+        self.quadraticObjective[block] = np.broadcast_to(
+            np.asarray(coefficients, dtype=np.float64), self.varBlocks[block][1]
+        )
+
+    def addConstrs(self, name, terms, sense, rhs):
+        """
+        Adds a block of constraints, the sum of each matrix times its variable block compared to the
+        right-hand side.
+
+        ### Parameters:
+        ----------
+        #### terms: list
+        The (variable block, scipy.sparse matrix) pairs of the left-hand side.
+
+        #### sense: str
+        One of '<=', '==' or '>='.
+
+        #### rhs: numpy.ndarray
+        The right-hand side, one value per row.
+        """
+        if sense not in ["<=", "==", ">="]:
+            raise ValueError(f"Invalid constraint sense: {sense}")
+        rhs = np.asarray(rhs, dtype=np.float64)
+        self.constrBlocks[name] = (
+            [(block, sp.csr_matrix(matrix)) for block, matrix in terms],
+            sense,
+            np.broadcast_to(rhs, terms[0][1].shape[0]),
+        )
+
+    def nameConstrs(self, block, names):
+        """
+        Names the rows of a constraint block, used when the model is written to a file or its IIS is logged.
+        """
+        self.constrNames[block] = list(names)
+
+    def bounds(self):
+        """
+        Returns the lower and upper bound of every variable.
+        """
+        lower = np.empty(self.numVars)
+        upper = np.empty(self.numVars)
+        for start, size, lb, ub in self.varBlocks.values():
+            lower[start : start + size] = lb
+            upper[start : start + size] = ub
+        return lower, upper
+
+    def objective(self):
+        """
+        Returns the linear objective coefficients and the diagonal of the quadratic objective of every variable.
+        """
+        linear = np.zeros(self.numVars)
+        quadratic = np.zeros(self.numVars)
+        for coefficients, objective in [
+            (linear, self.linearObjective),
+            (quadratic, self.quadraticObjective),
+        ]:
+            for block, values in objective.items():
+                start, size, _, _ = self.varBlocks[block]
+                coefficients[start : start + size] = values
+        return linear, quadratic
+
+    def matrix(self):
+        """
+        Returns the constraint matrix over all variables and the lower and upper bound of every row.
+        """
+        rows = []
+        rowLower = []
+        rowUpper = []
+        for terms, sense, rhs in self.constrBlocks.values():
+            blocks = dict(terms)
+            rows.append(
+                sp.hstack(
+                    [
+                        blocks.get(block, sp.csr_matrix((len(rhs), size)))
+                        for block, (_, size, _, _) in self.varBlocks.items()
+                    ],
+                    format="csr",
+                )
+            )
+            rowLower.append(rhs if sense != "<=" else np.full(len(rhs), -np.inf))
+            rowUpper.append(rhs if sense != ">=" else np.full(len(rhs), np.inf))
+        return (
+            sp.vstack(rows, format="csr"),
+            np.concatenate(rowLower),
+            np.concatenate(rowUpper),
+        )
+
+    def split(self, x):
+        """
+        Splits a solution vector into the values of each variable block.
+        """
+        return {
+            block: np.asarray(x[start : start + size])
+            for block, (start, size, _, _) in self.varBlocks.items()
+        }
+
+
+class Solution:
+    """
+    The status of a solved `SparseModel`, with its objective value and the values of each variable
+    block if it was solved to optimality.
+    """
+
+    def __init__(self, status, objective=None, values=None):
+        self.status = status
+        self.objective = objective
+        self.values = values
+
+    @property
+    def optimal(self):
+        return self.status == STATUS_OPTIMAL
+
+
+def addGurobiModel(m, model):
+    """
+    Adds the variables, objective and constraints of a `SparseModel` to a Gurobi model using the matrix API.
+
+    ### Returns:
+    ----------
+    The MVar of each variable block and the MConstr of each constraint block.
+    """
+    from gurobipy import GRB
+
+    variables = {
+        block: m.addMVar(size, lb=lb, ub=ub, vtype=GRB.CONTINUOUS, name=block)
+        for block, (_, size, lb, ub) in model.varBlocks.items()
+    }
+
+    objective = 0
+    for block, coefficients in model.linearObjective.items():
+        objective = objective + coefficients @ variables[block]
+    for block, coefficients in model.quadraticObjective.items():
+        objective = (
+            objective + variables[block] @ sp.diags(coefficients) @ variables[block]
+        )
+    m.setObjective(objective, GRB.MINIMIZE)
+
+    constrs = {}
+    for name, (terms, sense, rhs) in model.constrBlocks.items():
+        lhs = sum(matrix @ variables[block] for block, matrix in terms)
+        match sense:
+            case "<=":
+                constrs[name] = m.addConstr(lhs <= rhs, name=name)
+            case "==":
+                constrs[name] = m.addConstr(lhs == rhs, name=name)
+            case ">=":
+                constrs[name] = m.addConstr(lhs >= rhs, name=name)
+
+    return variables, constrs
+
+
+def logGurobiStatus(m, constrNames=()):
+    """
+    Logs why a Gurobi model was not solved to optimality, with the constraints of its IIS if it is infeasible.
+
+    ### Parameters:
+    ----------
+    #### m: gurobipy.Model
+    The solved model.
+
+    #### constrNames: list
+    The (constraints, names) pairs named before the IIS is computed, so the names are only set when
+    the model is infeasible.
+    """
+    from gurobipy import GRB
+
+    if m.Status == GRB.INFEASIBLE:
+        logger.error("Model is infeasible")
+        for constrs, names in constrNames:
+            m.setAttr("ConstrName", constrs, names)
+        m.computeIIS()
+        logger.error("The following constraints cannot be satisfied:")
+        for c in m.getConstrs():
+            if c.IISConstr:
+                logger.error(c.constrName)
+    else:
+        logger.error("Optimization ended with status %d" % m.Status)
+
+
+class GurobiBackend:
+    """
+    Solves models with Gurobi, in the Gurobi environment of the current process.
+    """
+
+    name = BACKEND_GUROBI
+    quadratic = True
+
+    def __init__(self):
+        # gurobipy is only imported by the processes that solve with Gurobi
+        import gurobipy
+
+        self.gp = gurobipy
+
+    def solve(self, model, lpFile=None):
+        """
+        Solves a `SparseModel`, writing it to `lpFile` first if given.
+        """
+        gp = self.gp
+        GRB = gp.GRB
+
+        with gp.Model(model.name, env=getEnv()) as m:
+            with timing.stage("build"):
+                variables, constrs = addGurobiModel(m, model)
+                m.update()
+            timing.countModel(m)
+
+            constrNames = [
+                (constrs[block].tolist(), names)
+                for block, names in model.constrNames.items()
+            ]
+            if lpFile is not None:
+                for blockConstrs, names in constrNames:
+                    m.setAttr("ConstrName", blockConstrs, names)
+                m.write(lpFile)
+
+            logger.info("Started optimization...")
+            with timing.stage("solve"):
+                m.optimize()
+            logger.info("Finished optimization")
+
+            if m.Status == GRB.OPTIMAL:
+                return Solution(
+                    STATUS_OPTIMAL,
+                    m.ObjVal,
+                    {block: var.X for block, var in variables.items()},
+                )
+
+            logGurobiStatus(m, constrNames)
+            if m.Status == GRB.INFEASIBLE:
+                return Solution(STATUS_INFEASIBLE)
+            return Solution(str(m.Status))
+
+
+class HighsBackend:
+    """
+    Solves linear and quadratic models with the open-source HiGHS solver, through the optional highspy package.
+    """
+
+    name = BACKEND_HIGHS
+    quadratic = True
+
+    def __init__(self):
+        try:
+            import highspy
+        except ImportError:
+            raise ValueError(
+                "The highs solver backend requires the highspy package, install it with 'poetry install -E highs'"
+            )
+        self.highspy = highspy
+
+    def solve(self, model, lpFile=None):
+        """
+        Solves a `SparseModel`, writing it to `lpFile` first if given. Quadratic models are solved in the
+        form of `_eliminateQuadratic`.
+        """
+        highspy = self.highspy
+
+        with timing.stage("build"):
+            linear, quadratic = model.objective()
+            lower, upper = model.bounds()
+            matrix, rowLower, rowUpper = model.matrix()
+        timing.countSize(model.numVars, len(rowLower), matrix.nnz)
+
+        if lpFile is not None:
+            h = self._highs(
+                linear,
+                sp.diags(2 * quadratic) if model.quadratic else None,
+                lower,
+                upper,
+                matrix,
+                rowLower,
+                rowUpper,
+            )
+            row = 0
+            for block, (_, _, rhs) in model.constrBlocks.items():
+                for i, name in enumerate(model.constrNames.get(block, [])):
+                    h.passRowName(row + i, name)
+                row += len(rhs)
+            h.writeModel(lpFile)
+
+        with timing.stage("build"):
+            # Quadratic models are written as they are built, but solved in the form HiGHS solves reliably
+            if model.quadratic:
+                *restated, restore = _eliminateQuadratic(
+                    linear, quadratic, lower, upper, matrix, rowLower, rowUpper
+                )
+                h = self._highs(*restated)
+            elif lpFile is None:
+                h = self._highs(linear, None, lower, upper, matrix, rowLower, rowUpper)
+
+        logger.info("Started optimization...")
+        with timing.stage("solve"):
+            h.run()
+        logger.info("Finished optimization")
+
+        status = h.getModelStatus()
+        if status == highspy.HighsModelStatus.kOptimal:
+            x = np.asarray(h.getSolution().col_value)
+            objective = h.getInfo().objective_function_value
+            if model.quadratic:
+                x, objective = restore(x, objective)
+            return Solution(STATUS_OPTIMAL, objective, model.split(x))
+        elif status == highspy.HighsModelStatus.kInfeasible:
+            logger.error("Model is infeasible")
+            return Solution(STATUS_INFEASIBLE)
+
+        logger.error(f"Optimization ended with status {h.modelStatusToString(status)}")
+        return Solution(h.modelStatusToString(status))
+
+    def _highs(self, linear, hessian, lower, upper, matrix, rowLower, rowUpper):
+        """
+        Returns a HiGHS instance with the model passed, minimizing c'x + 1/2 x'Hx with the hessian H if given.
+        """
+        highspy = self.highspy
+        matrix = matrix.tocsc()
+        numVars = len(linear)
+
+        lp = highspy.HighsLp()
+        lp.num_col_ = numVars
+        lp.num_row_ = len(rowLower)
+        lp.col_cost_ = linear
+        lp.col_lower_ = lower
+        lp.col_upper_ = upper
+        lp.row_lower_ = rowLower
+        lp.row_upper_ = rowUpper
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.num_col_ = numVars
+        lp.a_matrix_.num_row_ = len(rowLower)
+        lp.a_matrix_.start_ = matrix.indptr
+        lp.a_matrix_.index_ = matrix.indices
+        lp.a_matrix_.value_ = matrix.data
+
+        h = highspy.Highs()
+        h.setOptionValue("output_flag", False)
+        if hessian is not None:
+            # HiGHS takes the lower triangle of the hessian by columns
+            hessian = sp.tril(hessian, format="csc")
+            highsModel = highspy.HighsModel()
+            highsModel.lp_ = lp
+            highsModel.hessian_.dim_ = numVars
+            highsModel.hessian_.format_ = highspy.HessianFormat.kTriangular
+            highsModel.hessian_.start_ = hessian.indptr
+            highsModel.hessian_.index_ = hessian.indices
+            highsModel.hessian_.value_ = hessian.data
+            h.passModel(highsModel)
+        else:
+            h.passModel(lp)
+        return h
+
+
+def _eliminateQuadratic(linear, quadratic, lower, upper, matrix, rowLower, rowUpper):
+    """
+    Restates a model with a separable quadratic objective over variables defined by equality rows, e.g.
+    the link utilizations of the squared and paths models, over the other variables only.
+
+    The active-set QP solver of HiGHS stalls on the models as built, whose hessian is zero for every
+    variable but the utilizations. Each quadratic variable u = (r - a'x) / a_u is substituted by the
+    equality row defining it, so the hessian is over the variables that carry the cost, and its bounds
+    become rows. The objective is scaled so the median of the diagonal of the hessian is 1, as the QP
+    solver also stalls on hessians with entries as small as those of the utilization of a path, and
+    scaling the largest entry to 1 still leaves the paths of small flows that small.
+
+    ### Returns:
+    ----------
+    The linear objective, hessian, bounds, constraint matrix and row bounds of the restated model, and
+    a function mapping its solution and objective value back to those of the model.
+    """
+    squared = np.flatnonzero(quadratic)
+    isSquared = np.zeros(len(quadratic), dtype=bool)
+    isSquared[squared] = True
+    others = np.flatnonzero(~isSquared)
+
+    # The equality row defining each quadratic variable, the only quadratic variable of the row
+    matrix = matrix.tocsc()
+    squaredPerRow = np.diff(matrix[:, squared].tocsr().indptr)
+    definingRows = np.full(len(squared), -1)
+    for i, var in enumerate(squared):
+        rows = matrix.indices[matrix.indptr[var] : matrix.indptr[var + 1]]
+        rows = rows[(rowLower[rows] == rowUpper[rows]) & (squaredPerRow[rows] == 1)]
+        if len(rows) == 0:
+            raise ValueError(
+                "The highs solver backend only solves quadratic models whose squared variables are defined by equality rows"
+            )
+        definingRows[i] = rows[0]
+
+    # u = offset - slope @ x over the other variables
+    matrix = matrix.tocsr()
+    pivots = np.asarray(matrix[definingRows, squared]).ravel()
+    offset = rowLower[definingRows] / pivots
+    slope = (sp.diags(1 / pivots) @ matrix[definingRows][:, others]).tocsr()
+
+    # c'x + c_u'u + u'Qu over the other variables, up to a constant
+    weights = quadratic[squared]
+    constant = linear[squared] @ offset + weights @ (offset * offset)
+    reducedLinear = (
+        linear[others] - slope.T @ linear[squared] - 2 * slope.T @ (weights * offset)
+    )
+    hessian = (2 * slope.T @ sp.diags(weights) @ slope).tocsc()
+    diagonal = hessian.diagonal()
+    diagonal = diagonal[diagonal > 0]
+    scale = 1 / np.median(diagonal) if len(diagonal) else 1.0
+
+    # The other rows with the quadratic variables substituted, and the bounds of the quadratic
+    # variables as rows
+    keep = np.ones(len(rowLower), dtype=bool)
+    keep[definingRows] = False
+    squaredTerms = matrix[keep][:, squared]
+    shift = squaredTerms @ offset
+    bounded = np.isfinite(lower[squared]) | np.isfinite(upper[squared])
+    reducedMatrix = sp.vstack(
+        [
+            matrix[keep][:, others] - squaredTerms @ slope,
+            -slope[bounded],
+        ],
+        format="csr",
+    )
+    reducedRowLower = np.r_[rowLower[keep] - shift, (lower[squared] - offset)[bounded]]
+    reducedRowUpper = np.r_[rowUpper[keep] - shift, (upper[squared] - offset)[bounded]]
+
+    def restore(x, objective):
+        values = np.empty(len(quadratic))
+        values[others] = x
+        values[squared] = offset - slope @ x
+        return values, objective / scale + constant
+
+    return (
+        scale * reducedLinear,
+        scale * hessian,
+        lower[others],
+        upper[others],
+        reducedMatrix,
+        reducedRowLower,
+        reducedRowUpper,
+        restore,
+    )
+
+
+class ScipyBackend:
+    """
+    Solves linear models with `scipy.optimize.linprog`, which uses HiGHS and needs no extra package.
+    """
+
+    name = BACKEND_SCIPY
+    quadratic = False
+
+    def solve(self, model, lpFile=None):
+        from scipy.optimize import linprog
+
+        if model.quadratic:
+            raise ValueError("The scipy solver backend only solves linear models")
+        if lpFile is not None:
+            logger.warning("The scipy solver backend can not write models to a file")
+
+        with timing.stage("build"):
+            linear, _ = model.objective()
+            lower, upper = model.bounds()
+            matrix, rowLower, rowUpper = model.matrix()
+
+            # linprog takes equality rows and upper bounded rows, lower bounded rows are negated
+            equal = rowLower == rowUpper
+            upperRows = ~equal & np.isfinite(rowUpper)
+            lowerRows = ~equal & np.isfinite(rowLower)
+            inequalities = sp.vstack([matrix[upperRows], -matrix[lowerRows]])
+            inequalityRhs = np.r_[rowUpper[upperRows], -rowLower[lowerRows]]
+        timing.countSize(model.numVars, len(rowLower), matrix.nnz)
+
+        logger.info("Started optimization...")
+        with timing.stage("solve"):
+            result = linprog(
+                linear,
+                A_ub=inequalities if inequalities.shape[0] else None,
+                b_ub=inequalityRhs if inequalities.shape[0] else None,
+                A_eq=matrix[equal] if equal.any() else None,
+                b_eq=rowLower[equal] if equal.any() else None,
+                bounds=np.c_[lower, upper],
+                method="highs",
+            )
+        logger.info("Finished optimization")
+
+        if result.status == 0:
+            return Solution(STATUS_OPTIMAL, result.fun, model.split(result.x))
+        elif result.status == 2:
+            logger.error("Model is infeasible")
+            return Solution(STATUS_INFEASIBLE)
+
+        logger.error(
+            f"Optimization ended with status {result.status}: {result.message}"
+        )
+        return Solution(str(result.status))
+
+
+class MultiplicativeWeightsBackend:
+    """
+    Solves the max utilization model to within a relative gap of `MWU_EPSILON` with multiplicative
+    weights over the links, using only numpy and scipy.
+
+    Each iteration weighs the links by the exponential of their utilization, moves every flow towards
+    its cheapest path under the weights and line searches the step on the smoothed max utilization.
+    The weighted utilization of the cheapest paths is a lower bound of the LP optimum, so every
+    iteration knows its gap and the backend stops once it is below `MWU_EPSILON`. The capacities are
+    not enforced, so ratios that overload a link are returned with the overloaded status, and ratios
+    that did not reach the gap within `MWU_MAX_ITERATIONS` with the iteration limit status.
+    """
+
+    name = BACKEND_MWU
+    quadratic = False
+
+    def solve(self, model, lpFile=None):
+        if "MaxUtilization" not in model.varBlocks:
+            raise ValueError("The mwu solver backend only solves the max model")
+        if lpFile is not None:
+            logger.warning("The mwu solver backend can not write models to a file")
+
+        with timing.stage("build"):
+            # Utilization of each link per unit of ratio of each path, the utilization of each link that
+            # does not depend on the ratios, and the flow x path split matrix
+            terms, _, rhs = model.constrBlocks["util"]
+            utilMatrix = dict(terms)["PathRatios"].tocsr()
+            utilMatrixT = utilMatrix.T.tocsr()
+            fixedUtil = -rhs
+            _, _, fixedMax, _ = model.varBlocks["MaxUtilization"]
+            terms, _, _ = model.constrBlocks["traffic_split"]
+            splitMatrix = dict(terms)["PathRatios"].tocsr()
+        timing.countSize(
+            model.numVars, len(model.constrBlocks["util"][2]), model.numNonzeros
+        )
+
+        logger.info("Started optimization...")
+        with timing.stage("solve"):
+            numLinks = utilMatrix.shape[0]
+            ratios = _cheapestPaths(np.zeros(splitMatrix.shape[1]), splitMatrix)
+            util = utilMatrix @ ratios + fixedUtil
+            lower = fixedMax
+
+            for iteration in range(1, MWU_MAX_ITERATIONS + 1):
+                upper = max(util.max(), fixedMax)
+                # Smoothing of the max utilization, within MWU_EPSILON / 2 of it
+                mu = max(upper, 1e-12) * MWU_EPSILON / (2 * np.log(max(numLinks, 2)))
+                weights = np.exp((util - upper) / mu)
+                weights /= weights.sum()
+
+                pathCosts = utilMatrixT @ weights
+                target = _cheapestPaths(pathCosts, splitMatrix)
+                lower = max(lower, pathCosts @ target + weights @ fixedUtil)
+                if upper <= (1 + MWU_EPSILON) * lower:
+                    break
+
+                targetUtil = utilMatrix @ target + fixedUtil
+                step = _lineSearch(util, targetUtil, mu)
+                ratios += step * (target - ratios)
+                util += step * (targetUtil - util)
+        logger.info("Finished optimization")
+
+        upper = max(util.max(), fixedMax)
+        gap = upper / lower - 1 if lower > 0 else 0.0
+        timing.count("gap", gap)
+        logger.info(
+            f"Max utilization {upper * 100:.3f} %, lower bound {lower * 100:.3f} %, gap {gap:.2%} after {iteration} iterations"
+        )
+
+        # The capacity constraints bound the max utilization to 1
+        status = STATUS_OPTIMAL
+        if lower > 1:
+            logger.error("Model is infeasible")
+            return Solution(STATUS_INFEASIBLE)
+        if upper > 1:
+            logger.error(
+                f"The approximate path ratios overload a link, with a max utilization of {upper:.4f}"
+            )
+            status = STATUS_OVERLOADED
+        elif upper > (1 + MWU_EPSILON) * lower:
+            logger.error(
+                f"The gap of {gap:.2%} is above MWU_EPSILON after MWU_MAX_ITERATIONS ({MWU_MAX_ITERATIONS}) iterations"
+            )
+            status = STATUS_ITERATION_LIMIT
+
+        return Solution(
+            status,
+            upper,
+            {"PathRatios": ratios, "MaxUtilization": np.array([upper])},
+        )
+
+
+def _cheapestPaths(pathCosts, splitMatrix):
+    """
+    Returns the path ratios that send every flow on its cheapest path, the first one on ties.
+    """
+    flowStarts = splitMatrix.indptr[:-1]
+    costs = pathCosts[splitMatrix.indices]
+    flowMin = np.minimum.reduceat(costs, flowStarts)
+    positions = np.where(
+        costs == np.repeat(flowMin, np.diff(splitMatrix.indptr)),
+        np.arange(len(costs)),
+        len(costs),
+    )
+    ratios = np.zeros(splitMatrix.shape[1])
+    ratios[splitMatrix.indices[np.minimum.reduceat(positions, flowStarts)]] = 1.0
+    return ratios
+
+
+def _lineSearch(util, targetUtil, mu, steps=20):
+    """
+    Returns the step towards the target utilization in [0, 1] minimizing the smoothed max utilization,
+    by bisection on its derivative.
+    """
+    direction = targetUtil - util
+    low, high = 0.0, 1.0
+    for _ in range(steps):
+        step = (low + high) / 2
+        point = util + step * direction
+        weights = np.exp((point - point.max()) / mu)
+        if weights @ direction > 0:
+            high = step
+        else:
+            low = step
+    return (low + high) / 2
+
+
+class ProjectedGradientBackend:
+    """
+    Solves the squared utilization model with accelerated projected gradient descent over the path
+    ratios, using only numpy and scipy.
+
+    Each iteration is a product with the link x path utilization matrix and its transpose and a
+    projection of the ratios of every flow onto the simplex. The Frank-Wolfe gap of the ratios bounds
+    their distance to the optimum, so the backend stops once it is below `PGD_TOLERANCE` of the
+    objective. The capacity constraints are not enforced, so ratios that overload a link are returned
+    with the overloaded status instead of as optimal.
+    """
+
+    name = BACKEND_PGD
+    quadratic = True
+
+    def solve(self, model, lpFile=None, start=None):
+        """
+        Solves a `SparseModel` of the squared model, starting from the given path ratios, e.g. those of
+        the previous hour, or from an even split of every flow.
+        """
+        if "Utilization" not in model.quadraticObjective:
+            raise ValueError("The pgd solver backend only solves the squared model")
+        if lpFile is not None:
+            logger.warning("The pgd solver backend can not write models to a file")
+
+        with timing.stage("build"):
+            # Utilization of each link per unit of ratio of each path, the utilization of each link that
+            # does not depend on the ratios, and the flow x path split matrix
+            terms, _, rhs = model.constrBlocks["util"]
+            terms = dict(terms)
+            capacities = -terms["Utilization"].diagonal()
+            utilMatrix = (sp.diags(1 / capacities) @ terms["PathRatios"]).tocsr()
+            fixedUtil = -rhs / capacities
+            utilMatrixT = utilMatrix.T.tocsr()
+            terms, _, _ = model.constrBlocks["traffic_split"]
+            splitMatrix = dict(terms)["PathRatios"].tocsr()
+            weights = 2 * model.quadraticObjective["Utilization"]
+            lipschitz = _lipschitz(utilMatrix, utilMatrixT, weights)
+        timing.countSize(
+            model.numVars, len(model.constrBlocks["util"][2]), model.numNonzeros
+        )
+
+        logger.info("Started optimization...")
+        with timing.stage("solve"):
+            if start is None:
+                start = np.zeros(splitMatrix.shape[1])
+            ratios = _projectSimplices(np.asarray(start, dtype=np.float64), splitMatrix)
+            point = ratios
+            momentum = 1.0
+            objective = np.inf
+
+            for iteration in range(1, PGD_MAX_ITERATIONS + 1):
+                util = utilMatrix @ point + fixedUtil
+                gradient = utilMatrixT @ (weights * util)
+                previous = ratios
+                ratios = _projectSimplices(point - gradient / lipschitz, splitMatrix)
+
+                util = utilMatrix @ ratios + fixedUtil
+                lastObjective = objective
+                objective = weights @ (util * util) / 2
+                gradient = utilMatrixT @ (weights * util)
+                gap = gradient @ ratios - gradient @ _cheapestPaths(
+                    gradient, splitMatrix
+                )
+                if gap <= PGD_TOLERANCE * objective:
+                    break
+
+                # Restart the momentum when the objective goes up
+                if objective > lastObjective:
+                    momentum = 1.0
+                nextMomentum = (1 + np.sqrt(1 + 4 * momentum**2)) / 2
+                point = ratios + (momentum - 1) / nextMomentum * (ratios - previous)
+                momentum = nextMomentum
+        logger.info("Finished optimization")
+
+        relativeGap = gap / objective if objective > 0 else 0.0
+        timing.count("gap", relativeGap)
+        logger.info(
+            f"Objective {objective:.6g}, Frank-Wolfe gap {relativeGap:.2e} after {iteration} iterations"
+        )
+        status = STATUS_OPTIMAL
+        if util.max() > 1:
+            logger.error(
+                f"The path ratios overload a link, with a max utilization of {util.max():.4f}"
+            )
+            status = STATUS_OVERLOADED
+
+        return Solution(
+            status,
+            objective,
+            {"PathRatios": ratios, "Utilization": util},
+        )
+
+
+def _lipschitz(utilMatrix, utilMatrixT, weights, iterations=30):
+    """
+    Returns an upper estimate of the Lipschitz constant of the gradient of the weighted sum of squared
+    utilizations, the largest eigenvalue of its Hessian, by power iteration.
+    """
+    vector = np.ones(utilMatrix.shape[1])
+    eigenvalue = 0.0
+    for _ in range(iterations):
+        product = utilMatrixT @ (weights * (utilMatrix @ vector))
+        norm = np.linalg.norm(product)
+        if norm == 0:
+            return 1.0
+        eigenvalue = norm / np.linalg.norm(vector)
+        vector = product / norm
+    # Power iteration approaches the eigenvalue from below
+    return 1.1 * eigenvalue
+
+
+def _projectSimplices(ratios, splitMatrix):
+    """
+    Returns the Euclidean projection of the path ratios of every flow onto the simplex, so the ratios
+    of each flow are non-negative and sum to 1.
+    """
+    flowStarts = splitMatrix.indptr[:-1]
+    counts = np.diff(splitMatrix.indptr)
+    flowOf = np.repeat(np.arange(len(counts)), counts)
+    values = ratios[splitMatrix.indices]
+
+    # Ratios of each flow sorted in descending order, with their running sum within the flow
+    order = np.lexsort((-values, flowOf))
+    sortedValues = values[order]
+    sums = np.cumsum(sortedValues)
+    flowSums = sums - np.repeat(sums[flowStarts] - sortedValues[flowStarts], counts)
+    rank = np.arange(1, len(values) + 1) - np.repeat(flowStarts, counts)
+
+    # The number of ratios of each flow above the threshold, and the threshold
+    active = sortedValues - (flowSums - 1) / rank > 0
+    numActive = np.maximum.reduceat(np.where(active, rank, 1), flowStarts)
+    threshold = (flowSums[flowStarts + numActive - 1] - 1) / numActive
+
+    projected = np.zeros(splitMatrix.shape[1])
+    projected[splitMatrix.indices] = np.maximum(values - threshold[flowOf], 0)
+    return projected
+
+
+BACKENDS = {
+    BACKEND_GUROBI: GurobiBackend,
+    BACKEND_HIGHS: HighsBackend,
+    BACKEND_SCIPY: ScipyBackend,
+    BACKEND_MWU: MultiplicativeWeightsBackend,
+    BACKEND_PGD: ProjectedGradientBackend,
+}
+
+# Backends that can warm-start an hour from the previous hour solved by the process, with --incremental
+INCREMENTAL_BACKENDS = [BACKEND_GUROBI, BACKEND_PGD]
+
+# Model types a backend is limited to, backends not listed solve every model type they support
+BACKEND_MODEL_TYPES = {
+    BACKEND_MWU: [CalcType.MAX.value],
+    BACKEND_PGD: [CalcType.SQUARED.value],
+}
+
+# Model types solved with a quadratic objective
+QUADRATIC_MODEL_TYPES = [CalcType.SQUARED.value, CalcType.PATHS.value]
+
+
+def parseBackends(backends):
+    """
+    Parses a solver backend for every model type, e.g. 'highs', or per model type, e.g.
+    'average=highs,max=scipy', into a dictionary of backends indexed by model type, '*' for every type.
+    """
+    parsed = {}
+    for part in backends.split(","):
+        model, _, backend = part.rpartition("=")
+        model = model or "*"
+        if backend not in BACKENDS:
+            raise ValueError(f"Invalid solver backend: {backend}")
+        if model != "*" and model not in [calcType.value for calcType in CalcType]:
+            raise ValueError(f"Invalid model type: {model}")
+        parsed[model] = backend
+    return parsed
+
+
+def backendName(model, backends=None):
+    """
+    Returns the name of the solver backend of a model type: the one given in `backends` (parsed with
+    `parseBackends`) for the model type or every type, or in `SOLVER_BACKEND_{MODEL}`, or `SOLVER_BACKEND`.
+    """
+    backends = backends or {}
+    return (
+        backends.get(model)
+        or backends.get("*")
+        or os.getenv(f"SOLVER_BACKEND_{model.upper()}")
+        or SOLVER_BACKEND
+    )
+
+
+def checkBackend(model, backends=None):
+    """
+    Raises a ValueError if the backend of a model type is unknown, can not solve it or has an invalid
+    iteration limit.
+    """
+    name = backendName(model, backends)
+    if name not in BACKENDS:
+        raise ValueError(f"Invalid solver backend: {name}")
+    if model in QUADRATIC_MODEL_TYPES and not BACKENDS[name].quadratic:
+        raise ValueError(
+            f"The {name} solver backend can not solve the {model} model, which is quadratic"
+        )
+    if name in BACKEND_MODEL_TYPES and model not in BACKEND_MODEL_TYPES[name]:
+        raise ValueError(
+            f"The {name} solver backend can only solve the {', '.join(BACKEND_MODEL_TYPES[name])} model"
+        )
+
+    # The first-order backends run at least one iteration, which their results are taken from
+    for backend, setting, iterations in [
+        (BACKEND_MWU, "MWU_MAX_ITERATIONS", MWU_MAX_ITERATIONS),
+        (BACKEND_PGD, "PGD_MAX_ITERATIONS", PGD_MAX_ITERATIONS),
+    ]:
+        if name == backend and iterations < 1:
+            raise ValueError(f"Invalid {setting}: {iterations}, it must be at least 1")
+
+
+def getBackend(model, backends=None):
+    """
+    Returns the solver backend of a model type in the current process, starting it on first use.
+    """
+    checkBackend(model, backends)
+
+    name = backendName(model, backends)
+    backend = _backends.get(name)
+    if backend is None:
+        backend = BACKENDS[name]()
+        _backends[name] = backend
+    return backend
@@ -1,116 +1,20 @@
-import argparse
 import os
-import pandas as pd
-import statistics as stats
-import multiprocessing as mp
+import sys
+import argparse
 
 from multiprocessing import set_start_method
 
 from nfopt.calc_type_enum import CalcType
-from nfopt.utils import data as dataUtils
-from nfopt.utils import network as nwUtils
-from nfopt.utils import log
-from nfopt.linear_optimization import netflow, optimizer as linOpt
-
-logger = log.setupCustomLogger(__name__)
-
-AVG_CAPACITY = int(os.getenv("AVERAGE_CAPACITY"))
-
-
-def calcLinkUtil(links):
-    util = {}
-
-    for linkKey in links:
-        util[linkKey] = (
-            links[linkKey]["totalTraffic"] / links[linkKey]["capacity"] * 100
-        )
+from nfopt.output_format_enum import OutputFormat
 
-    return util
 
+def main():
+    # 'nfopt batch ...' runs several days and models on one worker pool
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from nfopt import batch
 
-def process_flows_hour(timestamp, flows, traffic, args, links):
-    logger.info(f"Processing {timestamp} with {len(flows)} flows...")
-    ratios = None
-    useRatios = False
-
-    # Read ratios if specified
-    if args.use_ratios:
-        hour = timestamp[4:6]
-        day, ratioType, date = args.use_ratios
-        useRatios = True
-        ratios = dataUtils.readPathRatios(date, day, hour, ratioType)
-    elif args.use_paths:
-        hour = timestamp[4:6]
-        day, date, useRatios = args.use_paths
-        useRatios = useRatios == "True"
-        ratios = dataUtils.readPathRatios(date, day, hour)
-        i = 0
-        for flow in flows:
-            if flow not in ratios:
-                continue
-            i += 1
-            flows[flow] = list(ratios[flow].keys())
-        logger.info(f"Updated {i} flows with paths!")
-
-    # Initialize totalTraffic and listFlows for all links
-    for linkKey in links:
-        links[linkKey]["totalTraffic"] = 0
-        links[linkKey]["listFlows"] = []
-
-    for flow in flows:
-        # Get all links in the flow
-        linksFlow = nwUtils.getLinksFromFlow(flows[flow])
-        identicalPaths = True
-
-        if ratios is not None:
-            for path in flows[flow]:
-                if flow not in ratios or path not in ratios[flow]:
-                    identicalPaths = False
-                    break
-
-        # Update totalTraffic and listFlows for each link
-        for link in linksFlow:
-            if link not in links:
-                sd = link.split(";")
-
-                links[link] = {
-                    "linkStart": sd[0],
-                    "linkEnd": sd[1],
-                    "capacity": AVG_CAPACITY,
-                    "totalTraffic": 0,
-                    "listFlows": [],
-                }
-
-            totalTraffic = 0
-            for path in flows[flow]:
-                if link in path:
-                    if useRatios and identicalPaths:
-                        totalTraffic += traffic[flow] * float(ratios[flow][path])
-                    else:
-                        totalTraffic += traffic[flow] * (1 / len(flows[flow]))
-            links[link]["totalTraffic"] += totalTraffic
-            links[link]["listFlows"].append(flow)
-
-    # Run linear optimization or baseline calculations
-    if args.model_type == CalcType.BASELINE.value:
-        linkUtil = calcLinkUtil(links)
-    elif args.model_type == CalcType.PATHS.value:
-        netflow.optMC(args, links, traffic, timestamp)
-        return None
-    else:
-        linkUtil = linOpt.runLinearOptimizationModel(
-            args, links, flows, traffic, timestamp, args.save_lp_models
-        )
-
-    return [
-        timestamp,
-        min(linkUtil.values()),
-        max(linkUtil.values()),
-        stats.mean(linkUtil.values()),
-    ]
-
+        return batch.main(sys.argv[2:])
 
-def main():
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "model_type",
@@ -150,9 +54,78 @@ def main():
         metavar=("DAY", "DATE", "USERATIOS?"),
         help="use existing paths for calculations",
     )
+    parser.add_argument(
+        "-inc",
+        "--incremental",
+        action="store_true",
+        help="update and warm-start the previous hour's model in each worker",
+    )
+    parser.add_argument(
+        "-cg",
+        "--column-generation",
+        action="store_true",
+        help="solve the paths model with path-based column generation",
+    )
+    parser.add_argument(
+        "-sa",
+        "--source-aggregation",
+        action="store_true",
+        help="solve the paths model with one commodity per source router",
+    )
+    parser.add_argument(
+        "-of",
+        "--output-format",
+        choices=[OutputFormat.CSV.value, OutputFormat.PARQUET.value],
+        default=OutputFormat.CSV.value,
+        help="format of the ratio, link and overview output files",
+    )
+    parser.add_argument(
+        "-s",
+        "--stream",
+        action="store_true",
+        help="read and process the day one hour at a time, without the cached day store. The rows of each timestamp must be contiguous in the paths and traffic files",
+    )
+    parser.add_argument(
+        "-nc",
+        "--no-cache",
+        action="store_true",
+        help="parse the dataset without reading or writing the cached day store",
+    )
+    parser.add_argument(
+        "-st",
+        "--solver-threads",
+        type=int,
+        help="Gurobi threads per solve, by default planned from the model size and CPU_THREADS",
+    )
+    parser.add_argument(
+        "-sb",
+        "--solver-backend",
+        help="solver backend, gurobi, highs or scipy, or one per model type, e.g. average=highs,max=scipy",
+    )
+    parser.add_argument(
+        "-f",
+        "--failures",
+        nargs="?",
+        const="all",
+        metavar="FILE",
+        help="solve the model again with each link and its reverse link failed, or with the failure scenarios of FILE, one comma separated list of links per line",
+    )
+    parser.add_argument(
+        "-p",
+        "--profile",
+        action="store_true",
+        help="write a JSON profile of the run with the time and model size of every stage",
+    )
 
     args = parser.parse_args()
 
+    # The pipeline and its dependencies are imported once the arguments are parsed, so --help and
+    # usage errors return without loading pandas, pyarrow, scipy or a solver
+    from nfopt import pipeline, worker
+    from nfopt.utils.ratios import ratioFiles
+    from nfopt.utils import data as dataUtils
+    from nfopt.linear_optimization import failures, solver
+
     if args.use_ratios:
         day, ratioType, date = args.use_ratios
         if not day.isdigit():
@@ -192,40 +165,81 @@ def main():
         if useratios not in ["True", "False"]:
             parser.error("Invalid useratios value. Please use 'True' or 'False'.")
 
-    # Set start method to spawn to avoid issues with multiprocessing on Windows
-    set_start_method("spawn")
+    if args.column_generation and args.model_type != CalcType.PATHS.value:
+        parser.error("Column generation can only be used with the paths model.")
 
-    startTime = pd.Timestamp.now()
-    logger.info("Started, model_type: " + str(args.model_type))
+    if args.source_aggregation and args.model_type != CalcType.PATHS.value:
+        parser.error("Source aggregation can only be used with the paths model.")
 
-    flows = dataUtils.readFlows(args.day)
-    links = dataUtils.readLinks()
-    traffic = dataUtils.readTraffic(args.day)
+    if args.source_aggregation and args.column_generation:
+        parser.error("Source aggregation can not be used with column generation.")
 
-    with mp.Pool(processes=dataUtils.CPU_THREADS) as pool:
-        results = pool.starmap(
-            process_flows_hour,
-            [
-                (timestamp, flows[timestamp], traffic[timestamp], args, links.copy())
-                for timestamp in flows
-            ],
+    if args.incremental and args.model_type not in [
+        CalcType.AVERAGE.value,
+        CalcType.MAX.value,
+        CalcType.SQUARED.value,
+    ]:
+        parser.error(
+            "Incremental mode can only be used with the average, max and squared models."
         )
 
-    if results is not None and results[0] is not None:
-        results.sort()
+    if args.failures is not None:
+        if args.model_type not in [
+            CalcType.AVERAGE.value,
+            CalcType.MAX.value,
+            CalcType.SQUARED.value,
+        ]:
+            parser.error(
+                "Failure scenarios can only be used with the average, max and squared models."
+            )
+        if args.stream or args.incremental:
+            parser.error(
+                "Failure scenarios cannot be used with stream or incremental mode."
+            )
 
-        dataUtils.writeDataToFile(
-            data=pd.DataFrame(
-                results, columns=["timestamp", "min_util", "max_util", "avg_util"]
-            ),
-            parserArgs=args,
-            outputFile="overviewData",
-        )
+    if args.solver_threads is not None and args.solver_threads < 1:
+        parser.error("The number of solver threads must be at least 1.")
 
-    endTime = pd.Timestamp.now()
+    try:
+        if args.solver_backend is not None:
+            args.solver_backend = solver.parseBackends(args.solver_backend)
+        if args.model_type != CalcType.BASELINE.value:
+            solver.checkBackend(args.model_type, args.solver_backend)
+    except ValueError as e:
+        parser.error(str(e))
+
+    backendName = solver.backendName(args.model_type, args.solver_backend)
+    if args.incremental and backendName not in solver.INCREMENTAL_BACKENDS:
+        parser.error("Incremental mode requires the gurobi or pgd solver backend.")
+
+    if args.column_generation and backendName != solver.BACKEND_GUROBI:
+        parser.error("Column generation requires the gurobi solver backend.")
+
+    if args.failures is not None:
+        if backendName != solver.BACKEND_GUROBI:
+            parser.error("Failure scenarios require the gurobi solver backend.")
+        if args.failures != failures.ALL_LINKS:
+            if not os.path.isfile(args.failures):
+                parser.error(f"No failure scenarios file {args.failures} found.")
+            scenarios = dataUtils.readFailureScenarios(args.failures)
+            if not scenarios:
+                parser.error(f"No failure scenarios found in {args.failures}.")
+            args.failures = scenarios
+
+    # Check the files can be streamed before starting the workers that process their hours
+    if args.stream:
+        try:
+            dataUtils.checkStreamable(args.day)
+        except ValueError as e:
+            parser.error(str(e))
+
+    # Check the ratios exist before starting the workers that read them
+    if args.use_ratios or args.use_paths:
+        day, date = worker.ratioDayDate(args)
+        if not ratioFiles(date, day):
+            parser.error(f"No ratios of {date} found for day {day}.")
 
-    # Log elapsed time in hours, minutes and seconds
-    elapsedTime = (endTime - startTime).components
-    logger.info(
-        f"Finished, elapsed time: {elapsedTime.hours} hours, {elapsedTime.minutes} minutes, {elapsedTime.seconds} seconds"
-    )
+    # Set start method to spawn to avoid issues with multiprocessing on Windows
+    set_start_method("spawn")
+
+    pipeline.run(args)
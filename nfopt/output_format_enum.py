@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class OutputFormat(Enum):
+    CSV = "csv"
+    PARQUET = "parquet"
@@ -0,0 +1,493 @@
+import argparse
+import collections
+import contextlib
+import math
+import tempfile
+import time
+import pandas as pd
+import multiprocessing as mp
+
+from nfopt import worker
+from nfopt.calc_type_enum import CalcType
+from nfopt.utils import data as dataUtils
+from nfopt.utils import store as storeUtils
+from nfopt.utils.topology import Topology
+from nfopt.utils import log
+from nfopt.utils import timing
+from nfopt.utils import threads as threadUtils
+
+logger = log.setupCustomLogger(__name__)
+
+OVERVIEW_COLUMNS = ["timestamp", "min_util", "max_util", "avg_util"]
+
+# Chunks of failure scenarios per pool process, so processes that finish early take over other chunks
+FAILURE_CHUNKS_PER_PROCESS = 4
+
+INCREMENTAL_MODEL_TYPES = [
+    CalcType.AVERAGE.value,
+    CalcType.MAX.value,
+    CalcType.SQUARED.value,
+]
+
+
+def prepareDayStore(day, noCache, stack, links=None):
+    """
+    Returns the directory of the day store of a day, parsing the dataset into it unless it is cached.
+
+    The store is cached next to the dataset, so later runs on the same files skip parsing them.
+
+    ### Parameters:
+    ----------
+    #### day: int
+    The day of the dataset.
+
+    #### noCache: bool
+    Parse the dataset into a temporary store instead of the cache.
+
+    #### stack: contextlib.ExitStack
+    The stack the temporary store is removed by.
+
+    #### links: dict
+    The links read with `data.readLinks`, read from the dataset if None.
+    """
+    if noCache:
+        storeDir = stack.enter_context(tempfile.TemporaryDirectory(prefix="nfopt-"))
+    else:
+        storeDir = storeUtils.cacheDir(
+            dataUtils.DATASET_PATH, day, dataUtils.datasetFiles(day)
+        )
+
+    if storeUtils.DayStore.exists(storeDir):
+        logger.info(f"Using cached day store {storeDir}")
+        return storeDir
+
+    if links is None:
+        links = dataUtils.readLinks()
+    topology = Topology(links, worker.AVG_CAPACITY)
+    flows = dataUtils.readFlows(day, topology)
+    traffic = dataUtils.readTraffic(day)
+    with timing.stage("store"):
+        storeUtils.writeDayStore(storeDir, links, flows, traffic, topology)
+
+    return storeDir
+
+
+def scheduleHours(store, args):
+    """
+    Returns the timestamps of the day ordered by their estimated cost, largest first.
+
+    The cost of an hour is its total time in the latest run report of the day and model, or its number
+    of paths times the number of links if the report does not cover every hour.
+
+    With `--incremental`, the timestamps are returned in time order instead, as each worker warm-starts
+    from the hour it solved before and consecutive hours change the least.
+    """
+    if args.incremental:
+        logger.info("Scheduling hours in time order for the incremental models")
+        return sorted(store.timestamps)
+
+    previous = dataUtils.readRunReport(args)
+
+    if all(timestamp in previous for timestamp in store.timestamps):
+        logger.info("Scheduling hours by the durations of the previous run")
+        costs = previous
+    else:
+        costs = {
+            timestamp: store.numPaths(timestamp) * store.numLinks
+            for timestamp in store.timestamps
+        }
+
+    return sorted(
+        store.timestamps, key=lambda timestamp: costs[timestamp], reverse=True
+    )
+
+
+def contiguousChunksize(numTasks, processes, incremental):
+    """
+    Returns the number of tasks dispatched to a pool process at once, one for load balancing, or a
+    contiguous block of tasks per process for the incremental models, so each worker warm-starts from
+    the task it solved before.
+    """
+    if not incremental:
+        return 1
+    return math.ceil(numTasks / processes)
+
+
+def writeRunReport(records, args, elapsedTime, processes, solverThreads):
+    """
+    Writes the run report of the hours processed by the workers and logs the slowest hour and the
+    parallel efficiency of the pool, the share of the elapsed time its processes spent on hours.
+
+    With `--profile`, a JSON profile of the run is also written, with the stages of the main process,
+    the stage totals over all hours and the records of the run report.
+    """
+    report = pd.DataFrame(records).sort_values("timestamp")
+    stageColumns = [
+        column
+        for column in report.columns
+        if column not in ["timestamp", "worker", "peakRssMb", "startup", "gap"]
+    ]
+    report[stageColumns] = report[stageColumns].fillna(0)
+    dataUtils.writeDataToFile(data=report, outputFile="runReport", parserArgs=args)
+
+    elapsedSeconds = elapsedTime.total_seconds()
+    slowest = report.loc[report["total"].idxmax()]
+    efficiency = report["total"].sum() / (elapsedSeconds * processes)
+    startups = report["startup"][report["startup"] > 0]
+    logger.info(
+        f"Slowest hour: {slowest['timestamp']} ({slowest['total']:.2f} s), total hour time: {report['total'].sum():.2f} s, elapsed: {elapsedSeconds:.2f} s, parallel efficiency: {efficiency:.0%} of {processes} processes"
+    )
+    logWorkerStartup(startups)
+
+    if args.profile:
+        dataUtils.writeProfile(
+            {
+                "model": args.model_type,
+                "day": args.day,
+                "processes": processes,
+                "solverThreads": solverThreads,
+                "elapsed": elapsedSeconds,
+                "parallelEfficiency": efficiency,
+                "workerStartup": startups.tolist(),
+                "mainStages": timing.stages(),
+                "mainPeakRssMb": timing.peakRss(),
+                "hourTotals": report[stageColumns].sum().to_dict(),
+                "hours": report.to_dict("records"),
+            },
+            args,
+        )
+
+
+def logWorkerStartup(startups):
+    """
+    Logs the mean and slowest start-up time of the workers of a pool.
+    """
+    if len(startups):
+        logger.info(
+            f"Worker start-up: mean {startups.mean():.2f} s, slowest {startups.max():.2f} s, {len(startups)} workers"
+        )
+
+
+def streamHours(args):
+    """
+    Processes the day while it is read from the dataset one hour at a time, writing the overview of each
+    hour as soon as it is done, so memory is bounded by the hours in flight instead of the whole day.
+    """
+    links = dataUtils.readLinks()
+    pending = collections.deque()
+    records = []
+    written = 0
+
+    # The hours are not known before they are read, so every process gets a share of the budget
+    processes, solverThreads = threadUtils.planThreads(
+        dataUtils.CPU_THREADS, 0, args.solver_threads
+    )
+
+    def writeResult(task):
+        nonlocal written
+        result, record = task
+        records.append(record)
+        if result is None:
+            return
+
+        dataUtils.writeDataToFile(
+            data=pd.DataFrame([result], columns=OVERVIEW_COLUMNS),
+            parserArgs=args,
+            outputFile="overviewData",
+            append=written > 0,
+        )
+        written += 1
+
+    poolStartTime = pd.Timestamp.now()
+    with mp.Pool(
+        processes=processes,
+        initializer=worker._initStreamWorker,
+        initargs=(links, args, solverThreads, time.time()),
+    ) as pool:
+        for hour in dataUtils.iterHours(args.day):
+            pending.append(pool.apply_async(worker.process_stream_hour, hour))
+
+            # Reading waits for the oldest hour once every worker has a queued hour
+            if len(pending) > 2 * processes:
+                writeResult(pending.popleft().get())
+
+        while pending:
+            writeResult(pending.popleft().get())
+
+    if not records:
+        logger.warning(f"No hours to process on day {args.day}")
+        return
+
+    writeRunReport(
+        records, args, pd.Timestamp.now() - poolStartTime, processes, solverThreads
+    )
+
+
+def sweepFailures(args):
+    """
+    Solves the failure scenarios of every hour of the day on a worker pool and writes the failure table,
+    with the max and average utilization of each scenario.
+
+    The scenarios of an hour are split into chunks, so the workers share the scenarios of large hours.
+    Each worker solves the hour without failures once and re-solves every scenario of its chunks from
+    that solution, see `failures.FailureSweep`.
+    """
+    from nfopt.linear_optimization import failures
+
+    with contextlib.ExitStack() as stack:
+        storeDir = prepareDayStore(args.day, args.no_cache, stack)
+        store = storeUtils.DayStore(storeDir)
+        timestamps = sorted(store.timestamps, key=store.numPaths, reverse=True)
+        if not timestamps:
+            logger.warning(f"No hours to process on day {args.day}")
+            return
+
+        # There are many more scenarios than hours, so every process gets a share of the budget
+        processes, solverThreads = threadUtils.planThreads(
+            dataUtils.CPU_THREADS,
+            max(store.numPaths(timestamp) for timestamp in timestamps),
+            args.solver_threads,
+        )
+        numChunks = math.ceil(FAILURE_CHUNKS_PER_PROCESS * processes / len(timestamps))
+        tasks = [
+            (timestamp, chunk, numChunks)
+            for timestamp in timestamps
+            for chunk in range(numChunks)
+        ]
+
+        poolStartTime = time.perf_counter()
+        with mp.Pool(
+            processes=processes,
+            initializer=worker._initWorker,
+            initargs=(storeDir, args, solverThreads, time.time()),
+        ) as pool:
+            rows = [
+                row
+                for taskRows in pool.imap_unordered(
+                    worker.process_failures, tasks, chunksize=1
+                )
+                for row in taskRows
+            ]
+        poolTime = time.perf_counter() - poolStartTime
+
+    table = pd.DataFrame(rows, columns=failures.FAILURE_COLUMNS)
+    table["base"] = table["failed_links"] == failures.BASE_SCENARIO
+    table = table.sort_values(
+        ["timestamp", "base", "max_util"], ascending=[True, False, False]
+    ).drop(columns="base")
+    dataUtils.writeDataToFile(data=table, outputFile="failureData", parserArgs=args)
+
+    scenarios = table[table["failed_links"] != failures.BASE_SCENARIO]
+    logger.info(
+        f"Solved {len(scenarios)} failure scenarios of {len(timestamps)} hours in {poolTime:.2f} s, {scenarios['iterations'].sum()} simplex iterations"
+    )
+    if scenarios["max_util"].notna().any():
+        worst = scenarios.loc[scenarios["max_util"].idxmax()]
+        logger.info(
+            f"Worst failure: {worst['failed_links']} at {worst['timestamp']}, max utilization {worst['max_util']:.2f} % on {worst['max_link']}"
+        )
+
+
+def run(args):
+    """
+    Runs one model type over every hour of a day on a worker pool and writes its overview and run report.
+    """
+    startTime = pd.Timestamp.now()
+    timing.reset()
+    logger.info("Started, model_type: " + str(args.model_type))
+
+    if args.stream:
+        streamHours(args)
+    elif args.failures is not None:
+        sweepFailures(args)
+    else:
+        # Workers only receive the timestamp and read their hour from a memory-mapped day store
+        with contextlib.ExitStack() as stack:
+            storeDir = prepareDayStore(args.day, args.no_cache, stack)
+            store = storeUtils.DayStore(storeDir)
+            timestamps = scheduleHours(store, args)
+            if not timestamps:
+                logger.warning(f"No hours to process on day {args.day}")
+                return
+
+            processes, solverThreads = threadUtils.planThreads(
+                len(timestamps),
+                max(store.numPaths(timestamp) for timestamp in timestamps),
+                args.solver_threads,
+            )
+
+            # Hours are dispatched one at a time, largest first, so long hours do not end up last,
+            # except for the incremental models, where each process gets one contiguous block of hours
+            chunksize = contiguousChunksize(
+                len(timestamps), processes, args.incremental
+            )
+            poolStartTime = pd.Timestamp.now()
+            with mp.Pool(
+                processes=processes,
+                initializer=worker._initWorker,
+                initargs=(storeDir, args, solverThreads, time.time()),
+            ) as pool:
+                results, records = zip(
+                    *pool.imap_unordered(
+                        worker.process_hour, timestamps, chunksize=chunksize
+                    )
+                )
+
+        writeRunReport(
+            records, args, pd.Timestamp.now() - poolStartTime, processes, solverThreads
+        )
+
+        results = [result for result in results if result is not None]
+        if results:
+            results.sort()
+
+            dataUtils.writeDataToFile(
+                data=pd.DataFrame(results, columns=OVERVIEW_COLUMNS),
+                parserArgs=args,
+                outputFile="overviewData",
+            )
+
+    endTime = pd.Timestamp.now()
+
+    # Log elapsed time in hours, minutes and seconds
+    elapsedTime = (endTime - startTime).components
+    logger.info(
+        f"Finished, elapsed time: {elapsedTime.hours} hours, {elapsedTime.minutes} minutes, {elapsedTime.seconds} seconds"
+    )
+
+
+def runBatch(days, models, batchArgs, backends):
+    """
+    Runs several model types over several days on one worker pool and writes the overview and run
+    report of each day and model type.
+
+    ### Parameters:
+    ----------
+    #### days: list
+    The days to process.
+
+    #### models: list
+    The model types to run on each day.
+
+    #### batchArgs: argparse.Namespace
+    The arguments of `nfopt batch`.
+
+    #### backends: dict
+    The solver backend of each model type, parsed with `solver.parseBackends`, or None.
+    """
+    startTime = pd.Timestamp.now()
+    logger.info(f"Started batch, days: {days}, models: {models}")
+
+    with contextlib.ExitStack() as stack:
+        # The links are parsed once for every day, and each day once for every model
+        links = dataUtils.readLinks()
+        tasks = []
+        for day in days:
+            storeDir = prepareDayStore(day, batchArgs.no_cache, stack, links)
+            store = storeUtils.DayStore(storeDir)
+
+            for model in models:
+                args = argparse.Namespace(
+                    model_type=model,
+                    day=day,
+                    save_lp_models=batchArgs.save_lp_models,
+                    use_ratios=None,
+                    use_paths=None,
+                    incremental=batchArgs.incremental
+                    and model in INCREMENTAL_MODEL_TYPES,
+                    column_generation=batchArgs.column_generation
+                    and model == CalcType.PATHS.value,
+                    source_aggregation=batchArgs.source_aggregation
+                    and model == CalcType.PATHS.value,
+                    output_format=batchArgs.output_format,
+                    solver_backend=backends,
+                )
+                for timestamp in sorted(store.timestamps):
+                    tasks.append(
+                        (store.numPaths(timestamp), model, (storeDir, args, timestamp))
+                    )
+
+        # Largest hours first, with the optimization models ahead of the baseline calculations, unless
+        # the incremental models keep the tasks of each day and model in time order
+        if not batchArgs.incremental:
+            tasks.sort(
+                key=lambda task: (task[1] != CalcType.BASELINE.value, task[0]),
+                reverse=True,
+            )
+        if not tasks:
+            logger.warning("No hours to process on any of the days")
+            return
+
+        logger.info(f"Scheduling {len(tasks)} tasks")
+        processes, solverThreads = threadUtils.planThreads(
+            len(tasks), max(task[0] for task in tasks), batchArgs.solver_threads
+        )
+        chunksize = contiguousChunksize(len(tasks), processes, batchArgs.incremental)
+
+        results = {}
+        records = {}
+        poolStartTime = time.perf_counter()
+        with mp.Pool(
+            processes=processes,
+            initializer=worker._initBatchWorker,
+            initargs=(solverThreads, time.time()),
+        ) as pool:
+            for day, model, result, record in pool.imap_unordered(
+                worker.process_task, [task[2] for task in tasks], chunksize=chunksize
+            ):
+                records.setdefault((day, model), []).append(record)
+                if result is not None:
+                    results.setdefault((day, model), []).append(result)
+        poolTime = time.perf_counter() - poolStartTime
+
+    # Share of the elapsed time the processes of the pool spent on tasks
+    busyTime = sum(
+        record["total"] for dayRecords in records.values() for record in dayRecords
+    )
+    logger.info(
+        f"Total task time: {busyTime:.2f} s, elapsed: {poolTime:.2f} s, parallel efficiency: {busyTime / (poolTime * processes):.0%} of {processes} processes"
+    )
+    logWorkerStartup(
+        pd.Series(
+            [
+                record["startup"]
+                for dayRecords in records.values()
+                for record in dayRecords
+                if record["startup"] > 0
+            ],
+            dtype=float,
+        )
+    )
+
+    for day, model in sorted(records):
+        parserArgs = argparse.Namespace(
+            model_type=model,
+            day=day,
+            use_ratios=None,
+            use_paths=None,
+            output_format=batchArgs.output_format,
+        )
+        dataUtils.writeDataToFile(
+            data=pd.DataFrame(records[(day, model)])
+            .sort_values("timestamp")
+            .fillna(0.0),
+            parserArgs=parserArgs,
+            outputFile="runReport",
+        )
+
+        dayResults = results.get((day, model))
+        if dayResults:
+            dayResults.sort()
+            dataUtils.writeDataToFile(
+                data=pd.DataFrame(dayResults, columns=OVERVIEW_COLUMNS),
+                parserArgs=parserArgs,
+                outputFile="overviewData",
+            )
+
+    endTime = pd.Timestamp.now()
+
+    # Log elapsed time in hours, minutes and seconds
+    elapsedTime = (endTime - startTime).components
+    logger.info(
+        f"Finished batch, elapsed time: {elapsedTime.hours} hours, {elapsedTime.minutes} minutes, {elapsedTime.seconds} seconds"
+    )
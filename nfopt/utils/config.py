@@ -0,0 +1,22 @@
+import os
+
+# Environment file read by the main process
+ENV_FILE = "variables.env"
+
+# Set once the environment file is loaded. Spawned pool workers inherit the environment of the main
+# process, so they see the configuration it resolved and do not read the file again.
+LOADED_VARIABLE = "NFOPT_CONFIG_LOADED"
+
+
+def load():
+    """
+    Loads the environment variables of `ENV_FILE`, once for the main process and its workers.
+    Variables already set in the environment take precedence over the file.
+    """
+    if os.environ.get(LOADED_VARIABLE):
+        return
+
+    from dotenv import load_dotenv
+
+    load_dotenv(ENV_FILE)
+    os.environ[LOADED_VARIABLE] = "1"
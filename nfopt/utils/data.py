@@ -1,14 +1,23 @@
 import os
 import sys
-import pandas as pd
+import glob
+import json
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import multiprocessing as mp
 
+from nfopt.output_format_enum import OutputFormat
+from nfopt.utils import config
 from nfopt.utils import log
-from functools import partial
+from nfopt.utils import timing
 from datetime import datetime
-from dotenv import load_dotenv
 
-load_dotenv("variables.env")
+# pandas is imported by the functions that use it, so the pool workers do not load it at start-up
+
+config.load()
 logger = log.setupCustomLogger(__name__)
 
 DATASET_PATH = os.getenv("DATASET_PATH")
@@ -19,6 +28,27 @@ DATASET_LINKS_NAME = os.getenv("DATASET_LINKS_NAME")
 DATA_OUTPUT_DIR = os.getenv("DATA_OUTPUT_DIR")
 RATIOS_DIR_NAME = "ratios"
 LINKS_DIR_NAME = "links"
+REPORTS_DIR_NAME = "reports"
+
+PATHS_SCHEMA = pa.schema(
+    [
+        ("timestamp", pa.string()),
+        ("pathStart", pa.string()),
+        ("pathEnd", pa.string()),
+        ("path", pa.string()),
+    ]
+)
+TRAFFIC_SCHEMA = pa.schema(
+    [
+        ("timestamp", pa.string()),
+        ("flowStart", pa.string()),
+        ("flowEnd", pa.string()),
+        ("traffic", pa.float64()),
+    ]
+)
+
+OUTPUT_FORMAT_CSV = OutputFormat.CSV.value
+OUTPUT_FORMAT_PARQUET = OutputFormat.PARQUET.value
 
 CPU_THREADS = os.getenv("CPU_THREADS")
 if CPU_THREADS is not None and CPU_THREADS.isdigit() and int(CPU_THREADS) > 0:
@@ -27,20 +57,102 @@ else:
     CPU_THREADS = mp.cpu_count()
 
 
-def _processGroup(chunk, group_func):
-    return chunk.groupby(["timestamp", "flowName"])["path"].apply(group_func)
+def _groupFlows(dataFlows):
+    """
+    Groups the rows of a paths table by timestamp and flowName in one pass and returns the flows dictionary.
+    """
+    # Grouping paths by timestamp and flowName in one pass, removing the brackets from the path strings
+    logger.debug("Grouping paths...")
+    paths = pc.utf8_slice_codeunits(dataFlows["path"], 1, -1)
+    dataFlows = pa.table(
+        {
+            "timestamp": pc.dictionary_encode(dataFlows["timestamp"]),
+            "flowName": pc.dictionary_encode(
+                pc.binary_join_element_wise(
+                    dataFlows["pathStart"], dataFlows["pathEnd"], ";"
+                )
+            ),
+            "path": paths,
+            "pathLength": pc.utf8_length(paths),
+            # Paths that start and end at the same router are dropped with their flow
+            "loop": pc.equal(dataFlows["pathStart"], dataFlows["pathEnd"]),
+        }
+    )
+
+    # Without threads the paths of each group keep the order they have in the dataset
+    grouped = (
+        dataFlows.group_by(["timestamp", "flowName"], use_threads=False)
+        .aggregate([("path", "list"), ("pathLength", "max"), ("loop", "any")])
+        .filter((pc.field("pathLength_max") > 1) & ~pc.field("loop_any"))
+    )
+
+    # Decoding the group keys to sort the groups like pandas does
+    for column in ["timestamp", "flowName"]:
+        grouped = grouped.set_column(
+            grouped.schema.get_field_index(column),
+            column,
+            grouped[column].cast(pa.string()),
+        )
+    grouped = grouped.sort_by([("timestamp", "ascending"), ("flowName", "ascending")])
+    logger.debug("Finished grouping paths")
+
+    # Constructing the final flows dictionary, only keeping flows with a path of more than one router
+    # (link has to have at least 2 routers)
+    logger.debug("Constructing flows dictionary...")
+    flows = {}
+    for timestamp, flowName, flowPaths in zip(
+        grouped["timestamp"].to_pylist(),
+        grouped["flowName"].to_pylist(),
+        grouped["path_list"].to_pylist(),
+    ):
+        flows.setdefault(timestamp, {})[flowName] = flowPaths
+    logger.debug("Finished constructing flows dictionary")
 
+    return flows
 
-def _groupFunc(x):
-    # Return array of paths, removing the brackets from the string
-    return [path[1:-1] for path in x]
 
+def _groupTraffic(dataTraffic):
+    """
+    Groups the rows of a traffic DataFrame by timestamp and flowName and returns the traffic dictionary.
+    """
+    dataTraffic["flowName"] = dataTraffic["flowStart"] + ";" + dataTraffic["flowEnd"]
+    dataTraffic = dataTraffic.drop(["flowStart", "flowEnd"], axis=1)
+
+    # Grouping traffic by timestamp and flow
+    logger.debug("Grouping traffic...")
+    grouped_traffic = (
+        dataTraffic.groupby(["timestamp", "flowName"])["traffic"].first().to_dict()
+    )
+    logger.debug("Finished grouping traffic")
+
+    # Constructing the final traffic dictionary
+    logger.debug("Constructing traffic dictionary...")
+    traffic = {}
+    for (timestamp, flowName), traffic_value in grouped_traffic.items():
+        sd = flowName.split(";")
+        if timestamp not in traffic:
+            traffic[timestamp] = {}
+        # dont add traffic that starts and ends at the same router
+        if sd[0] == sd[1]:
+            continue
+        traffic[timestamp][flowName] = traffic_value
+    logger.debug("Finished constructing traffic dictionary")
+
+    return traffic
 
-def _mergeResults(results):
-    return {k: v for result in results for k, v in result.items()}
+
+def datasetFiles(day):
+    """
+    Returns the paths of the dataset files read for a day: the links, flow paths and flow traffic.
+    """
+    return [
+        f"{DATASET_PATH}/{DATASET_LINKS_NAME}.csv",
+        f"{DATASET_PATH}/{DATASET_PATHS_PREFIX}{day}.csv",
+        f"{DATASET_PATH}/{DATASET_TRAFFIC_PREFIX}{day}.csv",
+    ]
 
 
-def readFlows(day):
+def readFlows(day, topology=None):
     """
     Reads the flow paths from the dataset and returns a dictionary with the flows grouped by timestamp and flowName.
     The paths are also split into a list of paths.
@@ -50,6 +162,9 @@ def readFlows(day):
     #### day: int
     The day of the dataset to read the flows from.
 
+    #### topology: Topology
+    If given, every distinct path of the day is interned in the topology, building the path to link ids index.
+
     ### Returns:
     ----------
     A dictionary with the flows grouped by timestamp and flowName, with the paths split into a list of paths.
@@ -59,58 +174,31 @@ def readFlows(day):
         logger.info("START: reading flows...")
 
         logger.info("Reading paths...")
-        dataFlows = pd.read_csv(
-            f"{DATASET_PATH}/{DATASET_PATHS_PREFIX}{day}.csv",
-            names=["timestamp", "pathStart", "pathEnd", "path"],
-            engine="pyarrow",
-        )
-        dataFlows["flowName"] = dataFlows["pathStart"] + ";" + dataFlows["pathEnd"]
+        with timing.stage("parse"):
+            dataFlows = pacsv.read_csv(
+                f"{DATASET_PATH}/{DATASET_PATHS_PREFIX}{day}.csv",
+                read_options=pacsv.ReadOptions(column_names=PATHS_SCHEMA.names),
+                convert_options=pacsv.ConvertOptions(
+                    column_types={field.name: field.type for field in PATHS_SCHEMA}
+                ),
+            )
         logger.info(
-            "Finished reading paths, number of paths: " + str(len(dataFlows.index))
+            "Finished reading paths, number of paths: " + str(dataFlows.num_rows)
         )
 
-        # Grouping paths by timestamp and flowName, and splitting the path string into a list of paths
-        logger.debug("Grouping paths...")
-
-        # Splitting data into chunks for multiprocessing
-        chunkSize = len(dataFlows) // CPU_THREADS
-        logger.info(
-            f"Grouping using CPU threads: {CPU_THREADS} | chunkSize: {chunkSize} | len(dataFlows): {len(dataFlows)}"
-        )
-        chunks = [
-            (
-                dataFlows[i:]
-                if rangeIndex == CPU_THREADS - 1
-                else dataFlows[i : i + chunkSize]
+        with timing.stage("group"):
+            flows = _groupFlows(dataFlows)
+
+        if topology is not None:
+            logger.debug("Building path index...")
+            with timing.stage("index"):
+                for timestamp in flows:
+                    for paths in flows[timestamp].values():
+                        for path in paths:
+                            topology.addPath(path)
+            logger.info(
+                f"Finished building path index, number of distinct paths: {len(topology.pathLinks)}"
             )
-            for rangeIndex, i in enumerate([i * chunkSize for i in range(CPU_THREADS)])
-        ]
-
-        partialProcessGroup = partial(_processGroup, group_func=_groupFunc)
-
-        # Create a pool of processes and apply the process_group function to each chunk
-        with mp.Pool(processes=CPU_THREADS) as pool:
-            results = pool.map(partialProcessGroup, chunks)
-
-        # Merge the results from all processes
-        grouped_flows = _mergeResults(results)
-
-        # grouped_flows = dataFlows.groupby(['timestamp', 'flowName'])['path'].apply(lambda x: [path[1:-1].split(';') for path in x]).to_dict()
-        logger.debug("Finished grouping paths")
-
-        # Constructing the final flows dictionary, only keeping paths with more than one router in path
-        logger.debug("Constructing flows dictionary...")
-        flows = {}
-        for (timestamp, flowName), paths in grouped_flows.items():
-            sd = flowName.split(";")
-            for path in paths:
-                # Only keep paths with more than one router (link has to have at least 2 routers)
-                # Also dont add paths that start and end at the same router
-                if len(path) > 1 and sd[0] != sd[1]:
-                    if timestamp not in flows:
-                        flows[timestamp] = {}
-                    flows[timestamp][flowName] = paths
-        logger.debug("Finished constructing flows dictionary")
 
         logger.info("END: reading flows, number of groups: " + str(len(flows)))
     except Exception as e:
@@ -128,17 +216,19 @@ def readLinks():
     ----------
     A dictionary with the links indexed by linkName.
     """
+    import pandas as pd
 
     try:
         logger.info("START: reading links...")
 
         logger.info("Reading links...")
-        dataCapacity = pd.read_csv(
-            f"{DATASET_PATH}/{DATASET_LINKS_NAME}.csv",
-            names=["linkStart", "linkEnd", "capacity"],
-            skiprows=1,
-            engine="pyarrow",
-        )
+        with timing.stage("parse"):
+            dataCapacity = pd.read_csv(
+                f"{DATASET_PATH}/{DATASET_LINKS_NAME}.csv",
+                names=["linkStart", "linkEnd", "capacity"],
+                skiprows=1,
+                engine="pyarrow",
+            )
         dataCapacity["linkName"] = (
             dataCapacity["linkStart"] + ";" + dataCapacity["linkEnd"]
         )
@@ -167,43 +257,24 @@ def readTraffic(day):
     ----------
     A dictionary with the traffic grouped by timestamp and flow.
     """
+    import pandas as pd
 
     try:
         logger.info("START: reading traffic...")
 
         logger.info("Started reading traffic...")
-        dataTraffic = pd.read_csv(
-            f"{DATASET_PATH}/{DATASET_TRAFFIC_PREFIX}{day}.csv",
-            names=["timestamp", "flowStart", "flowEnd", "traffic"],
-            engine="pyarrow",
-        )
-        dataTraffic["flowName"] = (
-            dataTraffic["flowStart"] + ";" + dataTraffic["flowEnd"]
-        )
-        dataTraffic = dataTraffic.drop(["flowStart", "flowEnd"], axis=1)
+        with timing.stage("parse"):
+            dataTraffic = pd.read_csv(
+                f"{DATASET_PATH}/{DATASET_TRAFFIC_PREFIX}{day}.csv",
+                names=["timestamp", "flowStart", "flowEnd", "traffic"],
+                engine="pyarrow",
+            )
         logger.info(
             "Finished reading traffic, number of flows: " + str(len(dataTraffic.index))
         )
 
-        # Grouping traffic by timestamp and flow
-        logger.debug("Grouping traffic...")
-        grouped_traffic = (
-            dataTraffic.groupby(["timestamp", "flowName"])["traffic"].first().to_dict()
-        )
-        logger.debug("Finished grouping traffic")
-
-        # Constructing the final traffic dictionary
-        logger.debug("Constructing traffic dictionary...")
-        traffic = {}
-        for (timestamp, flowName), traffic_value in grouped_traffic.items():
-            sd = flowName.split(";")
-            if timestamp not in traffic:
-                traffic[timestamp] = {}
-            # dont add traffic that starts and ends at the same router
-            if sd[0] == sd[1]:
-                continue
-            traffic[timestamp][flowName] = traffic_value
-        logger.debug("Finished constructing traffic dictionary")
+        with timing.stage("group"):
+            traffic = _groupTraffic(dataTraffic)
 
         logger.info("END: reading traffic, number of groups: " + str(len(traffic)))
     except Exception as e:
@@ -213,84 +284,237 @@ def readTraffic(day):
     return traffic
 
 
-def readPathRatios(date, dayNum, hour, type=None):
+def _openBatches(file, schema, columns=None):
     """
-    Reads the path ratios from the dataset and returns a dictionary with the ratios grouped by timestamp and flowName.
+    Opens a dataset file for reading in batches, with the columns of a schema or only some of them.
+    """
+    return pacsv.open_csv(
+        file,
+        read_options=pacsv.ReadOptions(column_names=schema.names),
+        convert_options=pacsv.ConvertOptions(
+            column_types={field.name: field.type for field in schema},
+            include_columns=columns,
+        ),
+    )
+
+
+def _iterHourTables(file, schema):
+    """
+    Reads a dataset file in batches and yields the rows of each timestamp as a table, in file order.
+    The rows of a timestamp have to be contiguous in the file, see `checkStreamable`.
+    """
+    timestamp = None
+    batches = []
+    seen = set()
+    for batch in _openBatches(file, schema):
+        if batch.num_rows == 0:
+            continue
+
+        # Split the batch where the timestamp changes
+        timestamps = batch.column(0).to_numpy(zero_copy_only=False)
+        starts = np.flatnonzero(timestamps[1:] != timestamps[:-1]) + 1
+        for start, end in zip([0, *starts], [*starts, batch.num_rows]):
+            if timestamps[start] != timestamp:
+                if batches:
+                    yield timestamp, pa.Table.from_batches(batches)
+                timestamp = timestamps[start]
+                if timestamp in seen:
+                    raise ValueError(
+                        f"rows of {timestamp} are not contiguous in {file}"
+                    )
+                seen.add(timestamp)
+                batches = []
+            batches.append(batch.slice(start, end - start))
+
+    if batches:
+        yield timestamp, pa.Table.from_batches(batches)
+
+
+def checkStreamable(day):
+    """
+    Checks that the flow paths and traffic of a day can be read one timestamp at a time by `iterHours`,
+    with the rows of each timestamp in one contiguous block of each file. Only the timestamp column of
+    the files is read.
 
     ### Parameters:
     ----------
-    #### date: str
-    The date of the ratios to read in format YYYYMMDD.
-    #### type: str
-    The type of ratios to read.
-    #### day: str
-    The day of the week of the ratios to read.
-    #### hour: str
-    The hour of the ratios to read.
+    #### day: int
+    The day of the dataset to check.
 
-    ### Returns:
+    ### Raises:
     ----------
-    A dictionary with the ratios grouped by timestamp and flowName.
+    ValueError if a file can not be read or lists the rows of a timestamp in several blocks.
     """
+    for file, schema in [
+        (f"{DATASET_PATH}/{DATASET_PATHS_PREFIX}{day}.csv", PATHS_SCHEMA),
+        (f"{DATASET_PATH}/{DATASET_TRAFFIC_PREFIX}{day}.csv", TRAFFIC_SCHEMA),
+    ]:
+        try:
+            batches = _openBatches(file, schema, ["timestamp"])
+        except Exception as e:
+            raise ValueError(f"Can not read {file}: {e}")
+
+        timestamp = None
+        seen = set()
+        for batch in batches:
+            if batch.num_rows == 0:
+                continue
+
+            timestamps = batch.column(0).to_numpy(zero_copy_only=False)
+            starts = np.flatnonzero(timestamps[1:] != timestamps[:-1]) + 1
+            for start in [0, *starts]:
+                if timestamps[start] == timestamp:
+                    continue
+                timestamp = timestamps[start]
+                if timestamp in seen:
+                    raise ValueError(
+                        f"The rows of {timestamp} are not contiguous in {file}, streaming needs the rows of each timestamp in one block. Sort the file by timestamp or run without --stream."
+                    )
+                seen.add(timestamp)
 
-    try:
 
-        if type is None:
-            type = "paths"
+def iterHours(day):
+    """
+    Reads the flow paths and traffic from the dataset one timestamp at a time, so only one hour of the day
+    is held in memory. The files are read in batches and each has to list the rows of a timestamp in one
+    contiguous block, see `checkStreamable`. The files may list the timestamps in different orders, the
+    traffic of timestamps read ahead of the paths is then held until their paths are read.
 
-        pathRatios = {}
+    ### Parameters:
+    ----------
+    #### day: int
+    The day of the dataset to read the flows and traffic from.
+
+    ### Returns:
+    ----------
+    A generator of (timestamp, flows, traffic), with the flows and traffic of the hour in the format of
+    `readFlows` and `readTraffic`.
+    """
 
-        dataRatios = pd.read_csv(
-            f"{DATA_OUTPUT_DIR}/day{dayNum}/{RATIOS_DIR_NAME}/{type}/{date}_{hour}_ratios.csv",
-            names=["flowName", "path", "ratio"],
-            engine="pyarrow",
-            skiprows=1,
+    try:
+        logger.info("START: streaming flows and traffic...")
+
+        trafficHours = _iterHourTables(
+            f"{DATASET_PATH}/{DATASET_TRAFFIC_PREFIX}{day}.csv", TRAFFIC_SCHEMA
         )
+        pendingTraffic = {}
+        for timestamp, dataFlows in _iterHourTables(
+            f"{DATASET_PATH}/{DATASET_PATHS_PREFIX}{day}.csv", PATHS_SCHEMA
+        ):
+            if timestamp not in pendingTraffic:
+                for trafficTimestamp, dataTraffic in trafficHours:
+                    pendingTraffic[trafficTimestamp] = dataTraffic
+                    if trafficTimestamp == timestamp:
+                        break
+            dataTraffic = pendingTraffic.pop(timestamp, None)
+
+            with timing.stage("group"):
+                flows = _groupFlows(dataFlows).get(timestamp)
+                if flows is None:
+                    continue
+
+                # Hours without traffic rows have no traffic, as with `readTraffic`
+                traffic = (
+                    _groupTraffic(dataTraffic.to_pandas())[timestamp]
+                    if dataTraffic is not None
+                    else {}
+                )
+            logger.info(
+                f"Read {timestamp}, number of paths: {dataFlows.num_rows}, number of flows: {len(flows)}"
+            )
 
-        # Create a dictionary to hold the path ratios
-        pathRatios = {}
+            yield timestamp, flows, traffic
 
-        # Iterate over the rows of the DataFrame and populate the dictionary
-        for _, row in dataRatios.iterrows():
-            flowName = row["flowName"]
-            path = row["path"]
-            ratio = row["ratio"]
+        logger.info("END: streaming flows and traffic")
+    except Exception as e:
+        logger.error(f"Error streaming flows and traffic: {e}")
+        sys.exit(1)
 
-            # If the flowName is not already in the dictionary, add it
-            if flowName not in pathRatios:
-                pathRatios[flowName] = {}
 
-            # Add the path and ratio to the nested dictionary for the flowName
-            pathRatios[flowName][path] = ratio
+def readFailureScenarios(filePath):
+    """
+    Reads a list of failure scenarios, one scenario per line with the links that fail together separated
+    by commas, e.g. 'A;B,B;A'. Empty lines and lines starting with '#' are skipped.
 
-        logger.info(
-            f"Finished reading day{dayNum} {type} ratios ({date}_{hour}), number of groups: {str(len(pathRatios))}"
-        )
+    ### Returns:
+    ----------
+    A list with the links of each scenario.
+    """
+    try:
+        scenarios = []
+        with open(filePath) as file:
+            for line in file:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+
+                scenario = [link.strip() for link in line.split(",")]
+                for link in scenario:
+                    if link.count(";") != 1:
+                        raise ValueError(f"Invalid link: {link}")
+                scenarios.append(scenario)
+        logger.info(f"Read {len(scenarios)} failure scenarios")
     except Exception as e:
-        logger.error(f"Error reading ratios: {e}")
+        logger.error(f"Error reading failure scenarios: {e}")
         sys.exit(1)
 
-    return pathRatios
+    return scenarios
 
 
-def writeDataToFile(data, outputFile, parserArgs):
+def readRunReport(parserArgs):
+    """
+    Returns the total time of each hour in the latest run report of the day and model, or an empty dict
+    if there is none.
     """
-    Writes the daily utilization data to a CSV file.
+    import pandas as pd
+
+    reportsDir = f"{DATA_OUTPUT_DIR}/day{parserArgs.day}/{REPORTS_DIR_NAME}"
+    reports = sorted(
+        glob.glob(f"{reportsDir}/*_{parserArgs.model_type}_run.*"),
+        key=os.path.getmtime,
+    )
+    if not reports:
+        return {}
+
+    try:
+        if reports[-1].endswith(f".{OUTPUT_FORMAT_PARQUET}"):
+            report = pd.read_parquet(reports[-1], columns=["timestamp", "total"])
+        else:
+            report = pd.read_csv(reports[-1], usecols=["timestamp", "total"])
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable run report {reports[-1]}: {e}")
+        return {}
+
+    return dict(zip(report["timestamp"], report["total"]))
+
+
+def writeDataToFile(data, outputFile, parserArgs, append=False):
+    """
+    Writes the daily utilization data to a CSV file, or to Parquet with `--output-format parquet`.
+
+    In Parquet, the ratios and links of each hour are written to the `hour` partition of one dataset
+    per day and date, with the flowName and path columns dictionary-encoded.
 
     ### Parameters:
     ----------
     #### data: pandas.DataFrame
     The daily utilization data to write to a file.
+
+    #### append: bool
+    Append the data to the file written by a previous call instead of replacing it.
+
+    The hour workers write their ratios and links with this function, so errors are raised to the
+    pool instead of exiting the worker, which would leave the pool waiting for its result.
     """
 
     try:
         dayOutputDir = f"{DATA_OUTPUT_DIR}/day{parserArgs.day}"
 
-        if not os.path.exists(dayOutputDir):
-            os.makedirs(dayOutputDir)
+        os.makedirs(dayOutputDir, exist_ok=True)
 
         filePath = ""
         timestamp = datetime.now().strftime("%Y%m%d")
+        parquet = parserArgs.output_format == OUTPUT_FORMAT_PARQUET
 
         match outputFile:
             case "overviewData":
@@ -305,27 +529,99 @@ def writeDataToFile(data, outputFile, parserArgs):
                         filePath = f"{dayOutputDir}/{timestamp}_{parserArgs.model_type}_using_paths_day{day}_{date}_{useratios}.csv"
                 else:
                     filePath = f"{dayOutputDir}/{timestamp}_{parserArgs.model_type}.csv"
+                if parquet:
+                    filePath = filePath[: -len(".csv")] + ".parquet"
             case "ratioData":
                 ratiosDir = f"{dayOutputDir}/{RATIOS_DIR_NAME}/{parserArgs.model_type}"
-                # create directory if it does not exist
-                if not os.path.exists(ratiosDir):
-                    os.makedirs(ratiosDir)
+                os.makedirs(ratiosDir, exist_ok=True)
                 time = data["timestamp"][0][4:-6]
                 data.drop(["timestamp"], axis=1, inplace=True)
-                filePath = f"{ratiosDir}/{timestamp}_{time}_ratios.csv"
+                if parquet:
+                    filePath = f"{ratiosDir}/{timestamp}/hour={time}/part-0.parquet"
+                else:
+                    filePath = f"{ratiosDir}/{timestamp}_{time}_ratios.csv"
             case "linkData":
                 linksDir = f"{dayOutputDir}/{LINKS_DIR_NAME}/{parserArgs.model_type}"
-                if not os.path.exists(linksDir):
-                    os.makedirs(linksDir)
+                os.makedirs(linksDir, exist_ok=True)
 
-                time = (data["timestamp"][0][:3] + data["timestamp"][0][4:-6]).lower()
-                filePath = f"{linksDir}/{timestamp}_{time}_links.csv"
+                if parquet:
+                    time = data["timestamp"][0][4:-6]
+                    filePath = f"{linksDir}/{timestamp}/hour={time}/part-0.parquet"
+                else:
+                    time = (
+                        data["timestamp"][0][:3] + data["timestamp"][0][4:-6]
+                    ).lower()
+                    filePath = f"{linksDir}/{timestamp}_{time}_links.csv"
+            case "failureData":
+                filePath = (
+                    f"{dayOutputDir}/{timestamp}_{parserArgs.model_type}_failures.csv"
+                )
+                if parquet:
+                    filePath = filePath[: -len(".csv")] + ".parquet"
+            case "runReport":
+                reportsDir = f"{dayOutputDir}/{REPORTS_DIR_NAME}"
+                os.makedirs(reportsDir, exist_ok=True)
+                extension = OUTPUT_FORMAT_PARQUET if parquet else OUTPUT_FORMAT_CSV
+                filePath = (
+                    f"{reportsDir}/{timestamp}_{parserArgs.model_type}_run.{extension}"
+                )
             case _:
                 raise ValueError(f"Invalid output file: {outputFile}")
 
         logger.info(f"Writing data to file...")
-        data.to_csv(filePath, mode="w", header=True, index=False)
+        with timing.stage("write"):
+            if parquet:
+                _writeParquet(data, filePath, append)
+            else:
+                data.to_csv(
+                    filePath,
+                    mode="a" if append else "w",
+                    header=not append,
+                    index=False,
+                )
         logger.info(f"Finished writing data to file")
     except Exception as e:
         logger.error(f"Error writing data to file: {e}")
+        raise
+
+
+def writeProfile(profile, parserArgs):
+    """
+    Writes the profile of a run as JSON to the reports directory of the day.
+
+    ### Parameters:
+    ----------
+    #### profile: dict
+    The profile of the run, with the stage times and counters of the main process and every hour.
+    """
+    try:
+        reportsDir = f"{DATA_OUTPUT_DIR}/day{parserArgs.day}/{REPORTS_DIR_NAME}"
+        os.makedirs(reportsDir, exist_ok=True)
+
+        timestamp = datetime.now().strftime("%Y%m%d")
+        filePath = f"{reportsDir}/{timestamp}_{parserArgs.model_type}_profile.json"
+
+        logger.info(f"Writing profile to {filePath}...")
+        with open(filePath, "w") as file:
+            # numpy values of the report records are converted to Python numbers
+            json.dump(profile, file, indent=2, default=lambda value: value.item())
+    except Exception as e:
+        logger.error(f"Error writing profile: {e}")
         sys.exit(1)
+
+
+def _writeParquet(data, filePath, append=False):
+    table = pa.Table.from_pandas(data, preserve_index=False)
+
+    # Flow names and paths repeat on many rows, so they are stored as dictionaries
+    for column in ["flowName", "path"]:
+        if column in table.column_names:
+            index = table.schema.get_field_index(column)
+            table = table.set_column(index, column, pc.dictionary_encode(table[column]))
+
+    # Parquet files can not be appended to, so the file is rewritten with the new rows
+    if append and os.path.exists(filePath):
+        table = pa.concat_tables([pq.read_table(filePath), table])
+
+    os.makedirs(os.path.dirname(filePath), exist_ok=True)
+    pq.write_table(table, filePath)
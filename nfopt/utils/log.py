@@ -3,28 +3,37 @@ import sys
 import logging
 
 from datetime import datetime
-from dotenv import load_dotenv
 
-load_dotenv("variables.env")
+from nfopt.utils import config
+
+config.load()
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(process)d - %(message)s"
+
+
+class _LogFileHandler(logging.FileHandler):
+    """
+    Log file handler that creates the logging directory when the first record is written, so
+    processes that never log, e.g. `nfopt --help`, do not create it.
+    """
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
 
 
 def setupCustomLogger(name):
-    outdir = os.getenv("LOGGING_DIR")
-    if not os.path.exists(outdir):
-        os.makedirs(outdir)
+    # The log file is configured once per process, and opened on the first record
+    if not logging.root.handlers:
+        outdir = os.getenv("LOGGING_DIR")
+        timestamp = datetime.now().strftime("%Y%m%d")
+        fileHandler = _LogFileHandler(f"{outdir}/{timestamp}_p6.log", delay=True)
+        fileHandler.setFormatter(logging.Formatter(FORMAT))
+        logging.root.addHandler(fileHandler)
+        logging.root.setLevel(_logLevel(os.getenv("LOGGING_LEVEL")))
 
-    format = "%(asctime)s - %(name)s - %(levelname)s - %(process)d - %(message)s"
-    formatter = logging.Formatter(format)
     handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(formatter)
-
-    timestamp = datetime.now().strftime("%Y%m%d")
-    log_filename = f"{outdir}/{timestamp}_p6.log"
-    logging.basicConfig(
-        filename=log_filename,
-        level=_logLevel(os.getenv("LOGGING_LEVEL")),
-        format=format,
-    )
+    handler.setFormatter(logging.Formatter(FORMAT))
 
     logger = logging.getLogger(name)
     logger.addHandler(handler)
@@ -0,0 +1,168 @@
+import os
+import glob
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+
+from nfopt.utils import log
+from nfopt.utils import data as dataUtils
+
+logger = log.setupCustomLogger(__name__)
+
+RATIO_SCHEMA = pa.schema(
+    [("flowName", pa.string()), ("path", pa.string()), ("ratio", pa.float64())]
+)
+HOUR_PARTITIONING = ds.partitioning(pa.schema([("hour", pa.string())]), flavor="hive")
+
+
+def ratioFiles(date, dayNum, types=None):
+    """
+    Returns the ratio files written on a date for a day, for the given ratio types or all types if None.
+    Ratios written as Parquet are returned as the directory of their dataset.
+    """
+    ratiosDir = f"{dataUtils.DATA_OUTPUT_DIR}/day{dayNum}/{dataUtils.RATIOS_DIR_NAME}"
+    return sorted(
+        file
+        for type in (types if types is not None else ["*"])
+        for pattern in [f"{date}_*_ratios.csv", date]
+        for file in glob.glob(f"{ratiosDir}/{type}/{pattern}")
+    )
+
+
+def _readRatioFile(file, date):
+    """
+    Returns the ratios of a file or Parquet dataset, with the hours and number of rows of each hour.
+    """
+    if os.path.isdir(file):
+        table = (
+            ds.dataset(file, format="parquet", partitioning=HOUR_PARTITIONING)
+            .to_table()
+            .sort_by("hour")
+        )
+        hours, counts = np.unique(
+            table["hour"].to_numpy(zero_copy_only=False), return_counts=True
+        )
+        return table.select(RATIO_SCHEMA.names).cast(RATIO_SCHEMA), hours, counts
+
+    table = pacsv.read_csv(
+        file,
+        read_options=pacsv.ReadOptions(column_names=RATIO_SCHEMA.names, skip_rows=1),
+        convert_options=pacsv.ConvertOptions(
+            column_types={field.name: field.type for field in RATIO_SCHEMA}
+        ),
+    )
+    # Ratio files are named {date}_{hour}_ratios.csv
+    hour = os.path.basename(file)[len(date) + 1 : -len("_ratios.csv")]
+    return table, [hour], [table.num_rows]
+
+
+class RatioStore:
+    """
+    The path ratios of a day written by earlier runs, for every model type and hour, read in one go
+    from the CSV files or Parquet datasets of `data.writeDataToFile`.
+
+    Every path of the ratio files is interned in the given `Topology`, so the ratios of an hour can be
+    gathered with the day-level path ids of `HourPaths.pathIds` instead of looking up each flow and
+    path string.
+    """
+
+    def __init__(self, date, dayNum, topology, types=None):
+        """
+        ### Parameters:
+        ----------
+        #### date: str
+        The date of the ratios to read in format YYYYMMDD.
+
+        #### dayNum: str
+        The day of the week of the ratios to read.
+
+        #### topology: Topology
+        The topology to intern the paths of the ratios in.
+
+        #### types: list
+        The ratio types to read, all types found in the ratios directory if None.
+        """
+        self.topology = topology
+
+        try:
+            files = ratioFiles(date, dayNum, types)
+            if not files:
+                raise FileNotFoundError(f"no ratios of {date} for day{dayNum}")
+
+            tables = []
+            self._rows = {}
+            start = 0
+            for file in files:
+                table, hours, counts = _readRatioFile(file, date)
+                # Ratios are stored in the directory of their type
+                type = os.path.basename(os.path.dirname(file))
+                for hour, count in zip(hours, counts):
+                    self._rows[(type, str(hour))] = (start, start + count)
+                    start += count
+                tables.append(table)
+            ratios = pa.concat_tables(tables)
+
+            self.flowNames = ratios["flowName"].to_pylist()
+            self.paths = ratios["path"].to_pylist()
+            self.ratios = ratios["ratio"].to_numpy()
+            self.pathIds = np.fromiter(
+                (topology.addPath(path) for path in self.paths),
+                dtype=np.int64,
+                count=len(self.paths),
+            )
+
+            logger.info(
+                f"Finished reading day{dayNum} ratios ({date}), number of files: {len(files)}, number of paths: {len(self.paths):,}"
+            )
+        except Exception as e:
+            logger.error(f"Error reading ratios: {e}")
+            raise
+
+    def _hourRows(self, type, hour):
+        rows = self._rows.get((type, hour))
+        if rows is None:
+            raise ValueError(f"No {type} ratios for hour {hour}")
+        return rows
+
+    def flowPaths(self, type, hour):
+        """
+        Returns the paths of each flow in the ratios of an hour, in the format of `data.readFlows`.
+        """
+        start, end = self._hourRows(type, hour)
+        flowPaths = {}
+        for flowName, path in zip(self.flowNames[start:end], self.paths[start:end]):
+            flowPaths.setdefault(flowName, []).append(path)
+        return flowPaths
+
+    def pathRatios(self, type, hour, hourPaths):
+        """
+        Returns the ratio of each path of the compiled hour, NaN for paths without a ratio.
+
+        ### Parameters:
+        ----------
+        #### type: str
+        The ratio type, i.e. the model type that wrote the ratios.
+
+        #### hour: str
+        The hour of the ratios.
+
+        #### hourPaths: HourPaths
+        The compiled paths of the hour, compiled against the topology of the store.
+        """
+        start, end = self._hourRows(type, hour)
+        ratios = np.full(len(hourPaths.pathIds), np.nan)
+        if start == end:
+            return ratios
+
+        # Row of each path of the hour among the sorted path ids of the ratios, if it has one
+        ratioIds = self.pathIds[start:end]
+        order = np.argsort(ratioIds)
+        rows = order[
+            np.minimum(
+                np.searchsorted(ratioIds[order], hourPaths.pathIds), end - start - 1
+            )
+        ]
+        found = ratioIds[rows] == hourPaths.pathIds
+        ratios[found] = self.ratios[start:end][rows[found]]
+        return ratios
@@ -0,0 +1,389 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from nfopt.utils import log
+from nfopt.utils.topology import Topology, HourPaths
+
+logger = log.setupCustomLogger(__name__)
+
+# Bumped whenever the layout of the store changes, so stores of older versions are not read
+STORE_VERSION = 1
+CACHE_DIR_NAME = ".nfopt-cache"
+# Size, modification time and hash of each dataset file, in the cache directory
+MANIFEST_FILE_NAME = "manifest.json"
+
+LINKS_FILE_NAME = "links.arrow"
+PATHS_FILE_NAME = "paths.arrow"
+FLOWS_FILE_NAME = "flows.arrow"
+HOURS_FILE_NAME = "hours.arrow"
+TRAFFIC_FILE_NAME = "traffic.arrow"
+
+LINKS_SCHEMA = pa.schema(
+    [
+        ("linkName", pa.string()),
+        ("linkStart", pa.string()),
+        ("linkEnd", pa.string()),
+        # Null for links only found in the paths, they get the default capacity when loaded
+        ("capacity", pa.float64()),
+    ]
+)
+PATHS_SCHEMA = pa.schema([("path", pa.string()), ("links", pa.list_(pa.int32()))])
+FLOWS_SCHEMA = pa.schema([("flowName", pa.string())])
+HOURS_SCHEMA = pa.schema([("flowId", pa.int32()), ("pathId", pa.int32())])
+TRAFFIC_SCHEMA = pa.schema([("flowId", pa.int32()), ("traffic", pa.float64())])
+
+
+def _fileHash(file):
+    """
+    Returns a hash of the contents of a file.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def _readManifest(manifestFile):
+    try:
+        with open(manifestFile) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _writeManifest(manifestFile, manifest):
+    try:
+        os.makedirs(os.path.dirname(manifestFile), exist_ok=True)
+        tmpFile = f"{manifestFile}.tmp{os.getpid()}"
+        with open(tmpFile, "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmpFile, manifestFile)
+    except OSError as e:
+        logger.warning(f"Could not write the cache manifest {manifestFile}: {e}")
+
+
+def contentHash(files, manifestFile=None):
+    """
+    Returns a hash of the contents of the given files and the store version.
+
+    The hash of each file is kept in the manifest with its size and modification time, and a file is
+    only read again if they changed, so runs on an unchanged dataset only look up its files.
+
+    ### Parameters:
+    ----------
+    #### files: list
+    The files to hash.
+
+    #### manifestFile: str
+    The JSON manifest of the file hashes, every file is read if None.
+    """
+    manifest = _readManifest(manifestFile) if manifestFile is not None else {}
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(STORE_VERSION).encode())
+
+    changed = False
+    for file in files:
+        stat = os.stat(file)
+        key = os.path.abspath(file)
+        entry = manifest.get(key)
+        if (
+            entry is None
+            or entry["size"] != stat.st_size
+            or entry["mtimeNs"] != stat.st_mtime_ns
+        ):
+            entry = {
+                "size": stat.st_size,
+                "mtimeNs": stat.st_mtime_ns,
+                "hash": _fileHash(file),
+            }
+            manifest[key] = entry
+            changed = True
+        digest.update(entry["hash"].encode())
+
+    if changed and manifestFile is not None:
+        _writeManifest(manifestFile, manifest)
+
+    return digest.hexdigest()
+
+
+def cacheDir(datasetPath, day, files):
+    """
+    Returns the directory of the cached store of a day, next to the dataset and keyed by the hash of its files.
+    The hashes are kept in the manifest of the cache, so unchanged files are not read again.
+
+    ### Parameters:
+    ----------
+    #### datasetPath: str
+    The directory of the dataset.
+
+    #### day: int
+    The day of the dataset.
+
+    #### files: list
+    The dataset files the store is built from.
+    """
+    cachePath = os.path.join(datasetPath, CACHE_DIR_NAME)
+    try:
+        digest = contentHash(files, os.path.join(cachePath, MANIFEST_FILE_NAME))
+    except OSError as e:
+        logger.error(f"Error reading dataset files: {e}")
+        sys.exit(1)
+
+    return os.path.join(cachePath, f"day{day}-{digest}")
+
+
+def writeDayStore(storeDir, links, flows, traffic, topology):
+    """
+    Writes the parsed and interned data of a day to Arrow IPC files.
+
+    The store holds the link and path dictionaries of the topology (with the link ids crossed by
+    each path), the flow names, and the (flowId, pathId) and (flowId, traffic) rows of every hour
+    with the row offsets of each timestamp. It is written to a temporary directory and renamed
+    once complete, so a partly written store is never read.
+
+    ### Parameters:
+    ----------
+    #### storeDir: str
+    The directory to write the store to.
+
+    #### links: dict
+    The links read with `data.readLinks`.
+
+    #### flows: dict
+    The flows read with `data.readFlows`.
+
+    #### traffic: dict
+    The traffic read with `data.readTraffic`.
+
+    #### topology: Topology
+    The topology the paths were interned in by `data.readFlows`.
+    """
+    logger.info(f"Writing day store to {storeDir}...")
+
+    tmpDir = f"{storeDir}.tmp{os.getpid()}"
+    os.makedirs(tmpDir, exist_ok=True)
+
+    _writeTable(
+        os.path.join(tmpDir, LINKS_FILE_NAME),
+        pa.table(
+            [
+                topology.linkNames,
+                [topology.routerNames[r] for r in topology.linkStart],
+                [topology.routerNames[r] for r in topology.linkEnd],
+                [
+                    float(links[link]["capacity"]) if link in links else None
+                    for link in topology.linkNames
+                ],
+            ],
+            schema=LINKS_SCHEMA,
+        ),
+    )
+
+    paths = [None] * len(topology.pathIds)
+    for path, pathId in topology.pathIds.items():
+        paths[pathId] = path
+    _writeTable(
+        os.path.join(tmpDir, PATHS_FILE_NAME),
+        pa.table([paths, topology.pathLinks], schema=PATHS_SCHEMA),
+    )
+
+    timestamps = list(flows)
+    flowIds = {}
+    hourFlowIds, hourPathIds, pathOffsets = [], [], [0]
+    trafficFlowIds, trafficValues, trafficOffsets = [], [], [0]
+
+    for timestamp in timestamps:
+        for flowName, flowPaths in flows[timestamp].items():
+            flowId = flowIds.setdefault(flowName, len(flowIds))
+            for path in flowPaths:
+                hourFlowIds.append(flowId)
+                hourPathIds.append(topology.addPath(path))
+        pathOffsets.append(len(hourPathIds))
+
+        for flowName, value in traffic.get(timestamp, {}).items():
+            trafficFlowIds.append(flowIds.setdefault(flowName, len(flowIds)))
+            trafficValues.append(value)
+        trafficOffsets.append(len(trafficValues))
+
+    _writeTable(
+        os.path.join(tmpDir, FLOWS_FILE_NAME),
+        pa.table([list(flowIds)], schema=FLOWS_SCHEMA),
+    )
+
+    metadata = {
+        b"timestamps": json.dumps(timestamps).encode(),
+        b"pathOffsets": json.dumps(pathOffsets).encode(),
+        b"trafficOffsets": json.dumps(trafficOffsets).encode(),
+    }
+    _writeTable(
+        os.path.join(tmpDir, HOURS_FILE_NAME),
+        pa.table(
+            [hourFlowIds, hourPathIds], schema=HOURS_SCHEMA.with_metadata(metadata)
+        ),
+    )
+    _writeTable(
+        os.path.join(tmpDir, TRAFFIC_FILE_NAME),
+        pa.table([trafficFlowIds, trafficValues], schema=TRAFFIC_SCHEMA),
+    )
+
+    if os.path.exists(storeDir):
+        shutil.rmtree(storeDir)
+    os.replace(tmpDir, storeDir)
+
+    logger.info(f"Finished writing day store, number of hours: {len(timestamps)}")
+
+
+def _writeTable(file, table):
+    with ipc.new_file(file, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _mapTable(file):
+    return ipc.open_file(pa.memory_map(file)).read_all()
+
+
+def _mapArray(column):
+    """
+    Returns the array of a memory-mapped column, without copying it if it has a single chunk.
+    """
+    if column.num_chunks == 1:
+        return column.chunk(0)
+    return (
+        pa.concat_arrays(column.chunks)
+        if column.num_chunks
+        else pa.array([], column.type)
+    )
+
+
+class DayStore:
+    """
+    Read access to a day store written by `writeDayStore`.
+
+    The files are memory-mapped, so processes reading the same store share the pages of the
+    operating system cache and only materialise the hour they ask for. The link ids of the paths and
+    the rows of each hour are used as numpy views of the mapped files, so an hour is compiled into
+    `HourPaths` without building the path index of the day.
+    """
+
+    def __init__(self, storeDir):
+        self.storeDir = storeDir
+        self._links = _mapTable(os.path.join(storeDir, LINKS_FILE_NAME))
+        self._paths = _mapTable(os.path.join(storeDir, PATHS_FILE_NAME))
+        self._flows = _mapTable(os.path.join(storeDir, FLOWS_FILE_NAME))
+        self._hours = _mapTable(os.path.join(storeDir, HOURS_FILE_NAME))
+        self._traffic = _mapTable(os.path.join(storeDir, TRAFFIC_FILE_NAME))
+
+        metadata = self._hours.schema.metadata
+        self.timestamps = json.loads(metadata[b"timestamps"])
+        self._pathOffsets = json.loads(metadata[b"pathOffsets"])
+        self._trafficOffsets = json.loads(metadata[b"trafficOffsets"])
+        self._hourIndex = {timestamp: i for i, timestamp in enumerate(self.timestamps)}
+        self.numLinks = self._links.num_rows
+
+        # Path strings, and the flattened link ids of every path with the offsets of the links of each path
+        self._pathNames = _mapArray(self._paths.column("path"))
+        pathLinks = _mapArray(self._paths.column("links"))
+        self._pathLinkPtr = pathLinks.offsets.to_numpy()
+        self._pathLinkIds = pathLinks.values.to_numpy()
+        self._hourFlowIds = _mapArray(self._hours.column("flowId")).to_numpy()
+        self._hourPathIds = _mapArray(self._hours.column("pathId")).to_numpy()
+
+    @staticmethod
+    def exists(storeDir):
+        return os.path.exists(os.path.join(storeDir, HOURS_FILE_NAME))
+
+    def numPaths(self, timestamp):
+        """
+        Returns the number of paths of a timestamp, without reading them.
+        """
+        hour = self._hourIndex[timestamp]
+        return self._pathOffsets[hour + 1] - self._pathOffsets[hour]
+
+    def readLinks(self):
+        """
+        Returns the links of the dataset, in the format of `data.readLinks`.
+        """
+        return {
+            row["linkName"]: {
+                "linkStart": row["linkStart"],
+                "linkEnd": row["linkEnd"],
+                "capacity": row["capacity"],
+            }
+            for row in self._links.to_pylist()
+            if row["capacity"] is not None
+        }
+
+    def readTopology(self, defaultCapacity):
+        """
+        Returns the topology of the day, with the links of the store and its memory-mapped path index
+        attached, see `Topology.attachPaths`.
+        """
+        topology = Topology(defaultCapacity=defaultCapacity)
+        for linkName, capacity in zip(
+            self._links.column("linkName").to_pylist(),
+            self._links.column("capacity").to_pylist(),
+        ):
+            topology.addLink(linkName, capacity)
+
+        topology.attachPaths(self._pathNames, self._pathLinkPtr, self._pathLinkIds)
+
+        return topology
+
+    def readHour(self, timestamp, topology):
+        """
+        Returns the paths of one timestamp compiled against the topology of `readTopology`, and its
+        traffic in the format of `data.readTraffic`.
+
+        The path and link ids of the hour are gathered from the mapped arrays, and only the flow names
+        and path strings of the hour are read.
+        """
+        hour = self._hourIndex[timestamp]
+        flowNames = self._flows.column("flowName")
+
+        # The rows of each flow are contiguous in the hour
+        start, end = self._pathOffsets[hour], self._pathOffsets[hour + 1]
+        flowIds = self._hourFlowIds[start:end]
+        pathIds = self._hourPathIds[start:end].astype(np.int64)
+        flowPtr = np.zeros(1, dtype=np.int64)
+        if len(flowIds):
+            flowStarts = np.flatnonzero(np.diff(flowIds)) + 1
+            flowPtr = np.concatenate([[0], flowStarts, [len(flowIds)]]).astype(np.int64)
+
+        # Links of the paths of the hour, gathered from the flattened links of every path
+        linkStarts = self._pathLinkPtr[pathIds].astype(np.int64)
+        linkCounts = self._pathLinkPtr[pathIds + 1] - linkStarts
+        pathLinkPtr = np.zeros(len(pathIds) + 1, dtype=np.int64)
+        np.cumsum(linkCounts, out=pathLinkPtr[1:])
+        pathLinkIds = self._pathLinkIds[
+            np.repeat(linkStarts - pathLinkPtr[:-1], linkCounts)
+            + np.arange(pathLinkPtr[-1])
+        ].astype(np.int64)
+
+        hourPaths = HourPaths(
+            flowNames.take(pa.array(flowIds[flowPtr[:-1]])).to_pylist(),
+            flowPtr,
+            self._pathNames.take(pa.array(pathIds)).to_pylist(),
+            pathIds,
+            pathLinkPtr,
+            pathLinkIds,
+            topology.numLinks,
+        )
+
+        start, end = self._trafficOffsets[hour], self._trafficOffsets[hour + 1]
+        trafficRows = self._traffic.slice(start, end - start)
+        traffic = dict(
+            zip(
+                flowNames.take(trafficRows.column("flowId")).to_pylist(),
+                trafficRows.column("traffic").to_pylist(),
+            )
+        )
+
+        return hourPaths, traffic
@@ -0,0 +1,70 @@
+import os
+import math
+
+from nfopt.utils import config
+from nfopt.utils import log
+from nfopt.utils import data as dataUtils
+
+config.load()
+logger = log.setupCustomLogger(__name__)
+
+# Gurobi threads per solve, overriding the planner if set
+SOLVER_THREADS = os.getenv("SOLVER_THREADS")
+if SOLVER_THREADS is not None and SOLVER_THREADS.isdigit() and int(SOLVER_THREADS) > 0:
+    SOLVER_THREADS = int(SOLVER_THREADS)
+else:
+    SOLVER_THREADS = None
+
+# Paths of a model worth one more solver thread, and the most threads a solve is given,
+# since the simplex and barrier speed-up of Gurobi levels off after a few threads
+PATHS_PER_SOLVER_THREAD = 100_000
+MAX_SOLVER_THREADS = 8
+
+
+def planThreads(numTasks, largestTask, solverThreads=None, cpuThreads=None):
+    """
+    Splits the CPU thread budget between concurrent solves (pool processes) and the Gurobi threads of
+    each solve, so processes x threads never exceeds the budget.
+
+    Small models are solved single-threaded with as many processes as there are tasks, while models
+    of more than `PATHS_PER_SOLVER_THREAD` paths get more threads per solve and fewer processes.
+
+    ### Parameters:
+    ----------
+    #### numTasks: int
+    The number of tasks (hours) to run, no more processes than tasks are started.
+
+    #### largestTask: int
+    The number of paths of the largest task, 0 if unknown.
+
+    #### solverThreads: int
+    The Gurobi threads per solve, overriding the planner if not None.
+
+    #### cpuThreads: int
+    The CPU thread budget, `data.CPU_THREADS` if None.
+
+    ### Returns:
+    ----------
+    The number of processes and the Gurobi threads per solve.
+    """
+    if cpuThreads is None:
+        cpuThreads = dataUtils.CPU_THREADS
+    if solverThreads is None:
+        solverThreads = SOLVER_THREADS
+
+    if solverThreads is None:
+        # Cores left idle by having fewer tasks than cores go to the solver threads
+        spareThreads = cpuThreads // max(1, min(cpuThreads, numTasks))
+        sizeThreads = min(
+            MAX_SOLVER_THREADS, math.ceil(largestTask / PATHS_PER_SOLVER_THREAD)
+        )
+        solverThreads = max(1, spareThreads, sizeThreads)
+    solverThreads = min(solverThreads, cpuThreads)
+
+    processes = max(1, min(cpuThreads // solverThreads, numTasks))
+
+    logger.info(
+        f"Thread plan: {processes} processes x {solverThreads} solver threads, budget: {cpuThreads} threads"
+    )
+
+    return processes, solverThreads
@@ -0,0 +1,85 @@
+import time
+import contextlib
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where the peak memory is not reported
+    resource = None
+
+# Time spent in each stage of the task the current process is running, in seconds
+_stages = {}
+
+# Counters of the task the current process is running, e.g. the size of its model
+_counters = {}
+
+
+def reset():
+    """
+    Starts timing a new task in the current process.
+    """
+    _stages.clear()
+    _counters.clear()
+
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Adds the time spent in the block to the named stage of the current task, e.g. 'build', 'solve' or 'write'.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stages[name] = _stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def count(name, value):
+    """
+    Adds a value to the named counter of the current task.
+    """
+    _counters[name] = _counters.get(name, 0) + value
+
+
+def countModel(m):
+    """
+    Counts the variables, constraints and nonzeros of a Gurobi model solved by the current task.
+    Models solved more than once, e.g. by column generation, are counted at their largest.
+    """
+    countSize(m.NumVars, m.NumConstrs, m.NumNZs)
+
+
+def countSize(variables, constraints, nonzeros):
+    """
+    Counts the size of a model solved by the current task, at the largest of the models it solved.
+    """
+    for name, value in [
+        ("variables", variables),
+        ("constraints", constraints),
+        ("nonzeros", nonzeros),
+    ]:
+        _counters[name] = max(_counters.get(name, 0), value)
+
+
+def stages():
+    """
+    Returns the time spent in each stage of the current task.
+    """
+    return dict(_stages)
+
+
+def counters():
+    """
+    Returns the counters of the current task.
+    """
+    return dict(_counters)
+
+
+def peakRss():
+    """
+    Returns the peak resident memory of the current process in MB, or None if it is not available.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -0,0 +1,321 @@
+import numpy as np
+import scipy.sparse as sp
+
+from nfopt.utils import log
+
+logger = log.setupCustomLogger(__name__)
+
+
+class Topology:
+    """
+    Compiled network topology, interning router and link names to integer ids.
+
+    The topology is built once per day from the links read with `data.readLinks` and is extended
+    with any link that only appears in the flow paths, using `defaultCapacity` as its capacity.
+    Link ids index the rows of the incidence matrices built by `compileHour`.
+
+    Every distinct path string of the day is interned once by `addPath` (called from
+    `data.readFlows`), storing the exact list of link ids the path crosses. The topology of a pool
+    worker instead uses the memory-mapped path index of the day store (see `attachPaths`), and only
+    interns the paths it does not hold.
+    """
+
+    def __init__(self, links=None, defaultCapacity=None):
+        self.defaultCapacity = defaultCapacity
+        self.routerIds = {}
+        self.routerNames = []
+        self.linkIds = {}
+        self.linkNames = []
+        self.linkStart = []
+        self.linkEnd = []
+        self.capacities = []
+        # Paths interned by addPath, with ids after those of the attached paths
+        self.pathIds = {}
+        self.pathLinks = []
+        self._storePaths = None
+        self._storePathIds = None
+        self._storeLinkPtr = np.zeros(1, dtype=np.int64)
+        self._storeLinkIds = np.zeros(0, dtype=np.int64)
+
+        if links is not None:
+            for linkName in links:
+                self.addLink(linkName, links[linkName]["capacity"])
+
+    @property
+    def numRouters(self):
+        return len(self.routerNames)
+
+    @property
+    def numLinks(self):
+        return len(self.linkNames)
+
+    @property
+    def numStorePaths(self):
+        return len(self._storeLinkPtr) - 1
+
+    def routerId(self, router):
+        """
+        Returns the id of the router, interning it if it has not been seen before.
+        """
+        routerId = self.routerIds.get(router)
+        if routerId is None:
+            routerId = len(self.routerNames)
+            self.routerIds[router] = routerId
+            self.routerNames.append(router)
+        return routerId
+
+    def addLink(self, linkName, capacity=None):
+        """
+        Returns the id of the link, interning it with the given capacity if it has not been seen before.
+        """
+        linkId = self.linkIds.get(linkName)
+        if linkId is None:
+            if capacity is None:
+                capacity = self.defaultCapacity
+
+            start, end = linkName.split(";")
+            linkId = len(self.linkNames)
+            self.linkIds[linkName] = linkId
+            self.linkNames.append(linkName)
+            self.linkStart.append(self.routerId(start))
+            self.linkEnd.append(self.routerId(end))
+            self.capacities.append(capacity)
+        return linkId
+
+    def addPath(self, path):
+        """
+        Returns the id of the path, interning it and the ids of the links it crosses if it has not been seen before.
+
+        ### Parameters:
+        ----------
+        #### path: str
+        The path as a string of routers separated by semicolons, e.g. 'R1004;R1993;R1321'.
+        """
+        pathId = self.pathIds.get(path)
+        if pathId is None and self._storePaths is not None:
+            if self._storePathIds is None:
+                logger.info(
+                    f"Indexing {self.numStorePaths:,} paths of the day store..."
+                )
+                self._storePathIds = {
+                    storePath: storeId
+                    for storeId, storePath in enumerate(self._storePaths.to_pylist())
+                }
+            pathId = self._storePathIds.get(path)
+        if pathId is None:
+            routers = path.split(";")
+            pathLinks = []
+            for i in range(len(routers) - 1):
+                linkId = self.addLink(routers[i] + ";" + routers[i + 1])
+                # A path crossing the same link twice still only loads it once
+                if linkId not in pathLinks:
+                    pathLinks.append(linkId)
+
+            pathId = self.numStorePaths + len(self.pathLinks)
+            self.pathIds[path] = pathId
+            self.pathLinks.append(pathLinks)
+        return pathId
+
+    def attachPaths(self, paths, pathLinkPtr, pathLinkIds):
+        """
+        Uses the path index of a day store for the first path ids, without interning its path strings.
+        The strings are only indexed when `addPath` looks up a path, e.g. the paths of existing ratios.
+
+        ### Parameters:
+        ----------
+        #### paths: pyarrow.Array
+        The path strings, in the order of their ids.
+
+        #### pathLinkPtr: numpy.ndarray
+        The offsets of the links of each path in `pathLinkIds`.
+
+        #### pathLinkIds: numpy.ndarray
+        The ids of the links crossed by the paths, in this topology's link ids.
+        """
+        if self.pathLinks:
+            raise ValueError("Paths can only be attached to a topology without paths")
+
+        self._storePaths = paths
+        self._storePathIds = None
+        self._storeLinkPtr = pathLinkPtr
+        self._storeLinkIds = pathLinkIds
+
+    def pathLinkIds(self, pathId):
+        """
+        Returns the ids of the links crossed by the path with the given id.
+        """
+        if pathId < self.numStorePaths:
+            return self._storeLinkIds[
+                self._storeLinkPtr[pathId] : self._storeLinkPtr[pathId + 1]
+            ]
+        return self.pathLinks[pathId - self.numStorePaths]
+
+    def capacityArray(self):
+        return np.asarray(self.capacities, dtype=np.float64)
+
+    def linkArrays(self, linkNames):
+        """
+        Returns the ids, start router ids and end router ids of the given links as arrays.
+        """
+        linkIds = np.fromiter(
+            (self.linkIds[link] for link in linkNames),
+            dtype=np.int64,
+            count=len(linkNames),
+        )
+        return (
+            linkIds,
+            np.asarray(self.linkStart, dtype=np.int64)[linkIds],
+            np.asarray(self.linkEnd, dtype=np.int64)[linkIds],
+        )
+
+    def compileHour(self, flows):
+        """
+        Compiles the paths of one hour into integer link ids.
+
+        Paths already interned by `data.readFlows` are looked up, any other path (e.g. paths read
+        from existing ratios) is interned on the fly.
+
+        ### Parameters:
+        ----------
+        #### flows: dict
+        The paths for each source-destination pair of the hour.
+
+        ### Returns:
+        ----------
+        The compiled `HourPaths` of the hour.
+        """
+        flowNames = list(flows)
+        flowPtr = np.zeros(len(flowNames) + 1, dtype=np.int64)
+        paths = []
+        pathIds = []
+        pathLinkPtr = [0]
+        pathLinkIds = []
+
+        for flowIndex, flowName in enumerate(flowNames):
+            for path in flows[flowName]:
+                pathId = self.addPath(path)
+                pathIds.append(pathId)
+                pathLinkIds.extend(self.pathLinkIds(pathId))
+                pathLinkPtr.append(len(pathLinkIds))
+                paths.append(path)
+            flowPtr[flowIndex + 1] = len(paths)
+
+        return HourPaths(
+            flowNames,
+            flowPtr,
+            paths,
+            np.asarray(pathIds, dtype=np.int64),
+            np.asarray(pathLinkPtr, dtype=np.int64),
+            np.asarray(pathLinkIds, dtype=np.int64),
+            self.numLinks,
+        )
+
+
+class HourPaths:
+    """
+    The paths of one hour compiled against a `Topology`.
+
+    Paths are stored contiguously per flow, so the paths of flow `f` are `flowPtr[f]:flowPtr[f + 1]`,
+    and the links of path `p` are `pathLinkIds[pathLinkPtr[p]:pathLinkPtr[p + 1]]`.
+    `pathIds` maps each path of the hour to its day-level id in the `Topology`.
+    """
+
+    def __init__(
+        self, flowNames, flowPtr, paths, pathIds, pathLinkPtr, pathLinkIds, numLinks
+    ):
+        self.flowNames = flowNames
+        self.flowPtr = flowPtr
+        self.paths = paths
+        self.pathIds = pathIds
+        self.pathLinkPtr = pathLinkPtr
+        self.pathLinkIds = pathLinkIds
+        self.numLinks = numLinks
+        self.pathFlow = np.repeat(
+            np.arange(len(flowNames), dtype=np.int64), np.diff(flowPtr)
+        )
+        self._incidence = None
+
+    @property
+    def numFlows(self):
+        return len(self.flowNames)
+
+    @property
+    def numPaths(self):
+        return len(self.paths)
+
+    def pathsPerFlow(self):
+        return np.diff(self.flowPtr)
+
+    def pathLinks(self, pathIndex):
+        """
+        Returns the ids of the links crossed by the path at `pathIndex`.
+        """
+        return self.pathLinkIds[
+            self.pathLinkPtr[pathIndex] : self.pathLinkPtr[pathIndex + 1]
+        ]
+
+    def incidence(self):
+        """
+        Returns the sparse link x path incidence matrix (CSR) of the hour.
+        """
+        if self._incidence is None:
+            pathIncidence = sp.csr_matrix(
+                (
+                    np.ones(len(self.pathLinkIds), dtype=np.float64),
+                    self.pathLinkIds,
+                    self.pathLinkPtr,
+                ),
+                shape=(self.numPaths, self.numLinks),
+            )
+            self._incidence = pathIncidence.T.tocsr()
+        return self._incidence
+
+    def flowPathMatrix(self):
+        """
+        Returns the sparse flow x path matrix (CSR) mapping each path to the flow it belongs to.
+        """
+        return sp.csr_matrix(
+            (
+                np.ones(self.numPaths, dtype=np.float64),
+                np.arange(self.numPaths, dtype=np.int64),
+                self.flowPtr,
+            ),
+            shape=(self.numFlows, self.numPaths),
+        )
+
+    def flowIncidence(self):
+        """
+        Returns the sparse link x flow matrix counting the paths of each flow crossing each link.
+        """
+        return (self.incidence() @ self.flowPathMatrix().T).tocsr()
+
+    def flowTraffic(self, traffic):
+        """
+        Returns the traffic of each flow as an array aligned with the flow ids.
+        """
+        return np.fromiter(
+            (traffic[flowName] for flowName in self.flowNames),
+            dtype=np.float64,
+            count=self.numFlows,
+        )
+
+    def flows(self):
+        """
+        Returns the paths of each flow of the hour, in the format of `data.readFlows`.
+        """
+        return {
+            flowName: self.paths[self.flowPtr[f] : self.flowPtr[f + 1]]
+            for f, flowName in enumerate(self.flowNames)
+        }
+
+    def uniformRatios(self):
+        """
+        Returns the ratios splitting the traffic of each flow evenly over its paths.
+        """
+        return 1 / self.pathsPerFlow()[self.pathFlow]
+
+    def linkLoads(self, pathLoads):
+        """
+        Returns the total traffic on each link given the traffic carried by each path.
+        """
+        return self.incidence() @ pathLoads
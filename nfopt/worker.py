@@ -0,0 +1,411 @@
+import os
+import copy
+import time
+import numpy as np
+import statistics as stats
+
+from nfopt.calc_type_enum import CalcType
+from nfopt.utils import config
+from nfopt.utils import log
+from nfopt.utils import store as storeUtils
+from nfopt.utils import timing
+from nfopt.utils.topology import Topology
+from nfopt.linear_optimization import failures, gurobi_env, netflow, optimizer as linOpt
+
+# Code run by the pool workers, which import this module but not the pipeline driving them, so they
+# do not load pandas until an hour writes its results.
+
+logger = log.setupCustomLogger(__name__)
+
+config.load()
+
+AVG_CAPACITY = int(os.getenv("AVERAGE_CAPACITY"))
+
+# State of a pool worker, set once per process by _initWorker
+_worker = {}
+
+# Day stores opened by a pool worker of a batch, indexed by store directory
+_days = {}
+
+
+def calcLinkUtil(links):
+    util = {}
+
+    for linkKey in links:
+        util[linkKey] = (
+            links[linkKey]["totalTraffic"] / links[linkKey]["capacity"] * 100
+        )
+
+    return util
+
+
+def aggregateHour(
+    timestamp, flows, traffic, args, links, topology, ratioStore=None, hourPaths=None
+):
+    """
+    Compiles the paths of an hour and adds the traffic and flows of the hour to each link.
+
+    The paths are compiled from `flows`, unless `hourPaths` has them compiled already, e.g. read from
+    the day store, and `flows` is None.
+
+    ### Returns:
+    ----------
+    The paths of the hour compiled against `topology`.
+    """
+    numFlows = hourPaths.numFlows if hourPaths is not None else len(flows)
+    logger.info(f"Processing {timestamp} with {numFlows} flows...")
+    useRatios = False
+
+    # Read ratios if specified
+    if args.use_ratios or args.use_paths:
+        hour = timestamp[4:6]
+        if args.use_ratios:
+            _, ratioType, _ = args.use_ratios
+            useRatios = True
+        else:
+            _, _, useRatios = args.use_paths
+            ratioType = CalcType.PATHS.value
+            useRatios = useRatios == "True"
+
+        if ratioStore is None:
+            ratioStore = readRatioStore(args, topology)
+
+        if args.use_paths:
+            if hourPaths is not None:
+                flows = hourPaths.flows()
+                hourPaths = None
+            ratioPaths = ratioStore.flowPaths(ratioType, hour)
+            i = 0
+            for flow in flows:
+                if flow not in ratioPaths:
+                    continue
+                i += 1
+                flows[flow] = ratioPaths[flow]
+            logger.info(f"Updated {i} flows with paths!")
+
+    with timing.stage("aggregate"):
+        # Compile the paths of the hour to integer link ids, adding links missing from the topology
+        if hourPaths is None:
+            hourPaths = topology.compileHour(flows)
+        pathRatios = hourPaths.uniformRatios()
+
+        if useRatios:
+            ratios = ratioStore.pathRatios(ratioType, hour, hourPaths)
+
+            # Only use the ratios of a flow if they cover every path of the flow
+            hasRatio = ~np.isnan(ratios)
+            flowCovered = np.logical_and.reduceat(hasRatio, hourPaths.flowPtr[:-1])
+            pathRatios = np.where(flowCovered[hourPaths.pathFlow], ratios, pathRatios)
+
+        # Total traffic of each link is the incidence matrix applied to the traffic of each path
+        pathLoads = hourPaths.flowTraffic(traffic)[hourPaths.pathFlow] * pathRatios
+        linkLoads = hourPaths.linkLoads(pathLoads)
+        flowIncidence = hourPaths.flowIncidence()
+
+        # Update totalTraffic and listFlows for each link, links missing from the dataset are only added when used this hour
+        linkUsed = np.diff(flowIncidence.indptr) > 0
+        for linkId, link in enumerate(topology.linkNames):
+            if link not in links:
+                if not linkUsed[linkId]:
+                    continue
+
+                links[link] = {
+                    "linkStart": topology.routerNames[topology.linkStart[linkId]],
+                    "linkEnd": topology.routerNames[topology.linkEnd[linkId]],
+                    "capacity": topology.capacities[linkId],
+                }
+
+            flowIds = flowIncidence.indices[
+                flowIncidence.indptr[linkId] : flowIncidence.indptr[linkId + 1]
+            ]
+            links[link]["totalTraffic"] = float(linkLoads[linkId])
+            links[link]["listFlows"] = [hourPaths.flowNames[f] for f in flowIds]
+
+    return hourPaths
+
+
+def process_flows_hour(
+    timestamp, flows, traffic, args, links, topology, ratioStore=None, hourPaths=None
+):
+    hourPaths = aggregateHour(
+        timestamp, flows, traffic, args, links, topology, ratioStore, hourPaths
+    )
+
+    # Run linear optimization or baseline calculations
+    if args.model_type == CalcType.BASELINE.value:
+        linkUtil = calcLinkUtil(links)
+    elif args.model_type == CalcType.PATHS.value:
+        if args.column_generation:
+            netflow.optMCColumnGeneration(
+                args, links, hourPaths.flows(), traffic, timestamp, topology
+            )
+        elif args.source_aggregation:
+            netflow.optMCSourceAggregated(args, links, traffic, timestamp, topology)
+        else:
+            netflow.optMC(args, links, traffic, timestamp, topology)
+        return None
+    else:
+        linkUtil = linOpt.runLinearOptimizationModel(
+            args,
+            links,
+            flows,
+            traffic,
+            timestamp,
+            args.save_lp_models,
+            hourPaths,
+            topology,
+        )
+        if linkUtil is None:
+            logger.error(f"No optimal solution for {timestamp}, skipping the hour")
+            return None
+
+    return [
+        timestamp,
+        min(linkUtil.values()),
+        max(linkUtil.values()),
+        stats.mean(linkUtil.values()),
+    ]
+
+
+def ratioDayDate(args):
+    """
+    Returns the day and date of the ratios given with `--use-ratios` or `--use-paths`.
+    """
+    if args.use_ratios:
+        day, _, date = args.use_ratios
+    else:
+        day, date, _ = args.use_paths
+
+    return day, date
+
+
+def readRatioStore(args, topology):
+    """
+    Returns the ratio store of the day and date given with `--use-ratios` or `--use-paths`.
+    """
+    # The ratio store and pyarrow.dataset are only imported by the runs that use existing ratios
+    from nfopt.utils.ratios import RatioStore
+
+    day, date = ratioDayDate(args)
+    return RatioStore(date, day, topology)
+
+
+def _initWorker(storeDir, args, solverThreads, poolStart):
+    """
+    Initializes a pool worker, memory-mapping the day store and building the worker's own topology
+    from its link table.
+    """
+    gurobi_env.setThreads(solverThreads)
+    store = storeUtils.DayStore(storeDir)
+
+    _worker["store"] = store
+    _worker["args"] = args
+    _worker["links"] = store.readLinks()
+    _worker["topology"] = store.readTopology(AVG_CAPACITY)
+    _worker["ratios"] = None
+    _workerStarted(poolStart)
+
+
+def _initStreamWorker(links, args, solverThreads, poolStart):
+    """
+    Initializes a pool worker of the streaming mode, which receives each hour from the main process.
+    """
+    gurobi_env.setThreads(solverThreads)
+    _worker["store"] = None
+    _worker["args"] = args
+    _worker["links"] = links
+    _worker["topology"] = Topology(links, AVG_CAPACITY)
+    _worker["ratios"] = None
+    _workerStarted(poolStart)
+
+
+def _initBatchWorker(solverThreads, poolStart):
+    """
+    Initializes a pool worker of a batch, which opens the day stores of its tasks on first use.
+    """
+    gurobi_env.setThreads(solverThreads)
+    _workerStarted(poolStart)
+
+
+def _workerStarted(poolStart):
+    """
+    Records the start-up time of the current pool worker, from the creation of the pool at `poolStart`
+    (`time.time()` of the main process) to the end of its initializer. With the spawn start method this
+    covers starting the interpreter, importing the pipeline and initializing the worker.
+    """
+    _worker["startup"] = time.time() - poolStart
+
+
+def workerStartup():
+    """
+    Returns the id and the start-up time of the current pool worker.
+    """
+    return os.getpid(), _worker.get("startup")
+
+
+def process_hour(timestamp):
+    """
+    Processes one hour in a pool worker, reading its flows and traffic from the day store.
+
+    ### Returns:
+    ----------
+    The overview row of the hour and its run report record.
+    """
+    timing.reset()
+    startTime = time.perf_counter()
+
+    with timing.stage("read"):
+        hourPaths, traffic = _worker["store"].readHour(timestamp, _worker["topology"])
+    result = process_worker_hour(timestamp, None, traffic, hourPaths)
+
+    return result, runRecord(timestamp, _worker["store"].numPaths(timestamp), startTime)
+
+
+def process_stream_hour(timestamp, flows, traffic):
+    """
+    Processes one hour received from the main process in a pool worker of the streaming mode.
+
+    ### Returns:
+    ----------
+    The overview row of the hour and its run report record.
+    """
+    timing.reset()
+    startTime = time.perf_counter()
+
+    result = process_worker_hour(timestamp, flows, traffic)
+    numPaths = sum(len(paths) for paths in flows.values())
+
+    return result, runRecord(timestamp, numPaths, startTime)
+
+
+def process_failures(task):
+    """
+    Processes one chunk of the failure scenarios of an hour in a pool worker, every `numChunks`-th
+    scenario starting at `chunk`. The model of the hour is kept for the next chunk of the same hour.
+
+    ### Returns:
+    ----------
+    The rows of the failure table of the scenarios, with the row of the hour without failures in chunk 0.
+    """
+    timestamp, chunk, numChunks = task
+    args = _worker["args"]
+
+    sweep = _worker.get("sweep")
+    if sweep is None or sweep.timestamp != timestamp:
+        if sweep is not None:
+            sweep.dispose()
+
+        hourPaths, traffic = _worker["store"].readHour(timestamp, _worker["topology"])
+        links = copy.deepcopy(_worker["links"])
+        hourPaths = aggregateHour(
+            timestamp,
+            None,
+            traffic,
+            args,
+            links,
+            _worker["topology"],
+            hourPaths=hourPaths,
+        )
+        sweep = failures.FailureSweep(
+            args.model_type, timestamp, links, traffic, hourPaths, _worker["topology"]
+        )
+        _worker["sweep"] = sweep
+
+    scenarios = failures.failureScenarios(sweep.linkNames, args.failures)
+    scenarios = scenarios[chunk::numChunks]
+    rows = [sweep.baseRow()] if chunk == 0 else []
+    for failedLinks in scenarios:
+        rows.append(sweep.solve(failedLinks))
+
+    logger.info(
+        f"Solved {len(scenarios)} failure scenarios of {timestamp}, chunk {chunk + 1} of {numChunks}"
+    )
+    return rows
+
+
+def runRecord(timestamp, numPaths, startTime):
+    """
+    Returns the run report record of an hour processed by the current worker, with the time spent in
+    each stage, the size of its model and the peak memory of the worker so far. The first record of
+    each worker also has its start-up time, which is 0 in the others.
+    """
+    return {
+        "timestamp": timestamp,
+        "worker": os.getpid(),
+        "paths": numPaths,
+        "total": time.perf_counter() - startTime,
+        **timing.stages(),
+        **timing.counters(),
+        "peakRssMb": timing.peakRss(),
+        "startup": _worker.pop("startup", 0.0),
+    }
+
+
+def process_worker_hour(timestamp, flows, traffic, hourPaths=None):
+    """
+    Processes the flows and traffic of one hour in a pool worker, or its paths compiled by the day
+    store with `flows` None.
+    """
+    # The ratios of the whole day are read once per worker, by the first hour that needs them
+    if _worker["ratios"] is None and (
+        _worker["args"].use_ratios or _worker["args"].use_paths
+    ):
+        _worker["ratios"] = readRatioStore(_worker["args"], _worker["topology"])
+
+    return process_flows_hour(
+        timestamp,
+        flows,
+        traffic,
+        _worker["args"],
+        copy.deepcopy(_worker["links"]),
+        _worker["topology"],
+        _worker["ratios"],
+        hourPaths,
+    )
+
+
+def _openDay(storeDir):
+    """
+    Returns the day store, links and topology of a day in the current worker, opening them on first use
+    so every model and hour of the day processed by the worker shares them.
+    """
+    day = _days.get(storeDir)
+    if day is None:
+        store = storeUtils.DayStore(storeDir)
+        day = {
+            "store": store,
+            "links": store.readLinks(),
+            "topology": store.readTopology(AVG_CAPACITY),
+        }
+        _days[storeDir] = day
+    return day
+
+
+def process_task(task):
+    """
+    Processes one (day, hour, model) task of a batch in a pool worker.
+    """
+    storeDir, args, timestamp = task
+    timing.reset()
+    startTime = time.perf_counter()
+
+    day = _openDay(storeDir)
+    with timing.stage("read"):
+        hourPaths, traffic = day["store"].readHour(timestamp, day["topology"])
+
+    result = process_flows_hour(
+        timestamp,
+        None,
+        traffic,
+        args,
+        copy.deepcopy(day["links"]),
+        day["topology"],
+        hourPaths=hourPaths,
+    )
+
+    return (
+        args.day,
+        args.model_type,
+        result,
+        runRecord(timestamp, day["store"].numPaths(timestamp), startTime),
+    )
@@ -0,0 +1,321 @@
+import os
+import sys
+import copy
+import time
+import argparse
+import tempfile
+import pandas as pd
+import scipy.sparse as sp
+import multiprocessing as mp
+
+from datetime import datetime
+
+from nfopt.calc_type_enum import CalcType
+from nfopt.utils import data as dataUtils
+from nfopt.utils import store as storeUtils
+from nfopt.utils import timing
+from nfopt.utils.topology import Topology
+from nfopt import worker
+from nfopt.worker import AVG_CAPACITY, process_flows_hour
+from nfopt.linear_optimization import solver as solverUtils
+from tests import synthetic
+
+# Benchmark of every pipeline stage and model type on synthetic datasets of growing size.
+# Usage: python -m tests.benchmark_pipeline [--sizes ring:16,fat-tree:4,geometric:50]
+#        [--models baseline,average,max,squared,paths] [--solver gurobi|highs|scipy|mwu|pgd|stub] [--compare FILE]
+#        [--workers N]
+#
+# --solver picks the solver backend of every model type. With --solver stub the optimization models
+# are built as sparse matrices but not solved, so the parsing, aggregation and build stages can be
+# measured without any solver.
+#
+# --workers starts a spawn pool of N pipeline workers on the day store of each dataset and records the
+# mean and slowest worker start-up time, from creating the pool to the end of each worker's initializer.
+
+MODEL_TYPES = [
+    CalcType.BASELINE.value,
+    CalcType.AVERAGE.value,
+    CalcType.MAX.value,
+    CalcType.SQUARED.value,
+    CalcType.PATHS.value,
+]
+SOLVERS = [*solverUtils.BACKENDS, "stub"]
+DAY = 1
+
+STAGE_COLUMNS = [
+    "parse",
+    "group",
+    "index",
+    "aggregate",
+    "presolve",
+    "build",
+    "solve",
+    "pricing",
+    "decompose",
+    "extract",
+    "write",
+]
+COUNTER_COLUMNS = ["variables", "constraints", "nonzeros", "gap"]
+
+
+def parseSizes(sizes):
+    """
+    Parses a list of topology sizes, e.g. 'ring:16,fat-tree:4', into (topology, size) pairs.
+    """
+    parsed = []
+    for part in sizes.split(","):
+        topology, _, size = part.partition(":")
+        if topology not in synthetic.TOPOLOGIES or not size.isdigit():
+            raise ValueError(f"Invalid size: {part}")
+        parsed.append((topology, int(size)))
+    return parsed
+
+
+def _useDataset(datasetDir, outputDir):
+    """
+    Points the dataset and output paths of the data module to a generated dataset.
+    """
+    dataUtils.DATASET_PATH = datasetDir
+    dataUtils.DATASET_PATHS_PREFIX = "flow-path-day"
+    dataUtils.DATASET_TRAFFIC_PREFIX = "flow-traffic-day"
+    dataUtils.DATASET_LINKS_NAME = "links"
+    dataUtils.DATA_OUTPUT_DIR = outputDir
+
+
+def _stubHour(hourPaths, topology, traffic):
+    """
+    Builds the sparse matrices every optimization model is built from, without a solver.
+    """
+    with timing.stage("build"):
+        demands = hourPaths.flowTraffic(traffic)
+        loadMatrix = (
+            hourPaths.incidence() @ sp.diags(demands[hourPaths.pathFlow])
+        ).tocsr()
+        splitMatrix = hourPaths.flowPathMatrix()
+    # Sizes of the average model: path ratios and utilizations, capacity, utilization and split rows
+    timing.count("variables", hourPaths.numPaths + topology.numLinks)
+    timing.count("constraints", 2 * topology.numLinks + splitMatrix.shape[0])
+    timing.count("nonzeros", 2 * loadMatrix.nnz + topology.numLinks + splitMatrix.nnz)
+
+
+def _initProbe(queue, storeDir, args, poolStart):
+    """
+    Initializes a pipeline worker and reports its start-up time to the benchmark.
+    """
+    worker._initWorker(storeDir, args, 1, poolStart)
+    queue.put(worker.workerStartup())
+
+
+def measureStartup(links, flows, traffic, topology, processes):
+    """
+    Starts a spawn pool of pipeline workers on a day store of the dataset and returns the mean and
+    slowest start-up time of its workers.
+    """
+    context = mp.get_context("spawn")
+    queue = context.Queue()
+    args = argparse.Namespace(model_type=CalcType.BASELINE.value, day=DAY)
+    with tempfile.TemporaryDirectory() as storeDir:
+        storeUtils.writeDayStore(storeDir, links, flows, traffic, topology)
+        with context.Pool(
+            processes=processes,
+            initializer=_initProbe,
+            initargs=(queue, storeDir, args, time.time()),
+        ):
+            startups = [queue.get()[1] for _ in range(processes)]
+    return {
+        "startup": sum(startups) / len(startups),
+        "startupMax": max(startups),
+    }
+
+
+def runModel(model, solver, flows, traffic, links, topology):
+    """
+    Runs one model type over every hour of the dataset and returns the summed stages and counters.
+    """
+    args = argparse.Namespace(
+        model_type=model,
+        day=DAY,
+        save_lp_models=False,
+        use_ratios=None,
+        use_paths=None,
+        incremental=False,
+        column_generation=False,
+        source_aggregation=False,
+        output_format=dataUtils.OUTPUT_FORMAT_CSV,
+        solver_backend=None if solver == "stub" else {"*": solver},
+    )
+
+    if solver != "stub" and model != CalcType.BASELINE.value:
+        try:
+            solverUtils.checkBackend(model, args.solver_backend)
+        except ValueError:
+            return {"status": "skipped", "total": 0.0}
+
+    totals = {"status": "ok", "total": 0.0}
+    for timestamp in sorted(flows):
+        timing.reset()
+        startTime = time.perf_counter()
+        try:
+            if solver == "stub" and model != CalcType.BASELINE.value:
+                if model == CalcType.PATHS.value:
+                    totals["status"] = "skipped"
+                    return totals
+                with timing.stage("aggregate"):
+                    hourPaths = topology.compileHour(flows[timestamp])
+                _stubHour(hourPaths, topology, traffic[timestamp])
+            else:
+                process_flows_hour(
+                    timestamp,
+                    flows[timestamp],
+                    traffic[timestamp],
+                    args,
+                    copy.deepcopy(links),
+                    topology,
+                )
+        except Exception as e:
+            totals["status"] = f"error: {e}"
+            return totals
+
+        totals["total"] += time.perf_counter() - startTime
+        for name, value in [*timing.stages().items(), *timing.counters().items()]:
+            if name in COUNTER_COLUMNS:
+                totals[name] = max(totals.get(name, 0), value)
+            else:
+                totals[name] = totals.get(name, 0.0) + value
+    return totals
+
+
+def runSize(topologyName, size, args, workDir):
+    """
+    Generates the dataset of one topology size, reads it and runs every model type on it.
+    """
+    datasetDir = os.path.join(workDir, f"{topologyName}-{size}")
+    stats = synthetic.generateDataset(
+        datasetDir,
+        topologyName,
+        size,
+        DAY,
+        args.hours,
+        args.k,
+        args.max_pairs,
+        seed=args.seed,
+    )
+    _useDataset(datasetDir, os.path.join(datasetDir, "output"))
+
+    timing.reset()
+    links = dataUtils.readLinks()
+    topology = Topology(links, AVG_CAPACITY)
+    flows = dataUtils.readFlows(DAY, topology)
+    traffic = dataUtils.readTraffic(DAY)
+    readStages = timing.stages()
+    startup = (
+        measureStartup(links, flows, traffic, topology, args.workers)
+        if args.workers > 0
+        else {}
+    )
+
+    rows = []
+    for model in args.models:
+        totals = runModel(model, args.solver, flows, traffic, links, topology)
+        rows.append(
+            {
+                "topology": topologyName,
+                "size": size,
+                **stats,
+                "hours": len(flows),
+                "model": model,
+                "solver": args.solver,
+                **readStages,
+                **startup,
+                **totals,
+            }
+        )
+        print(
+            f"{topologyName}:{size} {model}: {totals['status']}, {totals['total']:.3f} s",
+            file=sys.stderr,
+        )
+    return rows
+
+
+def compare(results, previousFile):
+    """
+    Prints the total time of each topology size and model type against a previous results file.
+    """
+    keys = ["topology", "size", "model", "solver"]
+    previous = pd.read_csv(previousFile)[keys + ["total"]]
+    merged = results[keys + ["total"]].merge(
+        previous, on=keys, suffixes=("", "_previous")
+    )
+    merged["speedup"] = merged["total_previous"] / merged["total"]
+    print(merged.to_string(index=False))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m tests.benchmark_pipeline",
+        description="time every pipeline stage and model type on synthetic datasets",
+    )
+    parser.add_argument(
+        "--sizes",
+        default="ring:16,ring:64,fat-tree:4,fat-tree:8,geometric:50",
+        help="comma separated topology:size pairs, the size of a fat-tree is its arity",
+    )
+    parser.add_argument(
+        "--models",
+        default=",".join(MODEL_TYPES),
+        help=f"comma separated model types to run, out of {','.join(MODEL_TYPES)}",
+    )
+    parser.add_argument("--solver", choices=SOLVERS, default="gurobi")
+    parser.add_argument("--hours", type=int, default=2)
+    parser.add_argument("-k", type=int, default=3, help="paths per pair of endpoints")
+    parser.add_argument("--max-pairs", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=2,
+        help="pool workers to measure the start-up time of, 0 to skip",
+    )
+    parser.add_argument(
+        "--output",
+        help="results file, by default benchmarks/{date}_pipeline.csv in DATA_OUTPUT_DIR",
+    )
+    parser.add_argument("--compare", help="previous results file to compare with")
+    args = parser.parse_args(argv)
+
+    try:
+        sizes = parseSizes(args.sizes)
+    except ValueError as e:
+        parser.error(str(e))
+    args.models = args.models.split(",")
+    for model in args.models:
+        if model not in MODEL_TYPES:
+            parser.error(f"Invalid model type: {model}")
+
+    outputFile = args.output or os.path.join(
+        dataUtils.DATA_OUTPUT_DIR,
+        "benchmarks",
+        f"{datetime.now().strftime('%Y%m%d%H%M%S')}_pipeline.csv",
+    )
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workDir:
+        for topologyName, size in sizes:
+            rows.extend(runSize(topologyName, size, args, workDir))
+
+    results = pd.DataFrame(rows)
+    columns = [
+        column for column in STAGE_COLUMNS + COUNTER_COLUMNS if column in results
+    ]
+    results[columns] = results[columns].fillna(0)
+
+    os.makedirs(os.path.dirname(outputFile) or ".", exist_ok=True)
+    results.to_csv(outputFile, index=False)
+    print(f"Wrote {len(results)} results to {outputFile}", file=sys.stderr)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import sys
+import time
+import pandas as pd
+import multiprocessing as mp
+
+from functools import partial
+
+from nfopt.utils import data as dataUtils
+
+# Benchmark of data.readFlows against the chunked pandas groupby it replaced.
+# Usage: python -m tests.benchmark_read_flows [DAY] [REPEATS]
+
+
+def _processGroup(chunk, group_func):
+    return chunk.groupby(["timestamp", "flowName"])["path"].apply(group_func)
+
+
+def _groupFunc(x):
+    return [path[1:-1] for path in x]
+
+
+def _mergeResults(results):
+    return {k: v for result in results for k, v in result.items()}
+
+
+def readFlowsPandas(day):
+    """
+    The previous implementation of data.readFlows, grouping row chunks in a process pool.
+    """
+    dataFlows = pd.read_csv(
+        f"{dataUtils.DATASET_PATH}/{dataUtils.DATASET_PATHS_PREFIX}{day}.csv",
+        names=["timestamp", "pathStart", "pathEnd", "path"],
+        engine="pyarrow",
+    )
+    dataFlows["flowName"] = dataFlows["pathStart"] + ";" + dataFlows["pathEnd"]
+
+    cpuThreads = dataUtils.CPU_THREADS
+    chunkSize = len(dataFlows) // cpuThreads
+    chunks = [
+        dataFlows[i:] if rangeIndex == cpuThreads - 1 else dataFlows[i : i + chunkSize]
+        for rangeIndex, i in enumerate([i * chunkSize for i in range(cpuThreads)])
+    ]
+
+    with mp.Pool(processes=cpuThreads) as pool:
+        results = pool.map(partial(_processGroup, group_func=_groupFunc), chunks)
+    grouped_flows = _mergeResults(results)
+
+    flows = {}
+    for (timestamp, flowName), paths in grouped_flows.items():
+        sd = flowName.split(";")
+        for path in paths:
+            if len(path) > 1 and sd[0] != sd[1]:
+                if timestamp not in flows:
+                    flows[timestamp] = {}
+                flows[timestamp][flowName] = paths
+
+    return flows
+
+
+def _time(func, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    day = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    pandasTime, pandasFlows = _time(lambda: readFlowsPandas(day), repeats)
+    arrowTime, arrowFlows = _time(lambda: dataUtils.readFlows(day), repeats)
+
+    numPaths = sum(
+        len(paths) for hour in arrowFlows.values() for paths in hour.values()
+    )
+    print(f"Day {day}: {len(arrowFlows)} hours, {numPaths:,} paths (best of {repeats})")
+    print(f"pandas groupby + pool: {pandasTime:.3f} s")
+    print(f"arrow group_by:        {arrowTime:.3f} s ({pandasTime / arrowTime:.1f}x)")
+
+    # Groups split across chunk boundaries lose paths in the pandas version
+    lostPaths = sum(
+        len(paths) - len(pandasFlows.get(timestamp, {}).get(flowName, []))
+        for timestamp, hour in arrowFlows.items()
+        for flowName, paths in hour.items()
+    )
+    print(f"paths lost by the pandas version: {lostPaths:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import os
+import argparse
+import pytest
+
+from dotenv import dotenv_values
+
+from nfopt.utils import config
+
+# The tests run with the settings of variables.env if there is one, and those of the example file
+# otherwise, without its placeholder Gurobi license, so Gurobi uses the local license
+config.load()
+EXAMPLE_ENV_FILE = os.path.join(
+    os.path.dirname(__file__), "..", "variables.env-example"
+)
+for name, value in dotenv_values(EXAMPLE_ENV_FILE).items():
+    if name not in ["WLSACCESSID", "WLSSECRET", "LICENSEID"]:
+        os.environ.setdefault(name, value)
+
+import scipy.sparse as sp  # noqa: E402
+
+from nfopt.utils import data as dataUtils  # noqa: E402
+from nfopt.utils.topology import Topology  # noqa: E402
+from nfopt.worker import AVG_CAPACITY  # noqa: E402
+from nfopt.linear_optimization import optimizer as linOpt, presolve  # noqa: E402
+from tests import synthetic  # noqa: E402
+
+DAY = 1
+
+
+def _readDataset(directory):
+    """
+    Points the data module at a synthetic dataset, which writes its output next to it, and reads it.
+    """
+    dataUtils.DATASET_PATH = directory
+    dataUtils.DATASET_PATHS_PREFIX = "flow-path-day"
+    dataUtils.DATASET_TRAFFIC_PREFIX = "flow-traffic-day"
+    dataUtils.DATASET_LINKS_NAME = "links"
+    dataUtils.DATA_OUTPUT_DIR = os.path.join(directory, "output")
+
+    links = dataUtils.readLinks()
+    topology = Topology(links, AVG_CAPACITY)
+    return argparse.Namespace(
+        dataset=directory,
+        day=DAY,
+        links=links,
+        topology=topology,
+        flows=dataUtils.readFlows(DAY, topology),
+        traffic=dataUtils.readTraffic(DAY),
+        outputDir=dataUtils.DATA_OUTPUT_DIR,
+    )
+
+
+@pytest.fixture(scope="session")
+def syntheticDay(tmp_path_factory):
+    """
+    Three hours of gravity traffic on a ring of 14 routers with 2 shortest paths per pair, read with
+    the data module, which writes its output next to the dataset.
+    """
+    directory = str(tmp_path_factory.mktemp("ring14"))
+    synthetic.generateDataset(directory, "ring", 14, DAY, hours=3, k=2)
+    return _readDataset(directory)
+
+
+@pytest.fixture
+def restoreDataset(monkeypatch):
+    """
+    Points the data module back at the dataset it reads once the test is done.
+    """
+    for name in [
+        "DATASET_PATH",
+        "DATASET_PATHS_PREFIX",
+        "DATASET_TRAFFIC_PREFIX",
+        "DATASET_LINKS_NAME",
+        "DATA_OUTPUT_DIR",
+    ]:
+        monkeypatch.setattr(dataUtils, name, getattr(dataUtils, name))
+
+
+@pytest.fixture
+def smallRing(syntheticDay, tmp_path, restoreDataset):
+    """
+    One hour of gravity traffic on a ring of 6 routers with the shortest path of each pair, small
+    enough for the size limits of the restricted Gurobi license. The data module points back at the
+    synthetic day afterwards.
+    """
+    synthetic.generateDataset(str(tmp_path), "ring", 6, DAY, hours=1, k=1)
+    return _readDataset(str(tmp_path))
+
+
+@pytest.fixture
+def splitRing(syntheticDay, tmp_path, restoreDataset):
+    """
+    One hour of gravity traffic on a ring of 8 routers with 2 shortest paths per pair, small enough
+    for the size limits of the restricted Gurobi license on quadratic models. The data module points
+    back at the synthetic day afterwards.
+    """
+    synthetic.generateDataset(str(tmp_path), "ring", 8, DAY, hours=1, k=2)
+    return _readDataset(str(tmp_path))
+
+
+@pytest.fixture
+def runArgs():
+    """
+    Returns a function building the parser arguments of a run of a model type with a solver backend.
+    """
+
+    def build(model, backend, **options):
+        args = argparse.Namespace(
+            model_type=model,
+            day=DAY,
+            save_lp_models=False,
+            use_ratios=None,
+            use_paths=None,
+            incremental=False,
+            column_generation=False,
+            source_aggregation=False,
+            output_format=dataUtils.OUTPUT_FORMAT_CSV,
+            solver_backend={"*": backend},
+        )
+        vars(args).update(options)
+        return args
+
+    return build
+
+
+@pytest.fixture(scope="session")
+def hourArrays(syntheticDay):
+    """
+    Returns a function compiling an hour of the synthetic day, or other paths for its flows, into the
+    load, capacity and split arrays of its path ratio model.
+    """
+
+    def build(timestamp, flows=None):
+        hourPaths = syntheticDay.topology.compileHour(
+            flows if flows is not None else syntheticDay.flows[timestamp]
+        )
+        _, capacities, demands, linkIncidence = linOpt._hourArrays(
+            syntheticDay.links,
+            syntheticDay.traffic[timestamp],
+            hourPaths,
+            syntheticDay.topology,
+        )
+        return argparse.Namespace(
+            hourPaths=hourPaths,
+            loadMatrix=(linkIncidence @ sp.diags(demands[hourPaths.pathFlow])).tocsr(),
+            capacities=capacities,
+            splitMatrix=hourPaths.flowPathMatrix(),
+        )
+
+    return build
+
+
+@pytest.fixture(scope="session")
+def hourModel(hourArrays):
+    """
+    Returns a function building the path ratio model of a model type for an hour of the synthetic day,
+    over its presolved core unless `presolved` is False.
+    """
+
+    def build(timestamp, model, presolved=True):
+        hour = hourArrays(timestamp)
+        if not presolved:
+            return linOpt._pathModel(
+                model, hour.loadMatrix, hour.capacities, hour.splitMatrix
+            )
+
+        core = presolve.PresolvedHour(
+            hour.loadMatrix,
+            hour.capacities,
+            hour.splitMatrix,
+            hour.hourPaths.pathFlow,
+        )
+        return linOpt._pathModel(
+            model,
+            core.loadMatrix,
+            core.capacities,
+            core.splitMatrix,
+            core.background,
+            core.fixedMaxUtilization,
+        )
+
+    return build
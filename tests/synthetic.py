@@ -0,0 +1,332 @@
+import os
+import sys
+import math
+import heapq
+import random
+import argparse
+import collections
+
+# Synthetic topologies, k-shortest paths and gravity-model traffic in the dataset format of
+# data.readLinks, data.readFlows and data.readTraffic.
+# Usage: python -m tests.synthetic DIR [--topology ring|fat-tree|geometric] [--size N] [--day DAY] ...
+
+TOPOLOGIES = ["ring", "fat-tree", "geometric"]
+
+LINKS_HEADER = "linkStart,linkEnd,capacity"
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def ring(numRouters, capacity=10000):
+    """
+    Returns the links of a bidirectional ring of routers R0..R{numRouters - 1}, with the routers
+    as endpoints of the traffic.
+    """
+    routers = [f"R{i}" for i in range(numRouters)]
+    links = {}
+    for i, router in enumerate(routers):
+        neighbour = routers[(i + 1) % numRouters]
+        links[(router, neighbour)] = capacity
+        links[(neighbour, router)] = capacity
+    return links, routers
+
+
+def fatTree(k, edgeCapacity=10000, coreCapacity=40000):
+    """
+    Returns the links of a k-ary fat-tree of switches, with k pods of k/2 edge and k/2 aggregation
+    switches and (k/2)^2 core switches. The edge switches are the endpoints of the traffic.
+    """
+    if k < 2 or k % 2 != 0:
+        raise ValueError(f"Invalid fat-tree arity: {k}")
+
+    half = k // 2
+    links = {}
+    edges = []
+    for pod in range(k):
+        for a in range(half):
+            aggregation = f"A{pod}-{a}"
+            for e in range(half):
+                edge = f"E{pod}-{e}"
+                links[(edge, aggregation)] = edgeCapacity
+                links[(aggregation, edge)] = edgeCapacity
+            # Aggregation switch a of every pod connects to core switches a*k/2 .. (a+1)*k/2 - 1
+            for c in range(half):
+                core = f"C{a * half + c}"
+                links[(aggregation, core)] = coreCapacity
+                links[(core, aggregation)] = coreCapacity
+        edges.extend(f"E{pod}-{e}" for e in range(half))
+    return links, edges
+
+
+def randomGeometric(numRouters, radius=None, seed=1, capacities=(10000, 40000, 100000)):
+    """
+    Returns the links of a random geometric graph of routers placed uniformly in the unit square,
+    linking routers closer than `radius`. Components are joined by their closest pair of routers
+    so every router is reachable.
+    """
+    rng = random.Random(seed)
+    if radius is None:
+        # Connectivity threshold of a random geometric graph, with some margin
+        radius = 1.5 * math.sqrt(math.log(max(numRouters, 2)) / (math.pi * numRouters))
+
+    routers = [f"G{i}" for i in range(numRouters)]
+    points = [(rng.random(), rng.random()) for _ in routers]
+    adjacency = collections.defaultdict(set)
+    for i in range(numRouters):
+        for j in range(i + 1, numRouters):
+            if math.dist(points[i], points[j]) < radius:
+                adjacency[i].add(j)
+                adjacency[j].add(i)
+
+    # Join each component to the closest router of the components joined so far
+    components = _components(numRouters, adjacency)
+    for component in components[1:]:
+        i, j = min(
+            ((i, j) for i in component for j in components[0]),
+            key=lambda pair: math.dist(points[pair[0]], points[pair[1]]),
+        )
+        adjacency[i].add(j)
+        adjacency[j].add(i)
+        components[0] |= component
+
+    links = {}
+    for i in adjacency:
+        for j in adjacency[i]:
+            if i < j:
+                capacity = rng.choice(capacities)
+                links[(routers[i], routers[j])] = capacity
+                links[(routers[j], routers[i])] = capacity
+    return links, routers
+
+
+def _components(numRouters, adjacency):
+    seen = set()
+    components = []
+    for start in range(numRouters):
+        if start in seen:
+            continue
+        component = {start}
+        queue = [start]
+        while queue:
+            node = queue.pop()
+            for neighbour in adjacency[node]:
+                if neighbour not in component:
+                    component.add(neighbour)
+                    queue.append(neighbour)
+        seen |= component
+        components.append(component)
+    return components
+
+
+def _shortestPath(adjacency, source, target, removedNodes, removedLinks):
+    """
+    Returns the path with the fewest hops from source to target, avoiding the removed routers and links.
+    """
+    previous = {source: None}
+    queue = collections.deque([source])
+    while queue:
+        node = queue.popleft()
+        if node == target:
+            path = [target]
+            while previous[path[-1]] is not None:
+                path.append(previous[path[-1]])
+            return path[::-1]
+        for neighbour in adjacency[node]:
+            if (
+                neighbour not in previous
+                and neighbour not in removedNodes
+                and (node, neighbour) not in removedLinks
+            ):
+                previous[neighbour] = node
+                queue.append(neighbour)
+    return None
+
+
+def kShortestPaths(adjacency, source, target, k):
+    """
+    Returns up to k loopless paths from source to target with the fewest hops, using Yen's algorithm.
+
+    ### Parameters:
+    ----------
+    #### adjacency: dict
+    The neighbours of each router, in a deterministic order.
+
+    #### k: int
+    The number of paths to return.
+    """
+    first = _shortestPath(adjacency, source, target, set(), set())
+    if first is None:
+        return []
+
+    paths = [first]
+    candidates = []
+    seen = {tuple(first)}
+    while len(paths) < k:
+        last = paths[-1]
+        for i in range(len(last) - 1):
+            root = last[: i + 1]
+            removedLinks = {
+                (path[i], path[i + 1])
+                for path in paths
+                if len(path) > i + 1 and path[: i + 1] == root
+            }
+            spur = _shortestPath(
+                adjacency, last[i], target, set(root[:-1]), removedLinks
+            )
+            if spur is not None:
+                candidate = tuple(root[:-1] + spur)
+                if candidate not in seen:
+                    seen.add(candidate)
+                    heapq.heappush(candidates, (len(candidate), candidate))
+        if not candidates:
+            break
+        paths.append(list(heapq.heappop(candidates)[1]))
+    return paths
+
+
+def gravityTraffic(endpoints, pairs, hours, totalTraffic, seed=1):
+    """
+    Returns the traffic of each pair of endpoints for each hour with a gravity model: the traffic from
+    s to t is proportional to the mass of s times the mass of t, scaled by a diurnal profile.
+
+    ### Returns:
+    ----------
+    A list with a dictionary of the traffic of each pair for each hour.
+    """
+    rng = random.Random(seed)
+    mass = {endpoint: rng.lognormvariate(0, 1) for endpoint in endpoints}
+    totalMass = sum(mass[s] * mass[t] for s, t in pairs)
+
+    traffic = []
+    for hour in range(hours):
+        # Lowest at 04:00 and highest at 16:00
+        profile = 0.6 + 0.4 * math.sin((hour - 10) / 24 * 2 * math.pi)
+        traffic.append(
+            {
+                (s, t): totalTraffic * profile * mass[s] * mass[t] / totalMass
+                for s, t in pairs
+            }
+        )
+    return traffic
+
+
+def generateDataset(
+    directory,
+    topology="ring",
+    size=16,
+    day=1,
+    hours=24,
+    k=3,
+    maxPairs=None,
+    load=0.3,
+    seed=1,
+    pathsPrefix="flow-path-day",
+    trafficPrefix="flow-traffic-day",
+    linksName="links",
+):
+    """
+    Generates a synthetic dataset and writes its links, paths and traffic files to a directory.
+
+    ### Parameters:
+    ----------
+    #### topology: str
+    The topology to generate, 'ring' or 'geometric' with `size` routers, or 'fat-tree' of arity `size`.
+
+    #### k: int
+    The number of shortest paths of each pair of endpoints.
+
+    #### maxPairs: int
+    The number of pairs of endpoints with traffic, sampled from all pairs, all pairs if None.
+
+    #### load: float
+    The total traffic as a share of the total capacity, divided by the average path length.
+
+    ### Returns:
+    ----------
+    A dictionary with the number of routers, links, pairs and paths per hour of the dataset.
+    """
+    match topology:
+        case "ring":
+            links, endpoints = ring(size)
+        case "fat-tree":
+            links, endpoints = fatTree(size)
+        case "geometric":
+            links, endpoints = randomGeometric(size, seed=seed)
+        case _:
+            raise ValueError(f"Invalid topology: {topology}")
+
+    adjacency = collections.defaultdict(list)
+    for start, end in links:
+        adjacency[start].append(end)
+
+    rng = random.Random(seed)
+    pairs = [(s, t) for s in endpoints for t in endpoints if s != t]
+    if maxPairs is not None and maxPairs < len(pairs):
+        pairs = sorted(rng.sample(pairs, maxPairs))
+
+    paths = {pair: kShortestPaths(adjacency, *pair, k) for pair in pairs}
+    pathLengths = [len(path) - 1 for pairPaths in paths.values() for path in pairPaths]
+    totalTraffic = load * sum(links.values()) / (sum(pathLengths) / len(pathLengths))
+    traffic = gravityTraffic(endpoints, pairs, hours, totalTraffic, seed)
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{linksName}.csv"), "w") as file:
+        file.write(LINKS_HEADER + "\n")
+        for (start, end), capacity in links.items():
+            file.write(f"{start},{end},{capacity}\n")
+
+    with (
+        open(os.path.join(directory, f"{pathsPrefix}{day}.csv"), "w") as pathsFile,
+        open(os.path.join(directory, f"{trafficPrefix}{day}.csv"), "w") as trafficFile,
+    ):
+        for hour in range(hours):
+            timestamp = f"{DAYS[(day - 1) % len(DAYS)]} {hour:02d}:00:00"
+            for s, t in pairs:
+                for path in paths[(s, t)]:
+                    pathsFile.write(f"{timestamp},{s},{t},[{';'.join(path)}]\n")
+                trafficFile.write(f"{timestamp},{s},{t},{traffic[hour][(s, t)]:.2f}\n")
+
+    return {
+        "routers": len({router for link in links for router in link}),
+        "links": len(links),
+        "pairs": len(pairs),
+        "paths": len(pathLengths),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m tests.synthetic",
+        description="generate a synthetic dataset in the nfopt dataset format",
+    )
+    parser.add_argument("directory", help="directory to write the dataset to")
+    parser.add_argument("--topology", choices=TOPOLOGIES, default="ring")
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=16,
+        help="number of routers, or the arity of the fat-tree",
+    )
+    parser.add_argument("--day", type=int, default=1)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("-k", type=int, default=3, help="paths per pair of endpoints")
+    parser.add_argument("--max-pairs", type=int, help="pairs of endpoints with traffic")
+    parser.add_argument("--load", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    stats = generateDataset(
+        args.directory,
+        args.topology,
+        args.size,
+        args.day,
+        args.hours,
+        args.k,
+        args.max_pairs,
+        args.load,
+        args.seed,
+    )
+    print(f"{args.topology} {args.size}: {stats}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
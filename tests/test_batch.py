@@ -0,0 +1,61 @@
+import copy
+import glob
+import argparse
+import pytest
+import pandas as pd
+
+from nfopt import pipeline
+from nfopt.batch import parseDays
+from nfopt.calc_type_enum import CalcType
+from nfopt.utils import data as dataUtils
+from nfopt.worker import process_flows_hour
+from nfopt.linear_optimization import solver
+
+
+def test_daysAreParsed():
+    assert parseDays("2") == [2]
+    assert parseDays("5-7,1,6") == [1, 5, 6, 7]
+    for days in ["", "1-", "a", "1-b", "1,,2", "3-1"]:
+        with pytest.raises(ValueError, match="Invalid days"):
+            parseDays(days)
+
+
+def test_batchMatchesSingleHours(syntheticDay, runArgs, tmp_path, monkeypatch):
+    monkeypatch.setattr(dataUtils, "DATA_OUTPUT_DIR", str(tmp_path))
+    backends = {"*": solver.BACKEND_SCIPY}
+    models = [CalcType.BASELINE.value, CalcType.AVERAGE.value]
+    pipeline.runBatch(
+        [syntheticDay.day],
+        models,
+        argparse.Namespace(
+            no_cache=False,
+            save_lp_models=False,
+            incremental=False,
+            column_generation=False,
+            source_aggregation=False,
+            output_format=dataUtils.OUTPUT_FORMAT_CSV,
+            solver_threads=None,
+        ),
+        backends,
+    )
+
+    for model in models:
+        (overviewFile,) = glob.glob(str(tmp_path / f"day*/*_{model}.csv"))
+        overview = pd.read_csv(overviewFile).to_numpy().tolist()
+        assert [row[0] for row in overview] == sorted(syntheticDay.flows)
+
+        for row in overview:
+            timestamp = row[0]
+            result = process_flows_hour(
+                timestamp,
+                copy.deepcopy(syntheticDay.flows[timestamp]),
+                syntheticDay.traffic[timestamp],
+                runArgs(model, solver.BACKEND_SCIPY),
+                copy.deepcopy(syntheticDay.links),
+                syntheticDay.topology,
+            )
+            # The optimal ratios of the average model only fix its mean utilization
+            if model == CalcType.AVERAGE.value:
+                assert row[3] == pytest.approx(result[3], rel=1e-6), timestamp
+            else:
+                assert row[1:] == pytest.approx(result[1:], rel=1e-6), timestamp
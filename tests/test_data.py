@@ -0,0 +1,89 @@
+import os
+import pytest
+import pandas as pd
+
+from nfopt.utils import data as dataUtils
+
+
+@pytest.fixture
+def streamDataset(syntheticDay, tmp_path, monkeypatch):
+    """
+    Returns a function writing the path and traffic files of the synthetic day to a new dataset, with
+    the rows of each file reordered by a function of the table, and pointing the data module at it.
+    """
+
+    def write(reorderPaths, reorderTraffic):
+        for prefix, reorder in [
+            (dataUtils.DATASET_PATHS_PREFIX, reorderPaths),
+            (dataUtils.DATASET_TRAFFIC_PREFIX, reorderTraffic),
+        ]:
+            file = f"{prefix}{syntheticDay.day}.csv"
+            table = pd.read_csv(os.path.join(syntheticDay.dataset, file), header=None)
+            reorder(table).to_csv(tmp_path / file, header=False, index=False)
+        monkeypatch.setattr(dataUtils, "DATASET_PATH", str(tmp_path))
+
+    return write
+
+
+def _reverseHours(table):
+    return pd.concat(
+        [hour for _, hour in table.groupby(0, sort=False)][::-1], ignore_index=True
+    )
+
+
+def _interleaveHours(table):
+    return table.sample(frac=1, random_state=0)
+
+
+def test_streamedHoursMatchReadDay(syntheticDay, streamDataset):
+    # The traffic file lists the hours in the reverse order of the paths file
+    streamDataset(lambda table: table, _reverseHours)
+    dataUtils.checkStreamable(syntheticDay.day)
+
+    hours = list(dataUtils.iterHours(syntheticDay.day))
+    assert [timestamp for timestamp, _, _ in hours] == list(syntheticDay.flows)
+    for timestamp, flows, traffic in hours:
+        assert flows == syntheticDay.flows[timestamp]
+        assert traffic == syntheticDay.traffic[timestamp]
+
+
+@pytest.mark.parametrize("interleaved", ["paths", "traffic"])
+def test_interleavedHoursCanNotBeStreamed(syntheticDay, streamDataset, interleaved):
+    if interleaved == "paths":
+        streamDataset(_interleaveHours, lambda table: table)
+    else:
+        streamDataset(lambda table: table, _interleaveHours)
+
+    with pytest.raises(ValueError, match="not contiguous"):
+        dataUtils.checkStreamable(syntheticDay.day)
+
+
+def test_pathsAreGroupedInFileOrder(syntheticDay, streamDataset):
+    def addLoops(table):
+        # Shuffled rows with paths that start and end at the same router, which drop their flow
+        loops = pd.DataFrame(
+            [[timestamp, "R3", "R3", "[R3]"] for timestamp in syntheticDay.flows]
+        )
+        return pd.concat([_interleaveHours(table), loops], ignore_index=True)
+
+    streamDataset(addLoops, lambda table: table)
+    table = pd.read_csv(
+        os.path.join(
+            dataUtils.DATASET_PATH,
+            f"{dataUtils.DATASET_PATHS_PREFIX}{syntheticDay.day}.csv",
+        ),
+        header=None,
+    )
+
+    # Each flow keeps the paths of every row of the file, in the order of the rows
+    expected = {}
+    for timestamp, start, end, path in table.itertuples(index=False):
+        if start != end:
+            flows = expected.setdefault(timestamp, {})
+            flows.setdefault(f"{start};{end}", []).append(path[1:-1])
+
+    flows = dataUtils.readFlows(syntheticDay.day)
+    assert flows == expected
+    assert list(flows) == sorted(expected)
+    for timestamp in flows:
+        assert list(flows[timestamp]) == sorted(expected[timestamp])
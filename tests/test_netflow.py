@@ -0,0 +1,193 @@
+import os
+import copy
+import glob
+import pytest
+import numpy as np
+import pandas as pd
+
+from nfopt.calc_type_enum import CalcType
+from nfopt.utils import data as dataUtils
+from nfopt.linear_optimization import netflow, solver
+
+
+@pytest.fixture
+def routeEveryFlow(monkeypatch):
+    """
+    Routes every flow and keeps every path of the decomposed flows, so the formulations solve the same problem.
+    """
+    monkeypatch.setattr(netflow, "NETFLOW_FLOW_THRESHOLD", 1.0)
+    monkeypatch.setattr(netflow, "NETFLOW_PATHS_THRESHOLD", 1.0)
+
+
+def _linkUtilization(dataset, traffic, args, links=None):
+    """
+    Reads and removes the path ratios written by a run of the paths model, checks that they split the
+    traffic of every flow, and returns the utilization of each link they route, with the capacities of
+    `links` or of the dataset.
+    """
+    if links is None:
+        links = dataset.links
+    (ratioFile,) = glob.glob(
+        os.path.join(
+            dataset.outputDir,
+            f"day{args.day}",
+            dataUtils.RATIOS_DIR_NAME,
+            args.model_type,
+            "*_ratios.csv",
+        )
+    )
+    ratios = pd.read_csv(ratioFile)
+    os.remove(ratioFile)
+
+    routed = {flow for flow, value in traffic.items() if value > 0}
+    splits = ratios.groupby("flowName")["ratio"].sum()
+    assert set(splits.index) >= routed
+    assert splits[list(routed)].to_numpy() == pytest.approx(1.0)
+
+    load = dict.fromkeys(links, 0.0)
+    for flow, path, ratio in ratios.itertuples(index=False):
+        routers = path.split(";")
+        for link in zip(routers, routers[1:]):
+            load[";".join(link)] += traffic[flow] * ratio
+    return np.array([load[link] / links[link]["capacity"] for link in links])
+
+
+def _squaredUtilization(dataset, traffic, args, links=None):
+    util = _linkUtilization(dataset, traffic, args, links)
+    return util @ util
+
+
+def test_optMCMatchesPathModelOnRing(syntheticDay, runArgs, hourModel, routeEveryFlow):
+    pytest.importorskip("highspy")
+    timestamp = sorted(syntheticDay.flows)[0]
+    traffic = syntheticDay.traffic[timestamp]
+    args = runArgs(CalcType.PATHS.value, solver.BACKEND_HIGHS)
+
+    # The two paths of each pair of a ring are its only simple paths, so the arc flows have the optimum
+    # of the path ratio model
+    optimum = solver.HighsBackend().solve(
+        hourModel(timestamp, CalcType.SQUARED.value, presolved=False)
+    )
+    assert optimum.optimal
+
+    netflow.optMC(args, syntheticDay.links, traffic, timestamp, syntheticDay.topology)
+    assert _squaredUtilization(syntheticDay, traffic, args) == pytest.approx(
+        optimum.objective, rel=1e-4
+    )
+
+
+def test_sourceAggregationMatchesOptMC(syntheticDay, runArgs, routeEveryFlow):
+    pytest.importorskip("highspy")
+    timestamp = sorted(syntheticDay.flows)[0]
+    traffic = syntheticDay.traffic[timestamp]
+    args = runArgs(CalcType.PATHS.value, solver.BACKEND_HIGHS)
+
+    netflow.optMC(args, syntheticDay.links, traffic, timestamp, syntheticDay.topology)
+    reference = _squaredUtilization(syntheticDay, traffic, args)
+
+    netflow.optMCSourceAggregated(
+        args, syntheticDay.links, traffic, timestamp, syntheticDay.topology
+    )
+    assert _squaredUtilization(syntheticDay, traffic, args) == pytest.approx(
+        reference, rel=1e-4
+    )
+
+
+def test_columnGenerationMatchesOptMC(smallRing, runArgs, routeEveryFlow):
+    pytest.importorskip("highspy")
+    pytest.importorskip("gurobipy")
+    timestamp = sorted(smallRing.flows)[0]
+    traffic = smallRing.traffic[timestamp]
+
+    args = runArgs(CalcType.PATHS.value, solver.BACKEND_HIGHS)
+    netflow.optMC(args, smallRing.links, traffic, timestamp, smallRing.topology)
+    reference = _squaredUtilization(smallRing, traffic, args)
+
+    # The restricted model starts from the single shortest path of each flow
+    args = runArgs(CalcType.PATHS.value, solver.BACKEND_GUROBI, column_generation=True)
+    netflow.optMCColumnGeneration(
+        args,
+        smallRing.links,
+        smallRing.flows[timestamp],
+        traffic,
+        timestamp,
+        smallRing.topology,
+    )
+    assert _squaredUtilization(smallRing, traffic, args) == pytest.approx(
+        reference, rel=1e-4
+    )
+
+
+def test_columnGenerationRoutesInfeasibleInitialPaths(
+    smallRing, runArgs, routeEveryFlow
+):
+    pytest.importorskip("highspy")
+    pytest.importorskip("gurobipy")
+    timestamp = sorted(smallRing.flows)[0]
+    traffic = smallRing.traffic[timestamp]
+
+    # Max utilization of the single shortest paths, and of the squared optimum over every path
+    args = runArgs(CalcType.PATHS.value, solver.BACKEND_HIGHS)
+    shortest = copy.deepcopy(smallRing.flows[timestamp])
+    initial = np.zeros(len(smallRing.links))
+    for flow, value in traffic.items():
+        routers = shortest[flow][0].split(";")
+        for link in zip(routers, routers[1:]):
+            initial[list(smallRing.links).index(";".join(link))] += value
+    initial = (initial / [link["capacity"] for link in smallRing.links.values()]).max()
+    netflow.optMC(args, smallRing.links, traffic, timestamp, smallRing.topology)
+    optimum = _linkUtilization(smallRing, traffic, args).max()
+    assert optimum < initial
+
+    # Capacities the initial paths overload, but the squared optimum does not
+    links = copy.deepcopy(smallRing.links)
+    for link in links.values():
+        link["capacity"] *= (optimum + initial) / 2
+    netflow.optMC(args, links, traffic, timestamp, smallRing.topology)
+    reference = _squaredUtilization(smallRing, traffic, args, links)
+
+    args = runArgs(CalcType.PATHS.value, solver.BACKEND_GUROBI, column_generation=True)
+    netflow.optMCColumnGeneration(
+        args, links, shortest, traffic, timestamp, smallRing.topology
+    )
+    util = _linkUtilization(smallRing, traffic, args, links)
+    assert util.max() <= 1 + 1e-6
+    assert util @ util == pytest.approx(reference, rel=1e-4)
+
+    # Capacities no routing fits in are reported as infeasible, without ratios
+    for link in links.values():
+        link["capacity"] /= 10
+    netflow.optMCColumnGeneration(
+        args, links, shortest, traffic, timestamp, smallRing.topology
+    )
+    assert not glob.glob(
+        os.path.join(smallRing.outputDir, "**", "*_ratios.csv"), recursive=True
+    )
+
+
+def test_arcFlowsAreDecomposedIntoPaths():
+    flowValues = {
+        # Splits at B and joins at E, with a second path over D
+        ("A;G", "A", "B"): 10.0,
+        ("A;G", "B", "E"): 6.0,
+        ("A;G", "B", "C"): 4.0,
+        ("A;G", "C", "E"): 4.0,
+        ("A;G", "E", "G"): 10.0,
+        ("A;G", "A", "D"): 5.0,
+        ("A;G", "D", "G"): 5.0,
+        # A dead end left by the flow threshold of optMC
+        ("A;G", "D", "F"): 1.0,
+        ("G;A", "G", "A"): 3.0,
+    }
+    ratios = netflow.calculate_ratios_for_all_flows(
+        flowValues, {"A;G": 15.0, "G;A": 3.0, "B;C": 1.0}, "ts"
+    )
+
+    assert sorted(ratios) == sorted(
+        [
+            ["ts", "A;G", "A;B;E;G", pytest.approx(6 / 15)],
+            ["ts", "A;G", "A;B;C;E;G", pytest.approx(4 / 15)],
+            ["ts", "A;G", "A;D;G", pytest.approx(5 / 15)],
+            ["ts", "G;A", "G;A", 1.0],
+        ]
+    )
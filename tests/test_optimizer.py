@@ -0,0 +1,122 @@
+import os
+import copy
+import glob
+import pytest
+import numpy as np
+import pandas as pd
+
+from nfopt.calc_type_enum import CalcType
+from nfopt.utils import data as dataUtils
+from nfopt.linear_optimization import optimizer as linOpt, solver
+
+
+def _objective(model, linkUtil):
+    """
+    Returns the objective of a model type for the link utilization in percent returned by a run.
+    """
+    util = np.array(list(linkUtil.values())) / 100
+    match model:
+        case CalcType.AVERAGE.value:
+            return util.sum()
+        case CalcType.MAX.value:
+            return util.max()
+        case CalcType.SQUARED.value:
+            return util @ util
+
+
+def _runHour(dataset, timestamp, args, flows=None, traffic=None):
+    """
+    Runs the path ratio model of an hour, or of other flows and traffic, and returns the link
+    utilization of the run, after checking and removing the ratios it wrote.
+    """
+    if flows is None:
+        flows = dataset.flows[timestamp]
+    if traffic is None:
+        traffic = dataset.traffic[timestamp]
+    linkUtil = linOpt.runLinearOptimizationModel(
+        args,
+        copy.deepcopy(dataset.links),
+        copy.deepcopy(flows),
+        traffic,
+        timestamp,
+        topology=dataset.topology,
+    )
+    assert linkUtil is not None, timestamp
+
+    (ratioFile,) = glob.glob(
+        os.path.join(
+            dataset.outputDir,
+            f"day{args.day}",
+            dataUtils.RATIOS_DIR_NAME,
+            args.model_type,
+            "*_ratios.csv",
+        )
+    )
+    ratios = pd.read_csv(ratioFile)
+    os.remove(ratioFile)
+    assert len(ratios) == sum(len(paths) for paths in flows.values())
+    assert ratios.groupby("flowName")["ratio"].sum().to_numpy() == pytest.approx(1.0)
+    return linkUtil
+
+
+@pytest.mark.parametrize(
+    "model", [CalcType.AVERAGE.value, CalcType.MAX.value, CalcType.SQUARED.value]
+)
+def test_gurobiMatchesHighs(splitRing, runArgs, model):
+    pytest.importorskip("highspy")
+    pytest.importorskip("gurobipy")
+    timestamp = sorted(splitRing.flows)[0]
+
+    reference = _runHour(splitRing, timestamp, runArgs(model, solver.BACKEND_HIGHS))
+    linkUtil = _runHour(splitRing, timestamp, runArgs(model, solver.BACKEND_GUROBI))
+    assert list(linkUtil) == list(splitRing.links)
+    assert _objective(model, linkUtil) == pytest.approx(
+        _objective(model, reference), rel=1e-5
+    )
+
+
+@pytest.mark.parametrize("model", [CalcType.AVERAGE.value, CalcType.MAX.value])
+def test_incrementalModelMatchesNewModels(splitRing, runArgs, monkeypatch, model):
+    pytest.importorskip("highspy")
+    pytest.importorskip("gurobipy")
+    from nfopt.linear_optimization import gurobi_env, incremental
+
+    monkeypatch.setattr(incremental, "_models", {})
+    timestamp = sorted(splitRing.flows)[0]
+    flows = splitRing.flows[timestamp]
+    traffic = splitRing.traffic[timestamp]
+
+    # Hours that drop paths, add them back and drop flows, with different traffic
+    hours = [
+        (
+            {flow: paths[: 1 + i % 2] for i, (flow, paths) in enumerate(flows.items())},
+            traffic,
+        ),
+        (flows, {flow: value * 1.5 for flow, value in traffic.items()}),
+        (
+            {flow: flows[flow] for i, flow in enumerate(flows) if i % 3},
+            {flow: value * 0.5 for flow, value in traffic.items()},
+        ),
+    ]
+    for hourFlows, hourTraffic in hours:
+        reference = _runHour(
+            splitRing,
+            timestamp,
+            runArgs(model, solver.BACKEND_HIGHS),
+            hourFlows,
+            hourTraffic,
+        )
+        linkUtil = _runHour(
+            splitRing,
+            timestamp,
+            runArgs(model, solver.BACKEND_GUROBI, incremental=True),
+            hourFlows,
+            hourTraffic,
+        )
+        assert _objective(model, linkUtil) == pytest.approx(
+            _objective(model, reference), rel=1e-5
+        )
+
+    # Every hour updated the model of the first, and the process kept one environment
+    assert incremental._models[model].hours == len(hours)
+    assert gurobi_env.getEnv() is gurobi_env.getEnv()
@@ -0,0 +1,39 @@
+import pytest
+
+from nfopt import pipeline
+from nfopt.calc_type_enum import CalcType
+from nfopt.utils import data as dataUtils
+from nfopt.utils import store as storeUtils
+from nfopt.utils.topology import Topology
+from nfopt.worker import AVG_CAPACITY
+from nfopt.linear_optimization import solver
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_emptyDayIsSkipped(syntheticDay, runArgs, tmp_path, monkeypatch, incremental):
+    storeDir = str(tmp_path / "store")
+    storeUtils.writeDayStore(
+        storeDir,
+        syntheticDay.links,
+        {},
+        {},
+        Topology(syntheticDay.links, AVG_CAPACITY),
+    )
+    monkeypatch.setattr(
+        pipeline, "prepareDayStore", lambda day, noCache, stack: storeDir
+    )
+    monkeypatch.setattr(dataUtils, "DATA_OUTPUT_DIR", str(tmp_path / "output"))
+
+    pipeline.run(
+        runArgs(
+            CalcType.AVERAGE.value,
+            solver.BACKEND_SCIPY,
+            incremental=incremental,
+            stream=False,
+            failures=None,
+            no_cache=False,
+            solver_threads=None,
+            profile=False,
+        )
+    )
+    assert not (tmp_path / "output").exists()
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from nfopt.calc_type_enum import CalcType
+from nfopt.linear_optimization import optimizer as linOpt, presolve, solver
+
+
+def _objective(model, hour, ratios):
+    """
+    Returns the objective of a model type for the path ratios of every path of the hour.
+    """
+    util = hour.loadMatrix @ ratios / hour.capacities
+    match model:
+        case CalcType.AVERAGE.value:
+            return util.sum()
+        case CalcType.MAX.value:
+            return util.max()
+        case CalcType.SQUARED.value:
+            return util @ util
+
+
+@pytest.mark.parametrize(
+    "model", [CalcType.AVERAGE.value, CalcType.MAX.value, CalcType.SQUARED.value]
+)
+def test_presolvedObjectiveMatchesFullModel(syntheticDay, hourArrays, model):
+    pytest.importorskip("highspy")
+    highs = solver.HighsBackend()
+
+    for timestamp in sorted(syntheticDay.flows):
+        # Every other flow keeps only its first path, so presolve folds it into the background load
+        flows = {
+            flow: paths if i % 2 else paths[:1]
+            for i, (flow, paths) in enumerate(syntheticDay.flows[timestamp].items())
+        }
+        hour = hourArrays(timestamp, flows)
+        full = highs.solve(
+            linOpt._pathModel(model, hour.loadMatrix, hour.capacities, hour.splitMatrix)
+        )
+        assert full.optimal, timestamp
+
+        core = presolve.PresolvedHour(
+            hour.loadMatrix,
+            hour.capacities,
+            hour.splitMatrix,
+            hour.hourPaths.pathFlow,
+        )
+        assert len(core.paths) < hour.loadMatrix.shape[1]
+        presolved = highs.solve(
+            linOpt._pathModel(
+                model,
+                core.loadMatrix,
+                core.capacities,
+                core.splitMatrix,
+                core.background,
+                core.fixedMaxUtilization,
+            )
+        )
+        assert presolved.optimal, timestamp
+
+        ratios = core.expand(presolved.values["PathRatios"])
+        assert np.allclose(hour.splitMatrix @ ratios, 1)
+        assert _objective(model, hour, ratios) == pytest.approx(
+            full.objective, rel=1e-6
+        )
@@ -0,0 +1,134 @@
+import copy
+import glob
+import statistics as stats
+import pytest
+import numpy as np
+import pandas as pd
+
+from datetime import datetime
+
+from nfopt.calc_type_enum import CalcType
+from nfopt.utils import data as dataUtils
+from nfopt.utils.ratios import RatioStore
+from nfopt.utils.topology import Topology
+from nfopt.worker import AVG_CAPACITY, process_flows_hour
+from nfopt.linear_optimization import optimizer as linOpt, solver
+
+
+def test_ratiosAreGatheredByPath(syntheticDay, runArgs, tmp_path, monkeypatch):
+    pytest.importorskip("highspy")
+    monkeypatch.setattr(dataUtils, "DATA_OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(linOpt, "DATA_OUTPUT_DIR", str(tmp_path))
+    timestamp = sorted(syntheticDay.flows)[0]
+    flows = syntheticDay.flows[timestamp]
+    traffic = syntheticDay.traffic[timestamp]
+
+    linkUtil = linOpt.runLinearOptimizationModel(
+        runArgs(CalcType.SQUARED.value, solver.BACKEND_HIGHS),
+        copy.deepcopy(syntheticDay.links),
+        copy.deepcopy(flows),
+        traffic,
+        timestamp,
+        topology=syntheticDay.topology,
+    )
+    (ratioFile,) = glob.glob(str(tmp_path / "**" / "*_ratios.csv"), recursive=True)
+    written = pd.read_csv(ratioFile).set_index("path")["ratio"]
+
+    # A new topology interns the paths of the ratios with other ids than those of the day
+    date = datetime.now().strftime("%Y%m%d")
+    topology = Topology(syntheticDay.links, AVG_CAPACITY)
+    store = RatioStore(date, syntheticDay.day, topology)
+
+    # The paths of each flow in reverse order, and a path without a ratio
+    hourFlows = {flow: paths[::-1] for flow, paths in flows.items()}
+    flow = next(iter(hourFlows))
+    hourFlows[flow] = hourFlows[flow] + [flow.replace(";", ";R99;")]
+    hourPaths = topology.compileHour(hourFlows)
+
+    ratios = store.pathRatios(CalcType.SQUARED.value, "00", hourPaths)
+    assert np.isnan(ratios[hourPaths.flowPtr[1] - 1])
+    assert np.isnan(ratios).sum() == 1
+    found = ~np.isnan(ratios)
+    assert ratios[found] == pytest.approx(
+        written[np.array(hourPaths.paths)[found]].to_numpy()
+    )
+    with pytest.raises(ValueError, match="No squared ratios for hour 01"):
+        store.pathRatios(CalcType.SQUARED.value, "01", hourPaths)
+
+    # The baseline with the ratios has the link utilization of the run that wrote them
+    result = process_flows_hour(
+        timestamp,
+        copy.deepcopy(flows),
+        traffic,
+        runArgs(
+            CalcType.BASELINE.value,
+            solver.BACKEND_SCIPY,
+            use_ratios=(str(syntheticDay.day), CalcType.SQUARED.value, date),
+        ),
+        copy.deepcopy(syntheticDay.links),
+        topology,
+        store,
+    )
+    util = list(linkUtil.values())
+    assert result[1:] == pytest.approx([min(util), max(util), stats.mean(util)])
+
+
+def test_parquetRatiosMatchCsv(syntheticDay, runArgs, tmp_path, monkeypatch):
+    date = datetime.now().strftime("%Y%m%d")
+    stores = {}
+    for outputFormat in [dataUtils.OUTPUT_FORMAT_CSV, dataUtils.OUTPUT_FORMAT_PARQUET]:
+        monkeypatch.setattr(dataUtils, "DATA_OUTPUT_DIR", str(tmp_path / outputFormat))
+        args = runArgs(
+            CalcType.AVERAGE.value, solver.BACKEND_SCIPY, output_format=outputFormat
+        )
+
+        # Ratios of every hour, and an overview appended hour by hour
+        for i, timestamp in enumerate(sorted(syntheticDay.flows)):
+            rows = [
+                [timestamp, flow, path, (j + 1) / (len(paths) * (len(paths) + 1) / 2)]
+                for flow, paths in syntheticDay.flows[timestamp].items()
+                for j, path in enumerate(paths)
+            ]
+            dataUtils.writeDataToFile(
+                pd.DataFrame(rows, columns=["timestamp", "flowName", "path", "ratio"]),
+                "ratioData",
+                args,
+            )
+            dataUtils.writeDataToFile(
+                pd.DataFrame(
+                    [[timestamp, i, i, i]], columns=["timestamp", "a", "b", "c"]
+                ),
+                "overviewData",
+                args,
+                append=i > 0,
+            )
+
+        (overviewFile,) = glob.glob(
+            str(tmp_path / outputFormat / "**" / f"*_average.{outputFormat}"),
+            recursive=True,
+        )
+        if outputFormat == dataUtils.OUTPUT_FORMAT_CSV:
+            overview = pd.read_csv(overviewFile)
+        else:
+            overview = pd.read_parquet(overviewFile)
+        assert overview["timestamp"].tolist() == sorted(syntheticDay.flows)
+
+        stores[outputFormat] = RatioStore(
+            date, syntheticDay.day, Topology(syntheticDay.links, AVG_CAPACITY)
+        )
+
+    csvStore = stores[dataUtils.OUTPUT_FORMAT_CSV]
+    parquetStore = stores[dataUtils.OUTPUT_FORMAT_PARQUET]
+    for timestamp in sorted(syntheticDay.flows):
+        hour = timestamp[4:6]
+        flowPaths = csvStore.flowPaths(CalcType.AVERAGE.value, hour)
+        assert flowPaths == syntheticDay.flows[timestamp]
+        assert parquetStore.flowPaths(CalcType.AVERAGE.value, hour) == flowPaths
+
+        for store in [csvStore, parquetStore]:
+            hourPaths = store.topology.compileHour(syntheticDay.flows[timestamp])
+            ratios = store.pathRatios(CalcType.AVERAGE.value, hour, hourPaths)
+            assert hourPaths.flowPathMatrix() @ ratios == pytest.approx(1.0)
+            assert ratios[hourPaths.flowPtr[:-1]] == pytest.approx(
+                1 / (hourPaths.pathsPerFlow() * (hourPaths.pathsPerFlow() + 1) / 2)
+            )
@@ -0,0 +1,125 @@
+import copy
+import pytest
+
+from nfopt.calc_type_enum import CalcType
+from nfopt.worker import process_flows_hour
+from nfopt.linear_optimization import optimizer as linOpt, solver
+
+
+def test_highsSolvesEverySquaredHour(syntheticDay, hourModel):
+    pytest.importorskip("highspy")
+    highs = solver.HighsBackend()
+    pgd = solver.ProjectedGradientBackend()
+
+    for timestamp in sorted(syntheticDay.flows):
+        model = hourModel(timestamp, CalcType.SQUARED.value)
+        solution = highs.solve(model)
+        assert solution.optimal, timestamp
+
+        # The capacities of the synthetic day are not binding, so the optimum of pgd is the same
+        reference = pgd.solve(model)
+        assert solution.objective == pytest.approx(reference.objective, rel=1e-3)
+        assert solution.values["PathRatios"].min() >= -1e-9
+
+
+def test_mwuMatchesLinearMax(syntheticDay, hourModel):
+    scipyBackend = solver.ScipyBackend()
+    mwu = solver.MultiplicativeWeightsBackend()
+
+    for timestamp in sorted(syntheticDay.flows):
+        model = hourModel(timestamp, CalcType.MAX.value)
+        optimum = scipyBackend.solve(model)
+        assert optimum.optimal, timestamp
+
+        # The max utilization of mwu is feasible, so at least the optimum, and within MWU_EPSILON of it
+        approximate = mwu.solve(model)
+        assert approximate.optimal, timestamp
+        assert optimum.objective * (1 - 1e-9) <= approximate.objective
+        assert approximate.objective <= optimum.objective * (1 + solver.MWU_EPSILON)
+
+
+def test_mwuReportsOverloadAndIterationLimit(syntheticDay, hourArrays, monkeypatch):
+    scipyBackend = solver.ScipyBackend()
+    mwu = solver.MultiplicativeWeightsBackend()
+    timestamp = sorted(syntheticDay.flows)[0]
+    hour = hourArrays(timestamp)
+
+    # Capacities that leave the optimum just below 1, so the approximate max utilization overloads a link
+    model = linOpt._pathModel(
+        CalcType.MAX.value, hour.loadMatrix, hour.capacities, hour.splitMatrix
+    )
+    optimum = scipyBackend.solve(model).objective
+    model = linOpt._pathModel(
+        CalcType.MAX.value,
+        hour.loadMatrix,
+        hour.capacities * optimum / 0.9999,
+        hour.splitMatrix,
+    )
+    solution = mwu.solve(model)
+    assert solution.status == solver.STATUS_OVERLOADED
+    assert not solution.optimal
+
+    monkeypatch.setattr(solver, "MWU_EPSILON", 1e-9)
+    monkeypatch.setattr(solver, "MWU_MAX_ITERATIONS", 1)
+    solution = mwu.solve(
+        linOpt._pathModel(
+            CalcType.MAX.value, hour.loadMatrix, hour.capacities, hour.splitMatrix
+        )
+    )
+    assert solution.status == solver.STATUS_ITERATION_LIMIT
+    assert not solution.optimal
+
+
+def test_pgdMatchesSquaredOptimum(syntheticDay, hourModel):
+    pytest.importorskip("highspy")
+    highs = solver.HighsBackend()
+    pgd = solver.ProjectedGradientBackend()
+
+    # Every hour has the same paths, so each hour also starts from the ratios of the hour before, as
+    # with --incremental
+    previous = None
+    for timestamp in sorted(syntheticDay.flows):
+        model = hourModel(timestamp, CalcType.SQUARED.value, presolved=False)
+        optimum = highs.solve(model)
+        assert optimum.optimal, timestamp
+
+        for start in [None, previous]:
+            solution = pgd.solve(model, start=start)
+            assert solution.optimal, timestamp
+            assert solution.objective == pytest.approx(
+                optimum.objective, rel=2 * solver.PGD_TOLERANCE
+            )
+        previous = solution.values["PathRatios"]
+
+
+@pytest.mark.parametrize("backend", [solver.BACKEND_HIGHS, solver.BACKEND_PGD])
+def test_unsolvedHourIsSkipped(syntheticDay, runArgs, backend):
+    if backend == solver.BACKEND_HIGHS:
+        pytest.importorskip("highspy")
+    timestamp = sorted(syntheticDay.flows)[0]
+    links = copy.deepcopy(syntheticDay.links)
+    for link in links.values():
+        link["capacity"] /= 1000
+
+    result = process_flows_hour(
+        timestamp,
+        copy.deepcopy(syntheticDay.flows[timestamp]),
+        syntheticDay.traffic[timestamp],
+        runArgs(CalcType.SQUARED.value, backend),
+        links,
+        syntheticDay.topology,
+    )
+    assert result is None
+
+
+@pytest.mark.parametrize(
+    "backend, model, setting",
+    [
+        (solver.BACKEND_MWU, CalcType.MAX.value, "MWU_MAX_ITERATIONS"),
+        (solver.BACKEND_PGD, CalcType.SQUARED.value, "PGD_MAX_ITERATIONS"),
+    ],
+)
+def test_iterationLimitIsChecked(monkeypatch, backend, model, setting):
+    monkeypatch.setattr(solver, setting, 0)
+    with pytest.raises(ValueError, match=setting):
+        solver.checkBackend(model, {"*": backend})
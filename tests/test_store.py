@@ -0,0 +1,82 @@
+import os
+import contextlib
+import pytest
+import numpy as np
+
+from nfopt import pipeline
+from nfopt.utils import data as dataUtils
+from nfopt.utils import store as storeUtils
+from nfopt.worker import AVG_CAPACITY
+
+
+@pytest.fixture
+def hashedFiles(monkeypatch):
+    """
+    Records the files hashed by the store module.
+    """
+    hashed = []
+    fileHash = storeUtils._fileHash
+
+    def record(file):
+        hashed.append(os.path.basename(file))
+        return fileHash(file)
+
+    monkeypatch.setattr(storeUtils, "_fileHash", record)
+    return hashed
+
+
+def test_cacheIsKeyedByFileContents(smallRing, hashedFiles):
+    files = dataUtils.datasetFiles(smallRing.day)
+    storeDir = pipeline.prepareDayStore(smallRing.day, False, contextlib.ExitStack())
+    assert storeUtils.DayStore.exists(storeDir)
+    assert sorted(hashedFiles) == sorted(os.path.basename(file) for file in files)
+
+    # Unchanged files are looked up in the manifest instead of being read
+    hashedFiles.clear()
+    assert storeUtils.cacheDir(smallRing.dataset, smallRing.day, files) == storeDir
+    assert hashedFiles == []
+
+    # A newer file with the same contents is hashed again and keeps the store
+    trafficFile = files[-1]
+    stat = os.stat(trafficFile)
+    os.utime(trafficFile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert storeUtils.cacheDir(smallRing.dataset, smallRing.day, files) == storeDir
+    assert hashedFiles == [os.path.basename(trafficFile)]
+
+    # Changed contents get a new store
+    with open(trafficFile) as f:
+        lines = f.readlines()
+    with open(trafficFile, "w") as f:
+        f.writelines(lines[:-1])
+    changedDir = pipeline.prepareDayStore(smallRing.day, False, contextlib.ExitStack())
+    assert changedDir != storeDir
+    assert storeUtils.DayStore.exists(changedDir)
+    assert storeUtils.DayStore.exists(storeDir)
+
+
+def test_storedHoursMatchCompiledFlows(syntheticDay, tmp_path):
+    storeDir = str(tmp_path / "store")
+    storeUtils.writeDayStore(
+        storeDir,
+        syntheticDay.links,
+        syntheticDay.flows,
+        syntheticDay.traffic,
+        syntheticDay.topology,
+    )
+    store = storeUtils.DayStore(storeDir)
+    topology = store.readTopology(AVG_CAPACITY)
+    assert topology.linkNames == syntheticDay.topology.linkNames
+
+    for timestamp in store.timestamps:
+        hourPaths, traffic = store.readHour(timestamp, topology)
+        expected = syntheticDay.topology.compileHour(syntheticDay.flows[timestamp])
+        assert traffic == syntheticDay.traffic[timestamp]
+        assert hourPaths.flows() == syntheticDay.flows[timestamp]
+        for name in ["flowPtr", "pathIds", "pathLinkPtr", "pathLinkIds"]:
+            assert np.array_equal(getattr(hourPaths, name), getattr(expected, name))
+
+    # Path strings are only indexed when a path is looked up, and keep the ids of the store
+    assert topology.pathIds == {}
+    path = hourPaths.paths[-1]
+    assert topology.addPath(path) == hourPaths.pathIds[-1]
+    assert topology.pathIds == {}
@@ -0,0 +1,81 @@
+import collections
+import pandas as pd
+
+from tests import synthetic
+from tests import benchmark_pipeline
+
+
+def _adjacency(links):
+    adjacency = collections.defaultdict(list)
+    for start, end in links:
+        adjacency[start].append(end)
+    return adjacency
+
+
+def test_kShortestPathsAreLoopless():
+    # A ring has two simple paths between two routers, one in each direction
+    links, _ = synthetic.ring(6)
+    assert synthetic.kShortestPaths(_adjacency(links), "R0", "R2", 3) == [
+        ["R0", "R1", "R2"],
+        ["R0", "R5", "R4", "R3", "R2"],
+    ]
+
+    # Edge switches of different pods are connected over every aggregation and core switch
+    links, edges = synthetic.fatTree(4)
+    assert len(links) == 64
+    assert len(edges) == 8
+    paths = synthetic.kShortestPaths(_adjacency(links), "E0-0", "E1-0", 6)
+    assert [len(path) for path in paths] == [5, 5, 5, 5, 7, 7]
+    assert len({tuple(path) for path in paths}) == len(paths)
+    for path in paths:
+        assert len(set(path)) == len(path)
+        assert all(link in links for link in zip(path, path[1:]))
+
+
+def test_datasetIsReproducible(tmp_path):
+    stats = [
+        synthetic.generateDataset(
+            str(tmp_path / name), "geometric", 12, day=3, hours=2, k=2, maxPairs=20
+        )
+        for name in ["a", "b"]
+    ]
+    assert stats[0] == stats[1]
+    assert stats[0]["pairs"] == 20
+    for name in ["links.csv", "flow-path-day3.csv", "flow-traffic-day3.csv"]:
+        assert (tmp_path / "a" / name).read_text() == (
+            tmp_path / "b" / name
+        ).read_text()
+
+    traffic = pd.read_csv(tmp_path / "a" / "flow-traffic-day3.csv", header=None)
+    assert traffic[0].unique().tolist() == ["Wed 00:00:00", "Wed 01:00:00"]
+    assert len(traffic) == 2 * stats[0]["pairs"]
+
+
+def test_benchmarkWritesStagesOfEveryModel(tmp_path, restoreDataset):
+    outputFile = tmp_path / "pipeline.csv"
+    benchmark_pipeline.main(
+        [
+            "--sizes",
+            "ring:6,fat-tree:4",
+            "--models",
+            "baseline,average",
+            "--solver",
+            "stub",
+            "--hours",
+            "1",
+            "--workers",
+            "0",
+            "--output",
+            str(outputFile),
+        ]
+    )
+
+    results = pd.read_csv(outputFile)
+    assert results[["topology", "size", "model"]].to_numpy().tolist() == [
+        ["ring", 6, "baseline"],
+        ["ring", 6, "average"],
+        ["fat-tree", 4, "baseline"],
+        ["fat-tree", 4, "average"],
+    ]
+    assert (results[["parse", "group", "aggregate", "total"]] > 0).all(axis=None)
+    assert (results.loc[results["model"] == "average", "build"] > 0).all()
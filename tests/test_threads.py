@@ -0,0 +1,39 @@
+import pytest
+
+from nfopt.utils import threads as threadUtils
+
+
+@pytest.mark.parametrize(
+    "numTasks, largestTask, solverThreads, plan",
+    [
+        # Small models run single-threaded, one process per core
+        (24, 1_000, None, (16, 1)),
+        # Cores left idle by the tasks go to the solver threads
+        (4, 1_000, None, (4, 4)),
+        # Large models get more threads per solve and fewer processes
+        (24, 350_000, None, (4, 4)),
+        (24, 10_000_000, None, (2, 8)),
+        # The threads per solve can be set
+        (24, 1_000, 3, (5, 3)),
+        (24, 1_000, 64, (1, 16)),
+    ],
+)
+def test_threadPlan(monkeypatch, numTasks, largestTask, solverThreads, plan):
+    monkeypatch.setattr(threadUtils, "SOLVER_THREADS", None)
+    assert (
+        threadUtils.planThreads(numTasks, largestTask, solverThreads, cpuThreads=16)
+        == plan
+    )
+
+
+def test_threadPlanFitsBudget(monkeypatch):
+    monkeypatch.setattr(threadUtils, "SOLVER_THREADS", None)
+    for cpuThreads in [1, 2, 3, 8, 13, 64]:
+        for numTasks in [1, 2, 5, 24, 1000]:
+            for largestTask in [0, 50_000, 250_000, 5_000_000]:
+                processes, solverThreads = threadUtils.planThreads(
+                    numTasks, largestTask, cpuThreads=cpuThreads
+                )
+                assert 1 <= processes <= numTasks
+                assert solverThreads >= 1
+                assert processes * solverThreads <= cpuThreads
@@ -0,0 +1,76 @@
+import glob
+import types
+import json
+import pytest
+import pandas as pd
+
+from nfopt import pipeline
+from nfopt.calc_type_enum import CalcType
+from nfopt.utils import data as dataUtils
+from nfopt.utils import timing
+from nfopt.linear_optimization import solver
+
+
+def test_stagesAndCountersAddUp(monkeypatch):
+    clock = iter([0.0, 1.5, 10.0, 10.25, 20.0, 23.0])
+    monkeypatch.setattr(
+        timing, "time", types.SimpleNamespace(perf_counter=lambda: next(clock))
+    )
+    timing.reset()
+
+    with timing.stage("build"):
+        pass
+    with timing.stage("build"):
+        pass
+    # The time of a stage that raises is still counted
+    with pytest.raises(ValueError):
+        with timing.stage("solve"):
+            raise ValueError
+    assert timing.stages() == {"build": 1.75, "solve": 3.0}
+
+    timing.count("columns", 2)
+    timing.count("columns", 3)
+    # Models solved more than once are counted at their largest
+    timing.countSize(10, 5, 20)
+    timing.countSize(8, 7, 10)
+    assert timing.counters() == {
+        "columns": 5,
+        "variables": 10,
+        "constraints": 7,
+        "nonzeros": 20,
+    }
+
+    timing.reset()
+    assert timing.stages() == {}
+    assert timing.counters() == {}
+
+
+def test_runWritesProfile(syntheticDay, runArgs, tmp_path, monkeypatch):
+    monkeypatch.setattr(dataUtils, "DATA_OUTPUT_DIR", str(tmp_path))
+    pipeline.run(
+        runArgs(
+            CalcType.AVERAGE.value,
+            solver.BACKEND_SCIPY,
+            stream=False,
+            failures=None,
+            no_cache=False,
+            solver_threads=None,
+            profile=True,
+        )
+    )
+
+    (reportFile,) = glob.glob(str(tmp_path / "day*/reports/*_average_run.csv"))
+    report = pd.read_csv(reportFile)
+    assert report["timestamp"].tolist() == sorted(syntheticDay.flows)
+    assert (report[["build", "solve", "write"]] > 0).all(axis=None)
+    assert (report["total"] >= report[["build", "solve", "write"]].sum(axis=1)).all()
+
+    (profileFile,) = glob.glob(str(tmp_path / "day*/reports/*_average_profile.json"))
+    with open(profileFile) as file:
+        profile = json.load(file)
+    assert profile["model"] == CalcType.AVERAGE.value
+    assert [hour["timestamp"] for hour in profile["hours"]] == sorted(
+        syntheticDay.flows
+    )
+    assert profile["hourTotals"]["solve"] == pytest.approx(report["solve"].sum())
+    assert profile["processes"] * profile["solverThreads"] <= dataUtils.CPU_THREADS
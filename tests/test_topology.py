@@ -0,0 +1,57 @@
+import pytest
+import numpy as np
+
+from nfopt.utils.topology import Topology
+
+
+@pytest.fixture
+def prefixTopology():
+    """
+    Links whose names are substrings of paths that do not cross them, e.g. 'R1;R12' in 'R1;R123'.
+    """
+    links = {
+        link: {"capacity": 100}
+        for link in ["R1;R12", "R1;R123", "R123;R12", "R12;R1", "R12;R123"]
+    }
+    return Topology(links, defaultCapacity=1000)
+
+
+def test_pathsOnlyLoadTheLinksTheyCross(prefixTopology):
+    topology = prefixTopology
+    flows = {
+        "R1R12": ["R1;R123;R12", "R1;R12"],
+        "R12R123": ["R12;R1;R123", "R12;R123"],
+    }
+    hourPaths = topology.compileHour(flows)
+
+    for i, path in enumerate(hourPaths.paths):
+        routers = path.split(";")
+        crossed = {";".join(link) for link in zip(routers, routers[1:])}
+        assert {
+            topology.linkNames[linkId] for linkId in hourPaths.pathLinks(i)
+        } == crossed
+
+    loads = hourPaths.linkLoads(np.array([1.0, 2.0, 4.0, 8.0]))
+    assert dict(zip(topology.linkNames, loads)) == {
+        "R1;R12": 2.0,
+        "R1;R123": 5.0,
+        "R123;R12": 1.0,
+        "R12;R1": 4.0,
+        "R12;R123": 8.0,
+    }
+
+
+def test_pathsAreInternedOnce(prefixTopology):
+    topology = prefixTopology
+    numLinks = topology.numLinks
+
+    # A path crossing the same link twice loads it once, and links missing from the topology are added
+    pathId = topology.addPath("R1;R12;R1;R12;R5")
+    assert topology.addPath("R1;R12;R1;R12;R5") == pathId
+    assert [topology.linkNames[linkId] for linkId in topology.pathLinkIds(pathId)] == [
+        "R1;R12",
+        "R12;R1",
+        "R12;R5",
+    ]
+    assert topology.numLinks == numLinks + 1
+    assert topology.capacities[topology.linkIds["R12;R5"]] == 1000
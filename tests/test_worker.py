@@ -0,0 +1,41 @@
+import copy
+import statistics as stats
+import pytest
+
+from nfopt.calc_type_enum import CalcType
+from nfopt.worker import process_flows_hour
+from nfopt.linear_optimization import solver
+
+
+def test_baselineSplitsTrafficEvenlyOverPaths(syntheticDay, runArgs):
+    for timestamp in sorted(syntheticDay.flows):
+        flows = syntheticDay.flows[timestamp]
+        traffic = syntheticDay.traffic[timestamp]
+        links = copy.deepcopy(syntheticDay.links)
+
+        result = process_flows_hour(
+            timestamp,
+            copy.deepcopy(flows),
+            traffic,
+            runArgs(CalcType.BASELINE.value, solver.BACKEND_SCIPY),
+            links,
+            syntheticDay.topology,
+        )
+
+        # Each path carries an even share of the traffic of its flow on every link it crosses
+        load = dict.fromkeys(links, 0.0)
+        linkFlows = {link: set() for link in links}
+        for flow, paths in flows.items():
+            for path in paths:
+                routers = path.split(";")
+                for link in {";".join(link) for link in zip(routers, routers[1:])}:
+                    load[link] += traffic[flow] / len(paths)
+                    linkFlows[link].add(flow)
+
+        for link in links:
+            assert links[link]["totalTraffic"] == pytest.approx(load[link]), link
+            assert set(links[link]["listFlows"]) == linkFlows[link], link
+
+        util = [load[link] / links[link]["capacity"] * 100 for link in links]
+        assert result[0] == timestamp
+        assert result[1:] == pytest.approx([min(util), max(util), stats.mean(util)])